@@ -1,14 +1,23 @@
-import networkx as nx
 import pandas as pd
 from typing import List, Tuple, Dict
 import math
 from collections import Counter
 
+from xerparser.src._lazy import lazy_import
+from xerparser.src.network import PRED_TYPES, RelationshipNetwork
+
+from local.libs.cycles import feedback_edges, logic_loops
+
+nx = lazy_import("networkx")
+
 
 class CriticalPathAnalyzer:
-    def __init__(self, tasks_df: pd.DataFrame, taskpred_df: pd.DataFrame):
+    def __init__(self, tasks_df: pd.DataFrame, taskpred_df: pd.DataFrame,
+                 network: RelationshipNetwork | None = None):
         self.tasks_df = tasks_df
         self.taskpred_df = taskpred_df
+        # relationships of tasks_df, e.g. `Xer.network`; built from the tables when not given
+        self.network = network if network is not None else RelationshipNetwork.from_frames(tasks_df, taskpred_df)
         self.G = nx.DiGraph()
         self.subgraphs = []
         self.critical_paths = []
@@ -23,15 +32,21 @@ class CriticalPathAnalyzer:
         except (ValueError, TypeError):
             return 0.0
 
+    @classmethod
+    def from_xer(cls, xer) -> "CriticalPathAnalyzer":
+        return cls(xer.task_df, xer.taskpred_df, xer.network)
+
     def build_graph(self):
-        for _, task in self.tasks_df.iterrows():
-            duration = self.safe_float(task['target_drtn_hr_cnt']) / 8  # Convert hours to days
-            self.G.add_node(task['task_id'], duration=duration)
+        task_ids = self.tasks_df['task_id'].to_numpy()
+        durations = pd.to_numeric(self.tasks_df['target_drtn_hr_cnt'], errors='coerce').fillna(0) / 8  # hours to days
+        self.G.add_nodes_from((task_id, {'duration': duration}) for task_id, duration in zip(task_ids, durations))
 
-        for _, pred in self.taskpred_df.iterrows():
-            weight = self.safe_float(pred['lag_days'])
-            self.G.add_edge(pred['pred_task_id'], pred['task_id'],
-                            weight=weight, pred_type=pred['pred_type'])
+        # network nodes are numbered by row position in tasks_df; lags are hours, weights days
+        network = self.network
+        self.G.add_edges_from(
+            (pred, succ, {'weight': lag_hr / 8, 'pred_type': PRED_TYPES[kind]})
+            for pred, succ, kind, lag_hr in zip(task_ids[network.edge_pred], task_ids[network.edge_succ],
+                                                network.pred_type.tolist(), network.lag_hr.tolist()))
 
         # Add virtual start and end nodes
         start_nodes = [n for n in self.G.nodes() if self.G.in_degree(n) == 0]
@@ -47,29 +62,32 @@ class CriticalPathAnalyzer:
             self.G.add_edge(end_node, self.virtual_end, weight=0, pred_type='PR_FS')
 
     def detect_cycles(self):
-        try:
-            cycles = list(nx.simple_cycles(self.G))
-            if cycles:
-                self.cycles = cycles
-                print("Warning: Cycles detected in the project network.")
-                for i, cycle in enumerate(cycles, 1):
-                    print(f"Cycle {i}: {' -> '.join(map(str, cycle + [cycle[0]]))}")
-            return bool(cycles)
-        except nx.NetworkXNoCycle:
-            return False
+        cycles = logic_loops(self.G)
+        if cycles:
+            self.cycles = cycles
+            print("Warning: Cycles detected in the project network.")
+            self.print_cycles(cycles)
+        return bool(cycles)
 
     def identify_cycles(self):
-        try:
-            cycles = list(nx.simple_cycles(self.G))
-            if cycles:
-                self.cycles = cycles
-                print("Cycles detected in the project network:")
-                for i, cycle in enumerate(cycles, 1):
-                    print(f"Cycle {i}: {' -> '.join(map(str, cycle + [cycle[0]]))}")
-            return cycles
-        except nx.NetworkXNoCycle:
+        cycles = logic_loops(self.G)
+        if cycles:
+            self.cycles = cycles
+            print("Cycles detected in the project network:")
+            self.print_cycles(cycles)
+        else:
             print("No cycles detected in the project network.")
-            return []
+        return cycles
+
+    def print_cycles(self, cycles):
+        # Each cycle is a strongly connected component, listed with the relationships that break it
+        for i, cycle in enumerate(cycles, 1):
+            breaks = feedback_edges(self.G, [cycle], preference=self.successor_duration)
+            print(f"Cycle {i}: {len(cycle)} tasks: {', '.join(map(str, cycle))}")
+            print(f"  Break at: {', '.join(f'{u} -> {v}' for u, v in breaks)}")
+
+    def successor_duration(self, u, v) -> float:
+        return self.safe_float(self.G.nodes[v].get('duration', 0))
 
     def remove_cycles(self, method='auto', manual_breaks=None):
         cycles = self.identify_cycles()
@@ -77,21 +95,10 @@ class CriticalPathAnalyzer:
             return
 
         if method == 'auto':
-            print("Automatically removing cycles by breaking the longest duration relationship in each cycle.")
-            for cycle in cycles:
-                max_duration = -1
-                edge_to_remove = None
-                for i in range(len(cycle)):
-                    u, v = cycle[i], cycle[(i + 1) % len(cycle)]
-                    if self.G.has_edge(u, v):
-                        duration = self.G.nodes[v].get('duration', 0)
-                        if duration > max_duration:
-                            max_duration = duration
-                            edge_to_remove = (u, v)
-
-                if edge_to_remove:
-                    self.G.remove_edge(*edge_to_remove)
-                    print(f"Removed edge {edge_to_remove} to break cycle.")
+            print("Automatically removing cycles by breaking the longest duration relationships in each cycle.")
+            for edge_to_remove in feedback_edges(self.G, cycles, preference=self.successor_duration):
+                self.G.remove_edge(*edge_to_remove)
+                print(f"Removed edge {edge_to_remove} to break cycle.")
 
         elif method == 'manual':
             if not manual_breaks:
@@ -114,32 +121,6 @@ class CriticalPathAnalyzer:
         else:
             print("All cycles have been successfully removed.")
 
-    def remove_cycles(self):
-        if not self.cycles:
-            return
-
-        print("Attempting to remove cycles by breaking the longest duration relationship in each cycle.")
-        for cycle in self.cycles:
-            max_duration = -1
-            edge_to_remove = None
-            for i in range(len(cycle)):
-                u, v = cycle[i], cycle[(i + 1) % len(cycle)]
-                if self.G.has_edge(u, v):
-                    duration = self.G.nodes[v].get('duration', 0)
-                    if duration > max_duration:
-                        max_duration = duration
-                        edge_to_remove = (u, v)
-
-            if edge_to_remove:
-                self.G.remove_edge(*edge_to_remove)
-                print(f"Removed edge {edge_to_remove} to break cycle.")
-
-        # Check if all cycles are removed
-        if self.detect_cycles():
-            print("Warning: Not all cycles could be removed automatically.")
-        else:
-            print("All cycles have been successfully removed.")
-
     def identify_subgraphs(self):
         undirected_G = self.G.to_undirected()
         self.subgraphs = list(nx.connected_components(undirected_G))
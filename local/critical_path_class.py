@@ -1,36 +1,44 @@
-import networkx as nx
+import numpy as np
 import pandas as pd
 
+from xerparser.src._lazy import lazy_import
+from xerparser.src.network import PRED_TYPES, RelationshipNetwork
+
+nx = lazy_import("networkx")
+
 
 class CriticalPathCalculator:
-    def __init__(self, tasks_df, taskpred_df):
+    def __init__(self, tasks_df, taskpred_df, network: RelationshipNetwork | None = None):
         self.tasks_df = tasks_df
         self.taskpred_df = taskpred_df
+        # relationships of tasks_df, e.g. `Xer.network`; built from the tables when not given
+        self.network = network if network is not None else RelationshipNetwork.from_frames(tasks_df, taskpred_df)
         self.G = nx.DiGraph()
 
-    def build_graph(self):
-        # Add nodes to the graph
-        for _, row in self.tasks_df.iterrows():
-            task_id = row['task_id']
-            duration = pd.to_numeric(row['target_drtn_hr_cnt'], errors='coerce') / 8  # Convert hours to days
-            self.G.add_node(task_id, duration=duration)
-
-        # Add edges to the graph based on the predecessor relationships
-        for _, row in self.taskpred_df.iterrows():
-            pred_task_id = row['pred_task_id']
-            task_id = row['task_id']
+    @classmethod
+    def from_xer(cls, xer) -> "CriticalPathCalculator":
+        return cls(xer.task_df, xer.taskpred_df, xer.network)
 
-            if pred_task_id not in self.G.nodes or task_id not in self.G.nodes:
-                continue
-
-            pred_type = row['pred_type']
-            lag_days = row['lag_days']
-
-            self.G.add_edge(pred_task_id, task_id, weight=lag_days, pred_type=pred_type)
+    def build_graph(self):
+        task_ids = self.tasks_df['task_id'].to_numpy()
+        durations = pd.to_numeric(self.tasks_df['target_drtn_hr_cnt'], errors='coerce') / 8  # Convert hours to days
+        self.G.add_nodes_from((task_id, {'duration': duration}) for task_id, duration in zip(task_ids, durations))
+
+        # network nodes are numbered by row position in tasks_df and relationships to
+        # unknown tasks are already left out; lags are hours, weights days
+        network = self.network
+        self.G.add_edges_from(
+            (pred, succ, {'weight': lag_hr / 8, 'pred_type': PRED_TYPES[kind]})
+            for pred, succ, kind, lag_hr in zip(task_ids[network.edge_pred], task_ids[network.edge_succ],
+                                                network.pred_type.tolist(), network.lag_hr.tolist()))
 
     def calculate_critical_path(self):
-        # Topological sort of the graph
-        topological_order = list(nx.topological_sort(self.G))
+        # Levels of the shared network give a topological order without sorting the graph
+        levels = self.network.topological_levels()
+        if (levels < 0).any():
+            raise nx.NetworkXUnfeasible("Graph contains a cycle.")
+        task_ids = self.tasks_df['task_id'].to_numpy()
+        topological_order = task_ids[np.argsort(levels, kind='stable')].tolist()
 
         # Calculate early start and early finish times
         early_start = {node: 0 for node in self.G.nodes()}
@@ -1,11 +1,22 @@
-import re
-from datetime import datetime, timedelta, time, date
+from datetime import time, date
 import pandas as pd
 import logging
 from typing import Dict, List, Tuple, Union
 
+from xerparser.schemas.calendars import ClndrData, base_chains, resolve_clndr_data
+
+WORKDAY_COLUMNS = ['clndr_id', 'day', 'start_time', 'end_time']
+EXCEPTION_COLUMNS = ['clndr_id', 'exception_date', 'start_time', 'end_time']
+
 
 class CalendarParser:
+    """
+    Work week and exception frames of the calendars of a CALENDAR table.
+
+    Derived calendars (`base_clndr_id`) are written with their base calendars
+    applied, so the frames describe each calendar completely.
+    """
+
     def __init__(self, calendar_df: pd.DataFrame) -> None:
         if not isinstance(calendar_df, pd.DataFrame):
             raise ValueError("calendar_df must be a pandas DataFrame")
@@ -18,129 +29,79 @@ class CalendarParser:
         self.calendar_df: pd.DataFrame = calendar_df
         self.calendars: Dict[
             str, Dict[str, Union[Dict[int, List[Tuple[time, time]]], Dict[date, List[Tuple[time, time]]]]]] = {}
-        self.workdays_df = pd.DataFrame(columns=['clndr_id', 'day', 'start_time', 'end_time'])
-        self.exceptions_df = pd.DataFrame(columns=['clndr_id', 'exception_date', 'start_time', 'end_time'])
+        self.workdays_df = pd.DataFrame(columns=WORKDAY_COLUMNS)
+        self.exceptions_df = pd.DataFrame(columns=EXCEPTION_COLUMNS)
         self.logger = logging.getLogger(__name__)
 
     def parse_calendars(self) -> None:
-        for _, row in self.calendar_df.iterrows():
+        workday_records: List[tuple] = []
+        exception_records: List[tuple] = []
+        chains = base_chains(self.calendar_df)
+        for clndr_id, clndr_data in zip(self.calendar_df['clndr_id'], self.calendar_df['clndr_data']):
+            bases = chains.get(str(clndr_id), ())[1:]
             try:
-                self.parse_calendar_data(str(row['clndr_id']), str(row['clndr_data']))
+                self._collect_records(str(clndr_id), str(clndr_data), workday_records, exception_records, bases)
             except Exception as e:
-                self.logger.error(f"Error parsing calendar {row['clndr_id']}: {str(e)}")
+                self.logger.error(f"Error parsing calendar {clndr_id}: {str(e)}")
 
-    def parse_calendar_data(self, calendar_id: str, clndr_data: str) -> None:
+        # The frames are built once from plain records for all calendars
+        self.workdays_df = pd.DataFrame.from_records(workday_records, columns=WORKDAY_COLUMNS)
+        self.exceptions_df = pd.DataFrame.from_records(exception_records, columns=EXCEPTION_COLUMNS)
+
+    def parse_calendar_data(self, calendar_id: str, clndr_data: str, bases: Tuple[str, ...] = ()) -> None:
+        workday_records: List[tuple] = []
+        exception_records: List[tuple] = []
+        self._collect_records(calendar_id, clndr_data, workday_records, exception_records, bases)
+        if workday_records:
+            self.workdays_df = self._append_records(self.workdays_df, workday_records, WORKDAY_COLUMNS)
+        if exception_records:
+            self.exceptions_df = self._append_records(self.exceptions_df, exception_records, EXCEPTION_COLUMNS)
+
+    @staticmethod
+    def _append_records(df: pd.DataFrame, records: List[tuple], columns: List[str]) -> pd.DataFrame:
+        new_rows = pd.DataFrame.from_records(records, columns=columns)
+        if df.empty:
+            return new_rows
+        return pd.concat([df, new_rows], ignore_index=True)
+
+    def _collect_records(self, calendar_id: str, clndr_data: str, workday_records: List[tuple],
+                         exception_records: List[tuple], bases: Tuple[str, ...] = ()) -> None:
+        """
+        Append the (clndr_id, day / date, start, end) rows of one calendar to
+        the record lists; `bases` is the clndr_data of its base calendars.
+        """
         if not calendar_id or not clndr_data:
             self.logger.warning(f"Skipping calendar with empty id or data: {calendar_id}")
             return
 
         try:
-            workdays = self._parse_workdays(clndr_data)
-            exceptions = self._parse_exceptions(clndr_data)
-
-            for day, hours in workdays.items():
-                for start, end in hours:
-                    self.workdays_df = pd.concat([self.workdays_df, pd.DataFrame({
-                        'clndr_id': [calendar_id],
-                        'day': [day],
-                        'start_time': [start],
-                        'end_time': [end]
-                    })], ignore_index=True)
-
-            for exception_date, hours in exceptions.items():
-                if hours:
-                    for start, end in hours:
-                        self.exceptions_df = pd.concat([self.exceptions_df, pd.DataFrame({
-                            'clndr_id': [calendar_id],
-                            'exception_date': [exception_date],
-                            'start_time': [start],
-                            'end_time': [end]
-                        })], ignore_index=True)
-                else:
-                    self.exceptions_df = pd.concat([self.exceptions_df, pd.DataFrame({
-                        'clndr_id': [calendar_id],
-                        'exception_date': [exception_date],
-                        'start_time': [None],
-                        'end_time': [None]
-                    })], ignore_index=True)
-
+            resolved = resolve_clndr_data((clndr_data, *bases))
+            workdays = self._parse_workdays(resolved)
+            exceptions = self._parse_exceptions(resolved)
         except Exception as e:
             self.logger.error(f"Error parsing calendar data for {calendar_id}: {str(e)}")
+            return
 
-    def _parse_workdays(self, clndr_data: str) -> Dict[int, List[Tuple[time, time]]]:
-        workday_pattern = r'\(0\|\|([1-7])\(\)([^()]*)\)'
-        workdays: Dict[int, List[Tuple[time, time]]] = {}
-        for match in re.finditer(workday_pattern, clndr_data):
-            try:
-                day = int(match.group(1))
-                hours_str = match.group(2)
-                if hours_str.strip():
-                    hours = self._parse_hours(hours_str)
-                    workdays[day] = self._merge_overlapping_hours(hours)
-                else:
-                    workdays[day] = []  # Empty list for non-working days
-            except ValueError as e:
-                self.logger.warning(f"Invalid workday data: {match.group()}. Error: {str(e)}")
-        return workdays
-
-    @staticmethod
-    def _excel_date_to_datetime(excel_date_str: str) -> Union[date, None]:
-        try:
-            # First, try to convert the string to a pandas datetime object
-            python_date = pd.to_datetime(excel_date_str, errors='coerce')
-
-            # If it's a valid datetime, convert it to a date object
-            if pd.notnull(python_date):
-                return python_date.date()
-
-        except ValueError:
-            pass  # If conversion fails, proceed to the next check
+        for day, hours in workdays.items():
+            workday_records.extend((calendar_id, day, start, end) for start, end in hours)
 
-        try:
-            # If the previous conversion failed, try to convert to float (for Excel dates)
-            excel_date = float(excel_date_str)
-            python_date = pd.to_datetime('1899-12-30') + pd.to_timedelta(excel_date, 'D')
-            return python_date.date()
-        except ValueError:
-            logging.warning(f"Invalid Excel date format: {excel_date_str}")
-            return None
-    def _parse_exceptions(self, clndr_data: str) -> Dict[date, List[Tuple[time, time]]]:
-        exception_pattern = r'\(0\|\|(\d+)\(d\|(\d+)\)(?:\((.*?)\))?\(\)\)'
-        exceptions: Dict[date, List[Tuple[time, time]]] = {}
-        for match in re.finditer(exception_pattern, clndr_data):
-            try:
-                exception_date = self._excel_date_to_datetime(match.group(2))
-                if exception_date is None:
-                    self.logger.warning(f"Skipping exception date: {match.group(2)}")
-                    continue  # Skip this exception if the date couldn't be parsed
-                hours_str = match.group(3) if match.group(3) else ""
-                if hours_str.strip():
-                    hours = self._parse_hours(hours_str)
-                    exceptions[exception_date] = self._merge_overlapping_hours(hours)
-                else:
-                    exceptions[exception_date] = []  # Empty list for non-working exception days
-            except ValueError as e:
-                self.logger.warning(f"Invalid exception data: {match.group()}. Error: {str(e)}")
-        return exceptions
-    def _parse_hours(self, hours_str: str) -> List[Tuple[time, time]]:
-        hour_pattern = r's\|(\d{2}:\d{2})\|f\|(\d{2}:\d{2})'
-        hours: List[Tuple[time, time]] = []
-        for match in re.finditer(hour_pattern, hours_str):
-            try:
-                start, end = map(self._parse_time, match.groups())
-                hours.append((start, end))
-            except ValueError as e:
-                self.logger.warning(f"Invalid hour format: {match.group()}. Error: {str(e)}")
-        return hours
-
-    @staticmethod
-    def _parse_time(time_str: str) -> time:
-        try:
-            return datetime.strptime(time_str, '%H:%M').time()
-        except ValueError:
-            raise ValueError(f"Invalid time format: {time_str}")
+        for exception_date, hours in exceptions.items():
+            if hours:
+                exception_records.extend((calendar_id, exception_date, start, end) for start, end in hours)
+            else:
+                exception_records.append((calendar_id, exception_date, None, None))
 
+    def _parse_workdays(self, clndr_data: ClndrData) -> Dict[int, List[Tuple[time, time]]]:
+        return {
+            day: self._merge_overlapping_hours(list(shifts))
+            for day, shifts in clndr_data.work_week.items()
+        }
 
+    def _parse_exceptions(self, clndr_data: ClndrData) -> Dict[date, List[Tuple[time, time]]]:
+        return {
+            exception_date: self._merge_overlapping_hours(list(shifts))
+            for exception_date, shifts in clndr_data.exceptions.items()
+        }
 
     @staticmethod
     def _merge_overlapping_hours(hours: List[Tuple[time, time]]) -> List[Tuple[time, time]]:
@@ -155,8 +116,3 @@ class CalendarParser:
             else:
                 merged.append(current)
         return merged
-
-
-
-
-
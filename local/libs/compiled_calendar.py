@@ -0,0 +1,849 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date
+from functools import cached_property
+from typing import Callable, Dict, Iterable, Mapping, NamedTuple, Sequence
+
+import numpy as np
+import pandas as pd
+
+ALL_DAYS = (True,) * 7
+"""Week mask of a calendar that works every day."""
+
+MINUTES_PER_DAY = 24 * 60
+FULL_DAY = ((0, MINUTES_PER_DAY),)
+"""Shifts of a working day without shift information."""
+
+TASK_DATE_COLUMNS = (
+    'act_start_date', 'act_end_date', 'early_start_date', 'early_end_date', 'late_start_date',
+    'late_end_date', 'restart_date', 'reend_date', 'rem_late_start_date', 'rem_late_end_date',
+    'target_start_date', 'target_end_date', 'expect_end_date', 'cstr_date', 'cstr_date2',
+)
+PROJECT_DATE_COLUMNS = ('plan_start_date', 'plan_end_date', 'scd_end_date', 'last_recalc_date')
+"""Dates scanned by `schedule_horizon`."""
+
+VALID_YEARS = (1900, 2200)
+"""Years outside this range are treated as bad data when sizing the calendar horizon."""
+
+_GROWTH_DAYS = 366 * 2  # padding added on each side whenever a calendar is (re)compiled
+_FIRST_ORDINAL = date.min.toordinal()
+_LAST_ORDINAL = date.max.toordinal()
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()  # ordinal of datetime64 day 0
+
+
+def p6_day_to_weekday(day: int) -> int:
+    """Convert a P6 clndr_data day number (1 = Sunday ... 7 = Saturday) to `date.weekday()` (0 = Monday)."""
+    return (int(day) + 5) % 7
+
+
+def time_to_minutes(value, is_end: bool = False) -> int:
+    """Minutes after midnight of a `time`; a shift end of 00:00 is midnight at the end of the day."""
+    minutes = value.hour * 60 + value.minute
+    return MINUTES_PER_DAY if is_end and minutes == 0 else minutes
+
+
+def _clean_shifts(shifts: Iterable[tuple[int, int]]) -> tuple[tuple[int, int], ...]:
+    """Sort shifts, drop empty ones and merge overlapping ones."""
+    merged: list[list[int]] = []
+    for start, end in sorted((int(s), int(e)) for s, e in shifts):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return tuple((start, end) for start, end in merged)
+
+
+def to_ordinal(value) -> int:
+    """Proleptic Gregorian ordinal of a date, datetime, Timestamp or date string."""
+    if isinstance(value, date):
+        return value.toordinal()
+    return pd.Timestamp(value).toordinal()
+
+
+class CompiledRange(NamedTuple):
+    """Working-day arrays of the compiled range of a calendar; replaced as a whole when it grows."""
+
+    origin: int
+    working: np.ndarray
+    cumulative: np.ndarray
+
+
+class CompiledCalendar:
+    """
+    Working-day bitmap of one calendar and its running count of working days.
+
+    Days are addressed by their proleptic Gregorian ordinal (`date.toordinal()`).
+    `working[i]` tells whether ordinal `origin + i` is a working day and
+    `cumulative[i]` is the number of working days from `origin` to `origin + i`
+    inclusive, so counting working days is a subtraction and adding working
+    days is a `searchsorted`. The compiled range grows on demand.
+
+    Working time is addressed in absolute minutes, `ordinal * 1440 + minute of
+    day`. The shifts of the compiled range form a working-minute timeline:
+    the start and end of every shift and the working minutes elapsed before
+    it. Adding working minutes and counting working minutes between two
+    timestamps are binary searches over that timeline.
+
+    Calendars are shared between threads through the calendar cache. Growth
+    runs under a lock and publishes a new `CompiledRange` in one assignment;
+    the arrays of a published range are never modified, so every query works
+    on one consistent snapshot.
+
+    Args:
+        clndr_id (str): calendar id
+        week_mask (Iterable[bool]): working weekdays, indexed by `date.weekday()`
+        holidays (Iterable[int]): ordinals of non-working exceptions
+        working_exceptions (Iterable[int]): ordinals of working exceptions
+        week_shifts (Sequence | None): (start, end) minutes of the shifts of each
+            weekday, indexed by `date.weekday()`. Working days without shifts
+            are worked around the clock.
+        exception_shifts (Mapping[int, Sequence] | None): shifts of working
+            exceptions by ordinal
+    """
+
+    def __init__(self, clndr_id: str, week_mask: Iterable[bool] = ALL_DAYS,
+                 holidays: Iterable[int] = (), working_exceptions: Iterable[int] = (),
+                 week_shifts: Sequence[Iterable[tuple[int, int]]] | None = None,
+                 exception_shifts: Mapping[int, Iterable[tuple[int, int]]] | None = None) -> None:
+        self.clndr_id = str(clndr_id)
+        self.week_mask = np.array(list(week_mask), dtype=bool)
+        if self.week_mask.shape != (7,):
+            raise ValueError(f"week_mask of calendar {clndr_id} must have 7 values")
+        self.holidays = np.unique(np.fromiter(holidays, dtype=np.int64))
+        self.working_exceptions = np.unique(np.fromiter(working_exceptions, dtype=np.int64))
+        if week_shifts is not None and len(week_shifts) != 7:
+            raise ValueError(f"week_shifts of calendar {clndr_id} must have 7 values")
+        self.week_shifts = tuple(
+            (_clean_shifts(week_shifts[day]) if week_shifts is not None else ()) or FULL_DAY
+            for day in range(7)
+        )
+        self.exception_shifts = {
+            int(ordinal): _clean_shifts(shifts) or FULL_DAY
+            for ordinal, shifts in (exception_shifts or {}).items()
+        }
+        self.compiled = CompiledRange(0, np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int64))
+        # (compiled range, timeline) of the last timeline built
+        self._timeline: tuple[CompiledRange, tuple[np.ndarray, ...]] | None = None
+        self._lock = threading.Lock()
+        # called with the bytes added whenever the calendar grows, see CalendarCache
+        self.on_grow: Callable[[int], None] | None = None
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["on_grow"] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def origin(self) -> int:
+        return self.compiled.origin
+
+    @property
+    def working(self) -> np.ndarray:
+        return self.compiled.working
+
+    @property
+    def cumulative(self) -> np.ndarray:
+        return self.compiled.cumulative
+
+    @property
+    def first_ordinal(self) -> int:
+        return self.compiled.origin
+
+    @property
+    def last_ordinal(self) -> int:
+        compiled = self.compiled
+        return compiled.origin + compiled.working.size - 1
+
+    def ensure(self, first: int, last: int) -> CompiledRange:
+        """
+        Compile the calendar so that ordinals `first` to `last` are covered.
+
+        Returns:
+            CompiledRange: a compiled range covering `first` to `last`
+        """
+        first, last = int(first), int(last)
+        compiled = self.compiled
+        if compiled.working.size and compiled.origin <= first and last < compiled.origin + compiled.working.size:
+            return compiled
+        with self._lock:
+            # another thread may have grown the calendar while this one waited
+            compiled = self.compiled
+            size = compiled.working.size
+            if size:
+                if compiled.origin <= first and last < compiled.origin + size:
+                    return compiled
+                first, last = min(first, compiled.origin), max(last, compiled.origin + size - 1)
+            padding = max(_GROWTH_DAYS, size // 2)
+            before = self.nbytes
+            compiled = self.compiled = self._compile(max(first - padding, _FIRST_ORDINAL),
+                                                     min(last + padding, _LAST_ORDINAL))
+            grown = self.nbytes - before
+        # the cache re-checks its budget outside the calendar lock
+        if self.on_grow is not None:
+            self.on_grow(grown)
+        return compiled
+
+    def _compile(self, first: int, last: int) -> CompiledRange:
+        ordinals = np.arange(first, last + 1, dtype=np.int64)
+        # date.fromordinal(1) is a Monday, so weekday() == (ordinal - 1) % 7
+        working = self.week_mask[(ordinals - 1) % 7]
+        for exceptions, value in ((self.holidays, False), (self.working_exceptions, True)):
+            inside = exceptions[(exceptions >= first) & (exceptions <= last)]
+            working[inside - first] = value
+        working.flags.writeable = False
+        cumulative = np.cumsum(working, dtype=np.int64)
+        cumulative.flags.writeable = False
+        return CompiledRange(first, working, cumulative)
+
+    def _grow(self, compiled: CompiledRange) -> CompiledRange:
+        """Compile at least twice the range of `compiled`."""
+        last = compiled.origin + compiled.working.size - 1
+        if compiled.origin == _FIRST_ORDINAL and last == _LAST_ORDINAL:
+            raise ValueError(f"Calendar {self.clndr_id} does not have enough working days")
+        return self.ensure(compiled.origin - compiled.working.size, last + compiled.working.size)
+
+    def is_working_day(self, ordinals) -> np.ndarray:
+        """Whether each ordinal is a working day."""
+        ordinals = np.asarray(ordinals, dtype=np.int64)
+        compiled = self.ensure(ordinals.min(), ordinals.max()) if ordinals.size else self.compiled
+        return compiled.working[ordinals - compiled.origin]
+
+    def working_days_between(self, first, last) -> np.ndarray:
+        """
+        Number of working days between two ordinals, both included. The order
+        of the two dates does not matter.
+        """
+        first, last = np.asarray(first, dtype=np.int64), np.asarray(last, dtype=np.int64)
+        lo, hi = np.minimum(first, last), np.maximum(first, last)
+        compiled = self.ensure(lo.min(), hi.max()) if lo.size else self.compiled
+        lo, hi = lo - compiled.origin, hi - compiled.origin
+        return compiled.cumulative[hi] - compiled.cumulative[lo] + compiled.working[lo]
+
+    def add_working_days(self, ordinals, days) -> np.ndarray:
+        """
+        Ordinal of the `days`-th working day after (or before, if negative)
+        each start ordinal. The start day itself is never counted; zero days
+        returns the start.
+        """
+        ordinals, days = np.broadcast_arrays(np.asarray(ordinals, dtype=np.int64),
+                                             np.asarray(days, dtype=np.int64))
+        result = ordinals.copy()
+        moving = days != 0
+        if not moving.any():
+            return result
+        starts, steps = ordinals[moving], days[moving]
+
+        # working days per week gives a first guess of the range to compile
+        per_week = max(int(self.week_mask.sum()), 1)
+        reach = int(np.abs(steps).max()) * 7 // per_week + 7
+        compiled = self.ensure(starts.min() - reach, starts.max() + reach)
+
+        while True:
+            origin, working, cumulative = compiled
+            index = starts - origin
+            count = cumulative[index]
+            # running count at the start (forward) or at the day before it (backward)
+            target = np.where(steps > 0, count + steps, count - working[index] + steps + 1)
+            found = np.searchsorted(cumulative, target, side="left")
+            if (found < cumulative.size).all() and (target >= 1).all():
+                break
+            compiled = self._grow(compiled)
+
+        result[moving] = found + origin
+        return result
+
+    @cached_property
+    def busdaycalendar(self) -> np.busdaycalendar | None:
+        """
+        `np.busdaycalendar` with the working days of this calendar, or None if
+        a week mask and a list of holidays cannot describe it: no weekday is
+        worked, or a working exception falls on a non-working weekday. The
+        shifts of a day do not matter, only whether it is worked.
+        """
+        if not self.week_mask.any():
+            return None
+        if not self.week_mask[(self.working_exceptions - 1) % 7].all():
+            return None
+        # a date listed as both a holiday and a working exception is worked
+        holidays = np.setdiff1d(self.holidays, self.working_exceptions)
+        return np.busdaycalendar(weekmask=self.week_mask, holidays=(holidays - _EPOCH_ORDINAL).astype("datetime64[D]"))
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the compiled arrays."""
+        timeline = self._timeline
+        arrays = [*self.compiled[1:], self.holidays, self.working_exceptions, *(timeline[1] if timeline else ())]
+        return sum(arr.nbytes for arr in arrays)
+
+    @property
+    def minutes_per_week(self) -> int:
+        """Working minutes of a regular week."""
+        return sum(end - start for day in range(7) if self.week_mask[day] for start, end in self.week_shifts[day])
+
+    def timeline(self, compiled: CompiledRange | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Working-minute timeline of a compiled range.
+
+        Args:
+            compiled (CompiledRange | None): range to build the timeline of.
+                Defaults to the current range.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: absolute start and end
+                minute of every shift, in order, and the working minutes from
+                the start of the range to the start of each shift
+        """
+        compiled = self.compiled if compiled is None else compiled
+        cached = self._timeline
+        if cached is not None and cached[0] is compiled:
+            return cached[1]
+        ordinals = np.flatnonzero(compiled.working) + compiled.origin
+        weekdays = (ordinals - 1) % 7
+        is_exception = np.isin(ordinals, self.working_exceptions)
+        starts, ends = [], []
+        for day in range(7):
+            days = ordinals[(weekdays == day) & ~is_exception] * MINUTES_PER_DAY
+            for start, end in self.week_shifts[day]:
+                starts.append(days + start)
+                ends.append(days + end)
+        for ordinal in ordinals[is_exception]:
+            shifts = self.exception_shifts.get(int(ordinal), self.week_shifts[(ordinal - 1) % 7])
+            starts.append(np.array([ordinal * MINUTES_PER_DAY + s for s, _ in shifts], dtype=np.int64))
+            ends.append(np.array([ordinal * MINUTES_PER_DAY + e for _, e in shifts], dtype=np.int64))
+        starts = np.concatenate(starts) if starts else np.zeros(0, dtype=np.int64)
+        ends = np.concatenate(ends) if ends else np.zeros(0, dtype=np.int64)
+        order = np.argsort(starts, kind="stable")
+        starts, ends = starts[order].astype(np.int64), ends[order].astype(np.int64)
+        elapsed = np.zeros(starts.size, dtype=np.int64)
+        np.cumsum(ends[:-1] - starts[:-1], out=elapsed[1:])
+        timeline = (starts, ends, elapsed)
+        if compiled is self.compiled:
+            replaced = sum(arr.nbytes for arr in cached[1]) if cached else 0
+            self._timeline = (compiled, timeline)
+            if self.on_grow is not None:
+                self.on_grow(sum(arr.nbytes for arr in timeline) - replaced)
+        return timeline
+
+    def _ensure_minutes(self, first: int, last: int) -> CompiledRange:
+        return self.ensure(first // MINUTES_PER_DAY, last // MINUTES_PER_DAY)
+
+    def working_minutes_until(self, minutes, compiled: CompiledRange | None = None) -> np.ndarray:
+        """Working minutes from the start of the compiled range to each absolute minute."""
+        minutes = np.asarray(minutes, dtype=np.int64)
+        if compiled is None:
+            # callers passing a range have compiled it over the minutes
+            compiled = self._ensure_minutes(minutes.min(), minutes.max()) if minutes.size else self.compiled
+        starts, ends, elapsed = self.timeline(compiled)
+        shift = np.searchsorted(starts, minutes, side="right") - 1
+        inside = shift >= 0
+        shift = np.where(inside, shift, 0)
+        worked = elapsed[shift] + np.minimum(minutes, ends[shift]) - starts[shift] if starts.size else 0
+        return np.where(inside, worked, 0)
+
+    def working_minutes_between(self, first, last) -> np.ndarray:
+        """Working minutes between two absolute minutes; the order does not matter."""
+        first, last = np.asarray(first, dtype=np.int64), np.asarray(last, dtype=np.int64)
+        lo, hi = np.minimum(first, last), np.maximum(first, last)
+        compiled = self._ensure_minutes(lo.min(), hi.max()) if lo.size else self.compiled
+        return self.working_minutes_until(hi, compiled) - self.working_minutes_until(lo, compiled)
+
+    def add_working_minutes(self, minutes, amounts) -> np.ndarray:
+        """
+        Absolute minute reached after working `amounts` minutes from each start
+        (backwards if negative). Moving forwards stops at the end of a shift;
+        moving backwards stops at the start of a shift. Zero returns the start.
+        """
+        minutes, amounts = np.broadcast_arrays(np.asarray(minutes, dtype=np.int64),
+                                               np.asarray(amounts, dtype=np.int64))
+        result = minutes.copy()
+        moving = amounts != 0
+        if not moving.any():
+            return result
+        starts, steps = minutes[moving], amounts[moving]
+
+        per_day = max(self.minutes_per_week // 7, 1)
+        reach = (int(np.abs(steps).max()) // per_day + 7) * MINUTES_PER_DAY
+        compiled = self._ensure_minutes(starts.min() - reach, starts.max() + reach)
+
+        while True:
+            shift_starts, shift_ends, elapsed = self.timeline(compiled)
+            if shift_starts.size:
+                target = self.working_minutes_until(starts, compiled) + steps
+                total = elapsed[-1] + shift_ends[-1] - shift_starts[-1]
+                if (target > 0).all() and (target <= total).all():
+                    forward = steps > 0
+                    # forwards: first shift ending at or after the target,
+                    # backwards: last shift starting at or before the target
+                    shift = np.where(
+                        forward,
+                        np.searchsorted(elapsed + shift_ends - shift_starts, target, side="left"),
+                        np.searchsorted(elapsed, target, side="right") - 1,
+                    )
+                    break
+            compiled = self._grow(compiled)
+
+        result[moving] = shift_starts[shift] + target - elapsed[shift]
+        return result
+
+
+class CalendarSet:
+    """
+    Compiled calendars by clndr_id with array-in / array-out calendar arithmetic.
+
+    Dates are passed as anything `np.asarray(..., dtype="datetime64[D]")`
+    accepts; times of day are dropped. Each call groups its rows by calendar
+    and runs one vectorized lookup per calendar. NaT dates and NaN day counts
+    give NaT / -1 results. Unknown calendars work every day.
+
+    With `busday` set, the default, day offsets of calendars that have a
+    `busdaycalendar` run in `np.busday_offset` instead of the compiled
+    bitmaps, and counts in `np.busday_count`; other calendars use the
+    compiled engine. Both give the same results.
+
+    Args:
+        calendars (Dict[str, CompiledCalendar]): compiled calendars by clndr_id
+        busday (bool): use the numpy business-day backend where possible
+    """
+
+    def __init__(self, calendars: Dict[str, CompiledCalendar] | None = None, busday: bool = True) -> None:
+        self.calendars: Dict[str, CompiledCalendar] = dict(calendars or {})
+        self.busday = busday
+
+    def __len__(self) -> int:
+        return len(self.calendars)
+
+    def __contains__(self, clndr_id) -> bool:
+        return str(clndr_id) in self.calendars
+
+    def get(self, clndr_id) -> CompiledCalendar:
+        clndr_id = str(clndr_id)
+        calendar = self.calendars.get(clndr_id)
+        if calendar is None:
+            calendar = self.calendars[clndr_id] = CompiledCalendar(clndr_id)
+        return calendar
+
+    def _groups(self, clndr_ids, size: int):
+        """Yield (calendar, row positions) for every calendar used by the rows."""
+        clndr_ids = np.asarray(clndr_ids, dtype=object)
+        if clndr_ids.ndim == 0:
+            yield self.get(clndr_ids.item()), np.arange(size)
+            return
+        codes, uniques = pd.factorize(clndr_ids.astype(str))
+        order = np.argsort(codes, kind="stable")
+        bounds = np.cumsum(np.bincount(codes, minlength=len(uniques)))
+        for clndr_id, rows in zip(uniques, np.split(order, bounds[:-1])):
+            yield self.get(clndr_id), rows
+
+    def is_working_day(self, dates, clndr_ids) -> np.ndarray:
+        """Whether each date is a working day of its calendar."""
+        ordinals, valid = _to_ordinals(dates)
+        result = np.zeros(ordinals.shape, dtype=bool)
+        for calendar, rows in self._groups(clndr_ids, ordinals.size):
+            rows = rows[valid[rows]]
+            result[rows] = calendar.is_working_day(ordinals[rows])
+        return result
+
+    def add_working_days(self, starts, days, clndr_ids) -> np.ndarray:
+        """
+        The `days`-th working day after (or before, if negative) each start,
+        in the calendar of its row. Fractional days are truncated.
+
+        Returns:
+            np.ndarray: datetime64[D] dates
+        """
+        ordinals, valid = _to_ordinals(starts)
+        days = np.broadcast_to(np.asarray(days, dtype=np.float64), ordinals.shape)
+        valid = valid & np.isfinite(days)
+        steps = np.where(valid, days, 0).astype(np.int64)
+        result = np.full(ordinals.shape, np.datetime64("NaT"), dtype="datetime64[D]")
+        for calendar, rows in self._groups(clndr_ids, ordinals.size):
+            rows = rows[valid[rows]]
+            if not rows.size:
+                continue
+            busdaycal = calendar.busdaycalendar if self.busday else None
+            if busdaycal is not None:
+                result[rows] = _busday_offset(ordinals[rows], steps[rows], busdaycal)
+            else:
+                found = calendar.add_working_days(ordinals[rows], steps[rows])
+                result[rows] = (found - _EPOCH_ORDINAL).astype("datetime64[D]")
+        return result
+
+    def working_days_between(self, starts, ends, clndr_ids) -> np.ndarray:
+        """
+        Working days between each pair of dates, both included, in the calendar
+        of its row; -1 where either date is NaT.
+        """
+        first, first_valid = _to_ordinals(starts)
+        last, last_valid = _to_ordinals(ends)
+        first, last = np.broadcast_arrays(first, last)
+        valid = first_valid & last_valid
+        result = np.full(first.shape, -1, dtype=np.int64)
+        for calendar, rows in self._groups(clndr_ids, first.size):
+            rows = rows[valid[rows]]
+            if not rows.size:
+                continue
+            busdaycal = calendar.busdaycalendar if self.busday else None
+            if busdaycal is not None:
+                result[rows] = _busday_count(first[rows], last[rows], busdaycal)
+            else:
+                result[rows] = calendar.working_days_between(first[rows], last[rows])
+        return result
+
+    def add_working_minutes(self, starts, minutes, clndr_ids) -> np.ndarray:
+        """
+        Timestamp reached after working `minutes` from each start, in the
+        calendar of its row. Fractional minutes are rounded.
+
+        Returns:
+            np.ndarray: datetime64[m] timestamps
+        """
+        absolute, valid = _to_minutes(starts)
+        minutes = np.broadcast_to(np.asarray(minutes, dtype=np.float64), absolute.shape)
+        valid = valid & np.isfinite(minutes)
+        steps = np.round(np.where(valid, minutes, 0)).astype(np.int64)
+        result = np.full(absolute.shape, np.datetime64("NaT"), dtype="datetime64[m]")
+        for calendar, rows in self._groups(clndr_ids, absolute.size):
+            rows = rows[valid[rows]]
+            if rows.size:
+                found = calendar.add_working_minutes(absolute[rows], steps[rows])
+                result[rows] = (found - _EPOCH_ORDINAL * MINUTES_PER_DAY).astype("datetime64[m]")
+        return result
+
+    def working_minutes_between(self, starts, ends, clndr_ids) -> np.ndarray:
+        """
+        Working minutes between each pair of timestamps in the calendar of its
+        row; -1 where either timestamp is NaT.
+        """
+        first, first_valid = _to_minutes(starts)
+        last, last_valid = _to_minutes(ends)
+        first, last = np.broadcast_arrays(first, last)
+        valid = first_valid & last_valid
+        result = np.full(first.shape, -1, dtype=np.int64)
+        for calendar, rows in self._groups(clndr_ids, first.size):
+            rows = rows[valid[rows]]
+            if rows.size:
+                result[rows] = calendar.working_minutes_between(first[rows], last[rows])
+        return result
+
+
+def _busday_offset(ordinals: np.ndarray, days: np.ndarray, busdaycal: np.busdaycalendar) -> np.ndarray:
+    """`CompiledCalendar.add_working_days` computed with `np.busday_offset`."""
+    dates = (ordinals - _EPOCH_ORDINAL).astype("datetime64[D]")
+    result = dates.copy()
+    # a non-working start rolls away from the direction of travel, so the
+    # start day itself is never counted
+    for moving, roll in ((days > 0, "backward"), (days < 0, "forward")):
+        if moving.any():
+            result[moving] = np.busday_offset(dates[moving], days[moving], roll=roll, busdaycal=busdaycal)
+    return result
+
+
+def _busday_count(first: np.ndarray, last: np.ndarray, busdaycal: np.busdaycalendar) -> np.ndarray:
+    """`CompiledCalendar.working_days_between` computed with `np.busday_count`."""
+    lo = (np.minimum(first, last) - _EPOCH_ORDINAL).astype("datetime64[D]")
+    hi = (np.maximum(first, last) - _EPOCH_ORDINAL + 1).astype("datetime64[D]")
+    return np.busday_count(lo, hi, busdaycal=busdaycal)
+
+
+def _to_minutes(timestamps) -> tuple[np.ndarray, np.ndarray]:
+    """Flat absolute minutes of an array of timestamps and a mask of the rows that are not NaT."""
+    values = np.atleast_1d(np.asarray(timestamps, dtype="datetime64[m]")).ravel()
+    valid = ~np.isnat(values)
+    minutes = np.where(valid, values.astype(np.int64), 0) + _EPOCH_ORDINAL * MINUTES_PER_DAY
+    return minutes, valid
+
+
+def _to_ordinals(dates) -> tuple[np.ndarray, np.ndarray]:
+    """Flat ordinals of an array of dates and a mask of the rows that are not NaT."""
+    days = np.atleast_1d(np.asarray(dates, dtype="datetime64[D]")).ravel()
+    valid = ~np.isnat(days)
+    ordinals = np.where(valid, days.astype(np.int64), 0) + _EPOCH_ORDINAL
+    return ordinals, valid
+
+
+def compile_calendars(workdays_df: pd.DataFrame, exceptions_df: pd.DataFrame) -> Dict[str, CompiledCalendar]:
+    """
+    Compile the calendars described by the CalendarParser frames.
+
+    CalendarParser writes derived calendars with their base calendars
+    applied, so the frames need no further resolution here.
+
+    Calendars without any working weekday shift work every day, as before.
+    Exception dates without shifts are holidays, exception dates with shifts
+    are working days. The shift times become the working-minute timeline.
+
+    Args:
+        workdays_df (pd.DataFrame): clndr_id, day, start_time, end_time
+        exceptions_df (pd.DataFrame): clndr_id, exception_date, start_time, end_time
+
+    Returns:
+        Dict[str, CompiledCalendar]: compiled calendar per clndr_id
+    """
+    week_shifts: Dict[str, list] = {}
+    if workdays_df is not None and not workdays_df.empty:
+        shifts = workdays_df[workdays_df['start_time'].notna() & workdays_df['end_time'].notna()]
+        for clndr_id, day, start, end in zip(shifts['clndr_id'].astype(str), shifts['day'],
+                                             shifts['start_time'], shifts['end_time']):
+            try:
+                weekday = p6_day_to_weekday(day)
+            except (TypeError, ValueError):
+                logging.warning(f"Invalid workday {day} in calendar {clndr_id}")
+                continue
+            days = week_shifts.setdefault(clndr_id, [[] for _ in range(7)])
+            days[weekday].append((time_to_minutes(start), time_to_minutes(end, is_end=True)))
+
+    holidays: Dict[str, set] = {}
+    exception_shifts: Dict[str, Dict[int, list]] = {}
+    if exceptions_df is not None and not exceptions_df.empty:
+        for clndr_id, exception_date, start, end in zip(exceptions_df['clndr_id'].astype(str),
+                                                        exceptions_df['exception_date'],
+                                                        exceptions_df['start_time'], exceptions_df['end_time']):
+            if pd.isnull(exception_date):
+                continue
+            ordinal = to_ordinal(exception_date)
+            if pd.notna(start) and pd.notna(end):
+                exception_shifts.setdefault(clndr_id, {}).setdefault(ordinal, []).append(
+                    (time_to_minutes(start), time_to_minutes(end, is_end=True)))
+            else:
+                holidays.setdefault(clndr_id, set()).add(ordinal)
+        # a date with at least one shift is worked
+        for clndr_id, dates in exception_shifts.items():
+            holidays.get(clndr_id, set()).difference_update(dates)
+
+    calendars = {}
+    for clndr_id in set(week_shifts) | set(holidays) | set(exception_shifts):
+        days = week_shifts.get(clndr_id)
+        calendars[clndr_id] = CompiledCalendar(
+            clndr_id,
+            [bool(shifts) for shifts in days] if days else ALL_DAYS,
+            holidays.get(clndr_id, ()),
+            exception_shifts.get(clndr_id, {}).keys(),
+            week_shifts=days,
+            exception_shifts=exception_shifts.get(clndr_id),
+        )
+    return calendars
+
+
+def compile_clndr_data(clndr_id: str, clndr_data) -> CompiledCalendar:
+    """
+    Compile a parsed clndr_data field.
+
+    Args:
+        clndr_id (str): calendar id
+        clndr_data (ClndrData): result of `xerparser.schemas.calendars.parse_clndr_data`
+
+    Returns:
+        CompiledCalendar: compiled calendar
+    """
+    week_shifts: list = [[] for _ in range(7)]
+    for day, shifts in clndr_data.work_week.items():
+        week_shifts[p6_day_to_weekday(day)] = [
+            (time_to_minutes(start), time_to_minutes(end, is_end=True)) for start, end in shifts
+        ]
+    holidays = [day.toordinal() for day, shifts in clndr_data.exceptions.items() if not shifts]
+    exception_shifts = {
+        day.toordinal(): [(time_to_minutes(start), time_to_minutes(end, is_end=True)) for start, end in shifts]
+        for day, shifts in clndr_data.exceptions.items() if shifts
+    }
+    has_week = any(week_shifts)
+    return CompiledCalendar(
+        clndr_id,
+        [bool(shifts) for shifts in week_shifts] if has_week else ALL_DAYS,
+        holidays,
+        exception_shifts.keys(),
+        week_shifts=week_shifts if has_week else None,
+        exception_shifts=exception_shifts,
+    )
+
+
+class CalendarCache:
+    """
+    Process-wide LRU cache of compiled calendars.
+
+    Entries are keyed by a hash of the clndr_data string (and of its base
+    calendars) and the horizon the calendar was compiled for, so identical
+    calendars of different Xer objects (updates, windows, copies) are parsed
+    and compiled once. The
+    cache is bounded by the bytes of the compiled arrays, re-checked whenever
+    a cached calendar grows. Calendars keep the clndr_id of the calendar that
+    compiled them first.
+
+    Args:
+        max_bytes (int): memory budget of the cached arrays
+    """
+
+    def __init__(self, max_bytes: int = 64 * 2 ** 20) -> None:
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[tuple, CompiledCalendar] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def key(clndr_data: str, horizon: tuple | None = None, bases: tuple[str, ...] = ()) -> tuple:
+        """Cache key of a clndr_data string, its base calendars and an optional (first, last) date horizon."""
+        digest = hashlib.blake2b(digest_size=16)
+        for data in (clndr_data, *bases):
+            digest.update(data.encode("utf-8", "surrogatepass"))
+            digest.update(b"\0")
+        digest = digest.digest()
+        if horizon is None:
+            return digest, None
+        return digest, (to_ordinal(horizon[0]), to_ordinal(horizon[1]))
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the cached calendars; calendars grow when queried outside their range."""
+        return sum(calendar.nbytes for calendar in self._entries.values())
+
+    def get(self, clndr_data: str, clndr_id: str = "", horizon: tuple | None = None,
+            bases: tuple[str, ...] = ()) -> CompiledCalendar:
+        """
+        Compiled calendar of a clndr_data string, compiled on a miss.
+
+        Args:
+            clndr_data (str): value of the CALENDAR clndr_data column
+            clndr_id (str): calendar id used if the calendar is compiled now
+            horizon (tuple | None): (first, last) dates to compile up front
+            bases (tuple[str, ...]): clndr_data of the base calendar, its own
+                base, and so on
+
+        Returns:
+            CompiledCalendar: shared compiled calendar; do not modify it
+        """
+        key = self.key(clndr_data, horizon, bases)
+        with self._lock:
+            calendar = self._entries.get(key)
+            if calendar is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return calendar
+            self.misses += 1
+
+        from xerparser.schemas.calendars import resolve_clndr_data
+
+        calendar = compile_clndr_data(clndr_id, resolve_clndr_data((clndr_data, *bases)))
+        if key[1] is not None:
+            calendar.ensure(*key[1])
+        with self._lock:
+            calendar = self._entries.setdefault(key, calendar)
+            calendar.on_grow = self._grown
+            self._evict()
+        return calendar
+
+    def _grown(self, nbytes: int) -> None:
+        """Re-check the memory budget after a cached calendar grew by `nbytes`."""
+        if nbytes > 0:
+            with self._lock:
+                self._evict()
+
+    def _evict(self) -> None:
+        size = self.nbytes
+        while len(self._entries) > 1 and size > self.max_bytes:
+            _, calendar = self._entries.popitem(last=False)
+            size -= calendar.nbytes
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """Hit / miss counters and memory use."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "nbytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    def clear(self) -> None:
+        """Drop every cached calendar and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+calendar_cache = CalendarCache()
+"""Calendar cache shared by every Xer of the process."""
+
+
+def compile_calendar_df(calendar_df: pd.DataFrame, horizon: tuple | None = None,
+                        cache: CalendarCache | None = None) -> Dict[str, CompiledCalendar]:
+    """
+    Compiled calendars of a CALENDAR table, taken from the calendar cache.
+
+    Base calendars (`base_clndr_id`) are resolved here, so a derived calendar
+    is compiled into one flat working-time table and costs nothing extra at
+    query time.
+
+    Args:
+        calendar_df (pd.DataFrame): CALENDAR table with clndr_id and clndr_data
+        horizon (tuple | None): (first, last) dates to compile up front
+        cache (CalendarCache | None): cache to use. Defaults to `calendar_cache`.
+
+    Returns:
+        Dict[str, CompiledCalendar]: compiled calendar per clndr_id
+    """
+    from xerparser.schemas.calendars import base_chains
+
+    cache = calendar_cache if cache is None else cache
+    chains = base_chains(calendar_df)
+    return {
+        clndr_id: cache.get(chain[0], clndr_id, horizon, chain[1:])
+        for clndr_id, chain in chains.items()
+    }
+
+
+def schedule_horizon(task_df: pd.DataFrame | None, project_df: pd.DataFrame | None = None) -> tuple[date, date] | None:
+    """
+    Date range a schedule needs its calendars compiled over.
+
+    Scans the TASK and PROJECT dates once. Dates with a year outside
+    `VALID_YEARS` (placeholders such as 0001 or 9999 left by bad exports) are
+    logged and ignored, so they do not make every calendar span thousands of
+    years. The range is widened to whole years, so updates of the same
+    programme share compiled calendars in the calendar cache. Calendars still
+    grow on demand when arithmetic runs past the horizon.
+
+    Args:
+        task_df (pd.DataFrame | None): TASK table
+        project_df (pd.DataFrame | None): PROJECT table
+
+    Returns:
+        tuple[date, date] | None: first and last day of the horizon, or None
+            if the tables hold no valid dates
+    """
+    first, last = None, None
+    for df, columns in ((task_df, TASK_DATE_COLUMNS), (project_df, PROJECT_DATE_COLUMNS)):
+        if df is None or df.empty:
+            continue
+        for column in columns:
+            if column not in df.columns:
+                continue
+            values = df[column].dropna().astype(str)
+            years = pd.to_numeric(values.str.slice(0, 4), errors='coerce')
+            valid = years.between(*VALID_YEARS)
+            bad = int((years.notna() & ~valid).sum())
+            if bad:
+                logging.warning(f"Ignoring {bad} {column} value(s) outside the years {VALID_YEARS[0]}-{VALID_YEARS[1]}")
+            dates = pd.to_datetime(values[valid].str.slice(0, 10), format='%Y-%m-%d', errors='coerce').dropna()
+            if dates.empty:
+                continue
+            low, high = dates.min().date(), dates.max().date()
+            first = low if first is None else min(first, low)
+            last = high if last is None else max(last, high)
+    if first is None:
+        return None
+    return date(first.year, 1, 1), date(last.year, 12, 31)
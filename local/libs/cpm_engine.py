@@ -0,0 +1,1682 @@
+import copy
+import heapq
+import logging
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+from xerparser.src.network import NO_CALENDAR, PRED_TYPES, RelationshipNetwork, gather_ranges
+from local.libs.compiled_calendar import MINUTES_PER_DAY, VALID_YEARS, CalendarSet, CompiledCalendar
+from local.libs.wbs_index import WBSIndex
+
+NAT = np.iinfo(np.int64).min
+"""Integer value of NaT; marks dates that are not set."""
+
+FS, SS, FF, SF = range(4)
+MILESTONE_TYPES = ('TT_Mile', 'TT_FinMile')
+DURATION_TYPES = ('TT_Task', 'TT_Rsrc', 'TT_LOE')
+FLOAT_PATH_RANKINGS = ('free_float', 'total_float')
+
+# constraint operations, applied in the order of the primary and secondary constraint
+CSTR_OPS = {
+    'CS_ALAP': 1,  # dates are only normalized
+    'CS_MANDSTART': 2, 'CS_MSO': 2,
+    'CS_MSOA': 3,
+    'CS_MSOB': 4,
+    'CS_MANDFIN': 5, 'CS_MEO': 5,
+    'CS_MEOA': 6,
+    'CS_MEOB': 7,
+}
+
+_EPOCH_DAY = pd.Timestamp(0).toordinal()  # ordinal of datetime64 day 0
+# share of the levels `_Propagation` visits before it leaves the rest to the full pass; a step of it costs about ten
+# of those, and a propagation that gets this far usually goes on through most of the network
+_PROPAGATION_SHARE = .05
+# arrays edits and passes write, shared read-only between copies until one of them writes
+_COPY_ON_WRITE = ('duration', 'level', 'in_degree', 'out_degree', 'edge_type', 'edge_lag', 'edge_order',
+                  'early_start', 'early_finish', 'late_start', 'late_finish', 'total_float', 'driving_edge')
+
+
+def _to_minutes(values) -> np.ndarray:
+    """Minutes since 1970 of dates or date strings; NAT where missing or invalid."""
+    dates = pd.to_datetime(pd.Series(values), errors='coerce')
+    return dates.to_numpy(dtype='datetime64[m]').astype(np.int64)
+
+
+def _valid_minutes(values, column: str) -> np.ndarray:
+    """
+    `_to_minutes`, with dates outside `VALID_YEARS` logged and dropped: they
+    are placeholders of bad exports, and calendars cannot reach them.
+    """
+    minutes = _to_minutes(values)
+    years = minutes.astype('datetime64[m]').astype('datetime64[Y]').astype(np.int64) + 1970
+    bad = (minutes != NAT) & ((years < VALID_YEARS[0]) | (years > VALID_YEARS[1]))
+    if bad.any():
+        logging.getLogger('CPMEngine').warning(
+            f"Ignoring {int(bad.sum())} {column} value(s) outside the years {VALID_YEARS[0]}-{VALID_YEARS[1]}")
+        minutes[bad] = NAT
+    return minutes
+
+
+def _first_max(values: np.ndarray, segments: np.ndarray, maxima: np.ndarray) -> np.ndarray:
+    """Position of the first largest value of every `reduceat` segment."""
+    hits = np.flatnonzero(values == np.repeat(maxima, np.diff(np.append(segments, values.size))))
+    # every segment holds its maximum, so its first hit is the first one at or after its start
+    return hits[np.searchsorted(hits, segments)]
+
+
+def _split(values: np.ndarray, cuts) -> list[np.ndarray]:
+    """`np.split` at sorted positions, without its per-part overhead on thousands of levels."""
+    bounds = [0, *np.asarray(cuts, dtype=np.int64).tolist(), len(values)]
+    return [values[first:last] for first, last in zip(bounds[:-1], bounds[1:])]
+
+
+def _floor_day(minutes: np.ndarray) -> np.ndarray:
+    return np.where(minutes == NAT, NAT, minutes - minutes % MINUTES_PER_DAY)
+
+
+class _StackedDays:
+    """
+    Working-day arithmetic for several compiled calendars in one `searchsorted`.
+
+    The running working-day counts of the calendars are laid end to end, each
+    shifted past the last count of the one before, so one sorted array serves
+    every calendar. Steps that leave the compiled range of a calendar are
+    handed to the calendar itself, which grows, and the stack is rebuilt.
+    """
+
+    def __init__(self, calendars: list[CompiledCalendar]) -> None:
+        self.calendars = calendars
+        self._stack()
+
+    def _stack(self) -> None:
+        # one snapshot per calendar, as calendars shared through the cache may grow meanwhile
+        ranges = [calendar.compiled for calendar in self.calendars]
+        sizes = np.array([compiled.working.size for compiled in ranges], dtype=np.int64)
+        self.starts = np.cumsum(sizes) - sizes
+        self.ends = self.starts + sizes
+        self.origins = np.array([compiled.origin for compiled in ranges], dtype=np.int64)
+        totals = np.array([compiled.cumulative[-1] if compiled.cumulative.size else 0
+                           for compiled in ranges], dtype=np.int64)
+        self.bases = np.cumsum(totals + 1) - (totals + 1)
+        self.working = np.concatenate([compiled.working for compiled in ranges] or [np.zeros(0, bool)])
+        self.cumulative = np.concatenate(
+            [compiled.cumulative + base for compiled, base in zip(ranges, self.bases)]
+            or [np.zeros(0, np.int64)])
+
+    def add_days(self, ordinals: np.ndarray, days: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """`CompiledCalendar.add_working_days` of each row in the calendar of its code."""
+        index = ordinals - self.origins[codes] + self.starts[codes]
+        inside = (index >= self.starts[codes]) & (index < self.ends[codes])
+        index = np.where(inside, index, 0)
+        count = self.cumulative[index] - self.bases[codes]
+        target = np.where(days > 0, count + days, count - self.working[index] + days + 1)
+        found = np.searchsorted(self.cumulative, target + self.bases[codes], side='left')
+        valid = inside & (target >= 1) & (found < self.ends[codes])
+        result = found - self.starts[codes] + self.origins[codes]
+        if not valid.all():
+            for code in np.unique(codes[~valid]):
+                rows = np.flatnonzero(~valid & (codes == code))
+                result[rows] = self.calendars[code].add_working_days(ordinals[rows], days[rows])
+            self._stack()
+        return result
+
+
+class _SubtreeRollup:
+    """
+    Rolls activity values up into WBS summaries.
+
+    A summary takes the reduction of the values of its subtasks that come
+    before it in `order`. Activities are swept in that order into one running
+    reduction per WBS element, so a summary reads the elements of its WBS
+    subtree, a contiguous range of tour entries, instead of its subtasks.
+    Summaries have to be rolled up in `order`, after every activity before
+    them has its final value. `values` may have a second axis of iterations,
+    each rolled up on its own.
+    """
+
+    def __init__(self, engine: 'CPMEngine', values: np.ndarray, ufunc: np.ufunc, order: np.ndarray) -> None:
+        self.values, self.ufunc, self.order = values, ufunc, order
+        self.entry, self.bounds = engine.wbs_entry, engine.wbs_bounds
+        self.sweep = np.argsort(order, kind='stable')
+        self.keys = order[self.sweep]
+        self.swept = 0
+        elements = int(self.bounds[:, 1].max()) if self.bounds.size else 0
+        if values.dtype.kind == 'f':
+            self.identity = np.inf if ufunc is np.minimum else -np.inf
+        else:
+            self.identity = np.iinfo(np.int64).max if ufunc is np.minimum else NAT
+        self.reduced = np.full((elements, *values.shape[1:]), self.identity, dtype=values.dtype)
+        self.found = np.zeros(self.reduced.shape, dtype=bool)
+
+    def _advance(self, key) -> None:
+        stop = int(np.searchsorted(self.keys, key, side='left'))
+        nodes = self.sweep[self.swept:stop]
+        self.swept = stop
+        nodes = nodes[self.entry[nodes] >= 0]
+        values = self.values[nodes]
+        found = ~np.isnan(values) if values.dtype.kind == 'f' else values != NAT
+        if values.ndim == 1:
+            self.ufunc.at(self.reduced, self.entry[nodes][found], values[found])
+            self.found[self.entry[nodes][found]] = True
+        elif nodes.size:
+            # one reduction per element, ufunc.at is slow on rows
+            sort = np.argsort(self.entry[nodes], kind='stable')
+            entries = self.entry[nodes][sort]
+            starts = np.flatnonzero(np.r_[True, entries[1:] != entries[:-1]])
+            elements = entries[starts]
+            values = self.ufunc.reduceat(np.where(found, values, self.identity)[sort], starts, axis=0)
+            self.reduced[elements] = self.ufunc(self.reduced[elements], values)
+            self.found[elements] |= np.logical_or.reduceat(found[sort], starts, axis=0)
+
+    def roll_up(self, summaries: np.ndarray, fallback: np.ndarray, lower=None) -> None:
+        """Set `summaries`, given in sweep order, to their rollup or to `fallback`."""
+        for node, default in zip(summaries, fallback):
+            self._advance(self.order[node])
+            first, last = self.bounds[node]
+            if self.values.ndim == 1:
+                found = self.found[first:last]
+                value = self.ufunc.reduce(self.reduced[first:last][found]) if found.any() else default
+                self.values[node] = value if lower is None else max(value, lower)
+            else:
+                value = self.ufunc.reduce(self.reduced[first:last], axis=0, initial=self.identity)
+                value = np.where(self.found[first:last].any(axis=0), value, default)
+                self.values[node] = value if lower is None else np.maximum(value, lower)
+
+
+class _Propagation:
+    """
+    An incremental pass over the nodes an edit can move.
+
+    Nodes wait in a heap keyed by level, in pass order. Each step takes the
+    waiting nodes of the next level and schedules them together with the
+    level step of the full pass. Nodes whose dates moved put the nodes that
+    read them on the heap: their successors going forward, their
+    predecessors going backward, and the WBS summaries over them that are
+    processed after them. The work is in proportion to the nodes visited and
+    their relationships, however large or deep the network is, but each step
+    costs several of the full pass, so a propagation that reaches too many
+    levels stops and leaves the rest to the full pass.
+    """
+
+    def __init__(self, engine: 'CPMEngine', planned: np.ndarray, forward: bool) -> None:
+        self.engine, self.planned, self.forward = engine, planned, forward
+        self.dates = (engine.early_start, engine.early_finish) if forward else (engine.late_start, engine.late_finish)
+        self.pending: dict[int, set] = {}
+        self.heap: list[int] = []
+        self.moved: list[np.ndarray] = []
+        self.steps_left = max(64, int(engine.level.max(initial=0) * _PROPAGATION_SHARE))
+        # whether a neighbour of an LOE activity moved
+        self.loe_moved = False
+
+    def push(self, nodes: np.ndarray) -> None:
+        """Wait for the planned nodes among `nodes`."""
+        nodes = nodes[self.planned[nodes]]
+        for node, level in zip(nodes.tolist(), self.engine.level[nodes].tolist()):
+            key = level if self.forward else -level
+            if key not in self.pending:
+                self.pending[key] = set()
+                heapq.heappush(self.heap, key)
+            self.pending[key].add(node)
+
+    def apply(self, nodes: np.ndarray, step) -> None:
+        """Run `step(nodes)` and take in the nodes whose dates it moved."""
+        first, second = self.dates
+        before = first[nodes], second[nodes]
+        step(nodes)
+        moved = (first[nodes] != before[0]) | (second[nodes] != before[1])
+        nodes = nodes[moved]
+        if not nodes.size:
+            return
+        self.moved.append(nodes)
+        engine, network = self.engine, self.engine.network
+        successors = network.edge_succ[gather_ranges(network.succ_indptr, nodes)]
+        predecessors = network.edge_pred[network.pred_edges[gather_ranges(network.pred_indptr, nodes)]]
+        # LOE activities read the starts of their predecessors and the finishes of their successors
+        self.loe_moved |= bool(engine.is_loe[successors].any() or engine.is_loe[predecessors].any())
+        self.push(successors if self.forward else predecessors)
+        if engine.wbs_summaries.size:
+            # summaries read the early finishes of their subtasks going forward and their late starts going backward
+            rolled = second if self.forward else first
+            self.push(self._summaries_reached(nodes, before[1 if self.forward else 0][moved], rolled[nodes]))
+
+    def _summaries_reached(self, nodes: np.ndarray, old: np.ndarray, new: np.ndarray) -> np.ndarray:
+        """
+        The WBS summaries processed after `nodes` that the move of their
+        rolled up dates from `old` to `new` changes.
+
+        A summary keeps the latest early finish (the earliest late start, but
+        not before the data date) of its subtasks, so a subtask moves it only
+        if it passes that date now, or held it before, no longer does, and no
+        other subtask still holds it; see `CPMEngine._still_held`.
+        """
+        engine, rank = self.engine, self.engine.rank
+        # subtasks that only now come before a summary never held its date; see `CPMEngine._crossings`
+        rank_before = rank if engine._order_before is None else engine._order_before[1]
+        summaries = engine._summaries_over(nodes)
+        if not summaries.size:
+            return summaries
+        unset = (old == NAT) | (new == NAT)
+        first, last = engine.wbs_bounds[summaries].T
+        entries = engine.wbs_entry[nodes]
+        over = (first[:, None] <= entries) & (entries < last[:, None])
+        if self.forward:
+            held = engine.early_finish[summaries]
+            over &= rank[nodes] < rank[summaries][:, None]
+            stayed = rank_before[nodes] < rank_before[summaries][:, None]
+            passed = unset | (new > held[:, None])
+            left = stayed & (old >= held[:, None]) & (new < held[:, None])
+        else:
+            held, dd = engine.late_start[summaries], engine.data_date
+            over &= rank[nodes] > rank[summaries][:, None]
+            stayed = rank_before[nodes] > rank_before[summaries][:, None]
+            passed = unset | (np.maximum(new, dd) < held[:, None])
+            left = stayed & (np.maximum(old, dd) <= held[:, None]) & (np.maximum(new, dd) > held[:, None])
+        passed = (over & passed).any(axis=1)
+        left = np.flatnonzero((over & left).any(axis=1) & ~passed & self.planned[summaries])
+        if left.size:
+            passed[left] = ~engine._still_held(summaries[left], self.forward)
+        return summaries[passed]
+
+    def run(self, step) -> np.ndarray | None:
+        """
+        Apply `step` to the waiting nodes level by level; the nodes that moved,
+        or None when it ran out of steps before the heap did.
+        """
+        engine = self.engine
+        while self.heap:
+            if not self.steps_left:
+                return None
+            self.steps_left -= 1
+            nodes = np.fromiter(self.pending.pop(heapq.heappop(self.heap)), dtype=np.int64)
+            # the order inside a level only matters to WBS summaries
+            nodes = nodes[np.argsort(engine.rank[nodes])] if engine.is_wbs[nodes].any() else np.sort(nodes)
+            self.apply(nodes, step)
+        return np.concatenate(self.moved) if self.moved else np.zeros(0, dtype=np.int64)
+
+
+class CPMEngine:
+    """
+    Critical path scheduler over integer arrays.
+
+    The activities are the rows of the TASK table. Dates are int64 minutes
+    since 1970 (`datetime64[m]` values, `NAT` when unset) and relationships
+    are the edge arrays of a `RelationshipNetwork`. The forward and backward
+    passes walk the topological levels of the network and relax every edge
+    into a level at once, so the Python work is per level, not per activity.
+
+    The passes follow `TotalFloatCPMCalculator`: durations are whole working
+    days of the activity calendar, lags are elapsed time, activities started
+    before the data date keep their actual dates, and LOE and WBS summary
+    activities are rolled up from their neighbours and subtasks in the order
+    `networkx.topological_sort` would visit them.
+
+    Args:
+        task_df (pd.DataFrame): TASK table
+        taskpred_df (pd.DataFrame | None): TASKPRED table
+        calendars (CalendarSet): compiled calendars, e.g. `WorkingDayCalculator.calendars`
+        data_date: data date of the schedule
+        project_start: planned start of the project; defaults to the data date
+        projwbs_df (pd.DataFrame | None): PROJWBS table, used to find the
+            subtasks of WBS summary activities
+        exclude_edges (Iterable[tuple]): (pred_task_id, task_id) relationships
+            to leave out, e.g. relationships removed to break logic loops
+    """
+
+    def __init__(self, task_df: pd.DataFrame, taskpred_df: pd.DataFrame | None, calendars: CalendarSet,
+                 data_date, project_start=None, projwbs_df: pd.DataFrame | None = None,
+                 exclude_edges: Iterable[tuple] = ()) -> None:
+        self.logger = logging.getLogger('CPMEngine')
+        self.calendars = calendars
+        self.data_date = int(_to_minutes([data_date])[0])
+        if self.data_date == NAT:
+            raise ValueError("A data date is required to schedule")
+        start = int(_valid_minutes([project_start], 'plan_start_date')[0])
+        self.project_start = self.data_date if start == NAT else start
+
+        self.task_ids = task_df['task_id'].astype(str).to_numpy(dtype=object)
+        self.task_index = pd.Index(self.task_ids)
+        n = len(self.task_ids)
+        task_type = task_df['task_type'].to_numpy(dtype=object)
+        self.is_loe = task_type == 'TT_LOE'
+        self.is_wbs = task_type == 'TT_WBS'
+        self.is_milestone = np.isin(task_type, MILESTONE_TYPES)
+        hours = pd.to_numeric(task_df['target_drtn_hr_cnt'], errors='coerce').to_numpy(dtype=np.float64)
+        days = np.floor_divide(np.nan_to_num(hours), 24).astype(np.int64)
+        self.has_duration = np.isin(task_type, DURATION_TYPES)
+        self.duration = np.where(self.has_duration, days, 0)
+
+        self.act_start = _valid_minutes(task_df['act_start_date'], 'act_start_date')
+        self.act_end = _valid_minutes(task_df['act_end_date'], 'act_end_date')
+        self.cstr_op = []
+        self.cstr_date = []
+        for type_col, date_col in (('cstr_type', 'cstr_date'), ('cstr_type2', 'cstr_date2')):
+            if type_col in task_df.columns and date_col in task_df.columns:
+                dates = _floor_day(_valid_minutes(task_df[date_col], date_col))
+                ops = task_df[type_col].map(CSTR_OPS).fillna(0).to_numpy(dtype=np.int8)
+                self.cstr_op.append(np.where(dates == NAT, 0, ops).astype(np.int8))
+                self.cstr_date.append(dates)
+        self.constrained = np.logical_or.reduce([op > 0 for op in self.cstr_op]) if self.cstr_op else np.zeros(n, bool)
+
+        self._build_network(task_df, taskpred_df, exclude_edges)
+        self._calendars = [calendars.get(clndr_id) for clndr_id in self.network.clndr_ids]
+        self.task_clndr = self.network.task_clndr
+        if (self.task_clndr == NO_CALENDAR).any():
+            # activities without a calendar are scheduled on a default one, after the named ones
+            self.task_clndr = np.where(self.task_clndr == NO_CALENDAR, len(self._calendars), self.task_clndr)
+            self._calendars.append(calendars.get(''))
+        known = np.concatenate([dates[dates != NAT] for dates in (self.act_start, self.act_end, *self.cstr_date)]
+                               + [np.array([self.data_date, self.project_start])])
+        first, last = known.min() // MINUTES_PER_DAY + _EPOCH_DAY, known.max() // MINUTES_PER_DAY + _EPOCH_DAY
+        for calendar in self._calendars:
+            calendar.ensure(first, last)
+        self._days = _StackedDays(self._calendars)
+        self.level = self.network.topological_levels()
+        self.in_degree = self.network.in_degree()
+        self.out_degree = self.network.out_degree()
+        self._rank = None
+        # levels the processing ranks were worked out for, the first rank of each of them, and the nodes
+        # whose predecessors changed since
+        self._rank_level = None
+        self._rank_first = None
+        self._rank_edited = set()
+        # LOE activities and their relationships grouped by LOE activity, by direction; see `_roll_up_loe`
+        self._loe_edges = {}
+        self._subtask_order, self._subtask_ranges = self._wbs_subtasks(task_df, projwbs_df)
+        self.wbs_summaries = np.flatnonzero(self.is_wbs)
+        self._summary_bounds = np.ascontiguousarray(self.wbs_bounds[self.wbs_summaries].T)
+        # whether each node of the WBS tour is one a summary rolls up the dates of
+        self._tour_rolls_up = ~self.is_loe[self._subtask_order]
+        # the subtask each summary was last found to hold its late start (row 0) or early finish (row 1)
+        # from; only a hint, checked before it is trusted, so copies of the engine share it
+        self._holders = np.full((2, n), -1, dtype=np.int64)
+
+        self.early_start = np.full(n, NAT, dtype=np.int64)
+        self.early_finish = np.full(n, NAT, dtype=np.int64)
+        self.late_start = np.full(n, NAT, dtype=np.int64)
+        self.late_finish = np.full(n, NAT, dtype=np.int64)
+        self.total_float = np.full(n, np.nan)
+        # relationship whose predecessor sets the early start of each node, -1 where none does
+        self.driving_edge = np.full(n, -1, dtype=np.int64)
+        # nodes whose early (forward) or late (backward) dates are out of date after edits
+        self._forward_roots = set()
+        self._backward_roots = set()
+        # levels and processing ranks from before the first relationship edit since the last pass, and the
+        # levels ordered differently since then; None when every level may have been
+        self._order_before = None
+        self._reordered_levels = None
+        self._scheduled = False
+
+    @classmethod
+    def from_xer(cls, xer, calendars: CalendarSet, exclude_edges: Iterable[tuple] = ()) -> "CPMEngine":
+        """Engine for the first project of an Xer."""
+        project = xer.project_df.iloc[0]
+        return cls(xer.task_df, xer.taskpred_df, calendars, project['last_recalc_date'],
+                   project.get('plan_start_date'), getattr(xer, 'projwbs_df', None), exclude_edges)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.task_ids)
+
+    @property
+    def rank(self) -> np.ndarray:
+        """Processing rank of every node, worked out when first needed after a change of the network."""
+        if self._rank is None:
+            self._rank = self._processing_rank()
+        elif self._rank_edited:
+            self._rank = self._updated_rank()
+        else:
+            return self._rank
+        self._rank_level = self.level.copy()
+        self._rank_edited = set()
+        return self._rank
+
+    @property
+    def project_end(self) -> int:
+        """Latest early finish; the data date before the forward pass."""
+        # NAT is the smallest int64, so unset finishes never come out on top
+        latest = int(self.early_finish.max(initial=NAT))
+        return latest if latest != NAT else self.data_date
+
+    def _build_network(self, task_df: pd.DataFrame, taskpred_df: pd.DataFrame | None,
+                       exclude_edges: Iterable[tuple]) -> None:
+        """Network of distinct relationships; the last row of a duplicated pair wins, as in a DiGraph."""
+        n = len(self.task_ids)
+        if taskpred_df is None or taskpred_df.empty:
+            taskpred_df = pd.DataFrame(columns=['task_pred_id', 'task_id', 'pred_task_id', 'pred_type', 'lag_hr_cnt'])
+        index = self.task_index
+        pred = index.get_indexer(taskpred_df['pred_task_id'].astype(str))
+        succ = index.get_indexer(taskpred_df['task_id'].astype(str))
+        keys = pred.astype(np.int64) * n + succ
+        valid = (pred >= 0) & (succ >= 0)
+        excluded = [(str(p), str(s)) for p, s in exclude_edges]
+        if excluded:
+            pairs = np.array(excluded, dtype=object).reshape(-1, 2)
+            excluded_keys = index.get_indexer(pairs[:, 0]).astype(np.int64) * n + index.get_indexer(pairs[:, 1])
+            valid &= ~np.isin(keys, excluded_keys)
+        if (~valid).any():
+            self.logger.info(f"{int((~valid).sum())} relationship(s) left out of the schedule")
+
+        rows = np.flatnonzero(valid)
+        keys = keys[rows]
+        # adjacency order of a DiGraph follows the first row of each pair
+        first_row = pd.Series(rows).groupby(keys).transform('first').to_numpy()
+        last = ~pd.Series(keys).duplicated(keep='last').to_numpy()
+        edges = taskpred_df.iloc[rows[last]]
+        self.network = RelationshipNetwork.from_frames(task_df, edges)
+
+        network = self.network
+        position = pd.Index(keys[last]).get_indexer(network.edge_pred.astype(np.int64) * n + network.edge_succ)
+        self.edge_order = first_row[last][position]
+        # relationships of an unknown type keep their place in the network but never drive a date
+        edge_type = pd.Categorical(edges['pred_type'].to_numpy(), categories=PRED_TYPES).codes
+        self.edge_type = edge_type[position].astype(np.int8)
+        self.edge_lag = np.round(network.lag_hr * 60).astype(np.int64)
+
+    def _processing_rank(self) -> np.ndarray:
+        """
+        Position of every node in the order of `networkx.topological_sort` on
+        the equivalent DiGraph: level by level, level 0 in table order and
+        every later node after the last predecessor that releases it.
+        """
+        rank = np.full(self.node_count, -1, dtype=np.int64)
+        first = [0]
+        for depth, nodes in enumerate(self._levels()):
+            rank[self._release_order(nodes, depth, rank)] = first[-1] + np.arange(nodes.size)
+            first.append(first[-1] + nodes.size)
+        self._rank_first = np.array(first, dtype=np.int64)
+        if (rank < 0).any():
+            self.logger.error(f"{int((rank < 0).sum())} activities are on or after a logic loop")
+        return rank
+
+    def _updated_rank(self) -> np.ndarray:
+        """
+        `_processing_rank` after relationship edits, from the last ranks.
+
+        A level is ordered again only when it gained or lost nodes, or when
+        the predecessors of its nodes, or the order of those predecessors,
+        changed; the others keep their order and only move by the number of
+        nodes that joined or left the levels before them.
+        """
+        level, before, old = self.level, self._rank_level, self._rank
+        if (level < 0).any() or (before < 0).any():
+            self._reordered_levels = None
+            return self._processing_rank()
+        moved = np.flatnonzero(level != before)
+        first_before = self._rank_first
+        levels = max(int(level.max()) + 1, first_before.size - 1)
+        first_before = np.append(first_before, np.full(levels + 1 - first_before.size, first_before[-1]))
+        shift = np.bincount(level[moved], minlength=levels) - np.bincount(before[moved], minlength=levels)
+        first = first_before + np.append(0, np.cumsum(shift))
+        rank = old + (first - first_before)[level]
+        self._rank_first = first
+        # levels that gained or lost nodes, and the levels of nodes with a predecessor that moved or was linked
+        network = self.network
+        edited = np.append(network.edge_succ[gather_ranges(network.succ_indptr, moved)],
+                           np.fromiter(self._rank_edited, dtype=np.int64, count=len(self._rank_edited)))
+        heap = np.unique(np.concatenate((level[moved], before[moved], level[edited]))).tolist()
+        by_level, depth, ordered = None, -1, 0
+        while heap:
+            if heap[0] == depth:
+                heapq.heappop(heap)
+                continue
+            depth = heapq.heappop(heap)
+            ordered += 1
+            if by_level is None and ordered > 256:
+                # sorting the nodes by level once is quicker than looking for the nodes of many levels
+                by_level = self._levels()
+            if by_level is None:
+                nodes = np.flatnonzero(level == depth)
+            else:
+                nodes = by_level[depth] if depth < len(by_level) else np.zeros(0, dtype=np.int64)
+            if not nodes.size:
+                # the levels after the last one left are empty as well
+                continue
+            nodes = self._release_order(nodes, depth, rank)
+            rank[nodes] = first[depth] + np.arange(nodes.size)
+            # the successors of nodes that joined or left the level are queued already
+            stayed = nodes[before[nodes] == depth]
+            if not (np.diff(old[stayed]) > 0).all():
+                if self._reordered_levels is not None:
+                    self._reordered_levels.add(depth)
+                # the level after it is released in a different order
+                heapq.heappush(heap, depth + 1)
+        return rank
+
+    def _levels(self) -> list[np.ndarray]:
+        """Nodes of every topological level, in table order."""
+        level = self.level
+        scheduled = np.flatnonzero(level >= 0)
+        if not scheduled.size:
+            return []
+        return _split(scheduled[np.argsort(level[scheduled], kind='stable')], np.cumsum(np.bincount(level[scheduled]))[:-1])
+
+    def _release_order(self, nodes: np.ndarray, depth: int, rank: np.ndarray) -> np.ndarray:
+        """The nodes of level `depth` in processing order, from the ranks of the level before."""
+        if depth == 0:
+            return nodes
+        network, level = self.network, self.level
+        edges = network.pred_edges[gather_ranges(network.pred_indptr, nodes)]
+        edges = edges[level[network.edge_pred[edges]] == depth - 1]
+        pred_rank = rank[network.edge_pred[edges]]
+        succ = network.edge_succ[edges]
+        # the predecessor processed last releases the node
+        order = np.lexsort((pred_rank, succ))
+        edges, pred_rank, succ = edges[order], pred_rank[order], succ[order]
+        releasing = np.append(succ[1:] != succ[:-1], True)
+        edges, pred_rank, succ = edges[releasing], pred_rank[releasing], succ[releasing]
+        return succ[np.lexsort((self.edge_order[edges], pred_rank))]
+
+    def _wbs_subtasks(self, task_df: pd.DataFrame, projwbs_df: pd.DataFrame | None):
+        """
+        Subtasks of WBS summary activities: the activities assigned to the
+        summary's WBS element or to any element below it.
+
+        Returns:
+            tuple: nodes sorted by the WBS tour and a (first, last) slice into
+                them for every node
+        """
+        n = self.node_count
+        ranges = np.zeros((n, 2), dtype=np.int64)
+        self.wbs_entry = np.full(n, -1, dtype=np.int64)
+        self.wbs_bounds = np.zeros((n, 2), dtype=np.int64)
+        if projwbs_df is None or projwbs_df.empty or not self.is_wbs.any():
+            return np.zeros(0, dtype=np.int64), ranges
+        index = WBSIndex(projwbs_df)
+        wbs_ids = task_df['wbs_id'].to_numpy(dtype=object)
+        self.wbs_entry = index.entries(wbs_ids)
+        self.wbs_bounds = np.column_stack(index.bounds(wbs_ids))
+        nodes, entries = index.sort_activities(wbs_ids)
+        summaries = np.flatnonzero(self.is_wbs)
+        ranges[summaries] = index.subtree_slices(entries, wbs_ids[summaries])
+        return nodes, ranges
+
+    def subtasks(self, node: int) -> np.ndarray:
+        """Subtask nodes of a WBS summary activity."""
+        first, last = self._subtask_ranges[node]
+        nodes = self._subtask_order[first:last]
+        return nodes[nodes != node]
+
+    def _add_days(self, minutes: np.ndarray, days: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+        """Midnight of the working day `days` after the date of each time, in the calendar of each node."""
+        result = minutes // MINUTES_PER_DAY + _EPOCH_DAY
+        moving = np.flatnonzero(days != 0)
+        if moving.size:
+            result[moving] = self._days.add_days(result[moving], days[moving], self.task_clndr[nodes[moving]])
+        return (result - _EPOCH_DAY) * MINUTES_PER_DAY
+
+    def _days_between(self, first: np.ndarray, last: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+        result = np.empty(nodes.size, dtype=np.int64)
+        codes = self.task_clndr[nodes]
+        for code in np.unique(codes):
+            rows = np.flatnonzero(codes == code)
+            result[rows] = self._calendars[code].working_days_between(
+                first[rows] // MINUTES_PER_DAY + _EPOCH_DAY, last[rows] // MINUTES_PER_DAY + _EPOCH_DAY)
+        return result
+
+    def _constrain(self, nodes: np.ndarray, dates: np.ndarray, ops: tuple[int, int, int]) -> np.ndarray:
+        """
+        Apply the constraints of `nodes` that act on a start (2, 3, 4) or a
+        finish (5, 6, 7); `dates` may have a second axis of iterations.
+        """
+        set_op, max_op, min_op = ops
+        shape = (-1,) + (1,) * (dates.ndim - 1)
+        for cstr_op, cstr_date in zip(self.cstr_op, self.cstr_date):
+            op, date = cstr_op[nodes].reshape(shape), cstr_date[nodes].reshape(shape)
+            dates = np.where(op > 0, _floor_day(dates), dates)
+            dates = np.where(op == set_op, date, dates)
+            dates = np.where(op == max_op, np.maximum(dates, date), dates)
+            dates = np.where(op == min_op, np.minimum(dates, date), dates)
+        return dates
+
+    def schedule(self) -> "CPMEngine":
+        """Run the forward pass, the backward pass and the total float calculation."""
+        self.forward_pass()
+        self.backward_pass()
+        self.calculate_total_float()
+        self._clear_edits()
+        self._scheduled = True
+        return self
+
+    def _clear_edits(self) -> None:
+        self._forward_roots.clear()
+        self._backward_roots.clear()
+        self._order_before = None
+
+    def copy(self) -> "CPMEngine":
+        """
+        Engine sharing the network, calendars and activity data of this one.
+
+        The arrays edits and passes change are shared too, read-only, and each
+        engine copies an array only when it first writes it, so a copy costs
+        only the arrays its own edits and passes touch.
+        """
+        clone = copy.copy(self)
+        for name in _COPY_ON_WRITE:
+            array = getattr(self, name)
+            array.flags.writeable = False
+            setattr(clone, name, array)
+        clone._loe_edges = dict(self._loe_edges)
+        clone._rank_edited = set(self._rank_edited)
+        clone._forward_roots = set(self._forward_roots)
+        clone._backward_roots = set(self._backward_roots)
+        if self._reordered_levels is not None:
+            clone._reordered_levels = set(self._reordered_levels)
+        return clone
+
+    def _writable(self, *names: str) -> None:
+        """Give this engine its own copy of the named arrays it still shares with other copies."""
+        for name in names:
+            array = getattr(self, name)
+            if not array.flags.writeable:
+                setattr(self, name, array.copy())
+
+    def evaluate_scenarios(self, scenarios: Iterable, workers: int | None = None) -> list:
+        """
+        Schedule what-if variants of this network without changing it.
+
+        Args:
+            scenarios (Iterable): `Scenario` objects or mappings of their fields
+            workers (int | None, optional): number of worker processes; 1
+                evaluates in the calling process. Defaults to the number of CPUs.
+
+        Returns:
+            list[ScenarioResult]: one result per scenario, in order
+        """
+        from local.libs.scenarios import evaluate_scenarios
+        return evaluate_scenarios(self, scenarios, workers)
+
+    def _node(self, task_id) -> int:
+        try:
+            return int(self.task_index.get_loc(str(task_id)))
+        except KeyError:
+            raise ValueError(f"Unknown activity {task_id}") from None
+
+    def update_duration(self, task_id, hours: float) -> None:
+        """
+        Change the target duration of an activity; `recompute` reschedules.
+
+        Only task, resource dependent and LOE activities have a duration, in
+        whole days of `hours`.
+        """
+        node = self._node(task_id)
+        self._writable('duration')
+        self.duration[node] = int(hours // 24) if self.has_duration[node] else 0
+        self._forward_roots.add(node)
+        self._backward_roots.add(node)
+
+    def add_relationship(self, pred_task_id, task_id, pred_type: str = 'PR_FS', lag_hr: float = 0.0,
+                         task_pred_id: str = '') -> None:
+        """
+        Add a relationship; `recompute` reschedules.
+
+        A relationship between the same two activities is replaced, as in a
+        DiGraph: it takes the new type and lag, and the new task_pred_id if
+        one is given, and keeps its place among the predecessor's
+        relationships.
+
+        Raises:
+            ValueError: for unknown activities, or when the relationship would
+                close a logic loop
+        """
+        pred, succ = self._node(pred_task_id), self._node(task_id)
+        kind = PRED_TYPES.index(pred_type) if pred_type in PRED_TYPES else -1
+        edge = self.network.edge_index(pred, succ)
+        if edge >= 0:
+            self.network = self.network.update_edge(edge, max(kind, 0), lag_hr, task_pred_id)
+            self._writable('edge_type', 'edge_lag')
+            self.edge_type[edge] = kind
+            self.edge_lag[edge] = round(lag_hr * 60)
+        else:
+            if pred == succ or self._reaches(succ, pred):
+                raise ValueError(f"Relationship {pred_task_id} -> {task_id} would close a logic loop")
+            self.network, edge = self.network.insert_edge(pred, succ, max(kind, 0), lag_hr, task_pred_id)
+            self.edge_type = np.insert(self.edge_type, edge, kind)
+            self.edge_lag = np.insert(self.edge_lag, edge, round(lag_hr * 60))
+            # like a DiGraph, a new relationship comes last in adjacency order
+            self.edge_order = np.insert(self.edge_order, edge, self.edge_order.max(initial=-1) + 1)
+            self._writable('driving_edge')
+            self.driving_edge += self.driving_edge >= edge
+            self._network_changed(pred, succ, 1)
+        self._forward_roots.add(succ)
+        self._backward_roots.add(pred)
+
+    def _reaches(self, source: int, target: int) -> bool:
+        """
+        Whether a path of relationships leads from `source` to `target`.
+
+        Levels only climb along a path, so the search never looks past the
+        level of `target`.
+        """
+        network, level = self.network, self.level
+        if level[source] < 0 or level[target] < 0:
+            return bool(network.reachable([source])[target])
+        seen = np.zeros(self.node_count, dtype=bool)
+        frontier = np.array([source]) if level[source] < level[target] else np.zeros(0, dtype=np.int64)
+        while frontier.size:
+            reached = np.unique(network.edge_succ[gather_ranges(network.succ_indptr, frontier)])
+            if (reached == target).any():
+                return True
+            frontier = reached[~seen[reached] & (level[reached] < level[target])]
+            seen[frontier] = True
+        return False
+
+    def remove_relationship(self, pred_task_id, task_id) -> None:
+        """Remove a relationship; `recompute` reschedules."""
+        pred, succ = self._node(pred_task_id), self._node(task_id)
+        edge = self.network.edge_index(pred, succ)
+        if edge < 0:
+            raise ValueError(f"No relationship {pred_task_id} -> {task_id}")
+        self.network = self.network.delete_edge(edge)
+        self.edge_type = np.delete(self.edge_type, edge)
+        self.edge_lag = np.delete(self.edge_lag, edge)
+        self.edge_order = np.delete(self.edge_order, edge)
+        self._writable('driving_edge')
+        self.driving_edge[self.driving_edge == edge] = -1
+        self.driving_edge -= self.driving_edge > edge
+        self._network_changed(pred, succ, -1)
+        self._forward_roots.add(succ)
+        self._backward_roots.add(pred)
+
+    def _network_changed(self, pred: int, succ: int, change: int) -> None:
+        """Bring degrees, levels and ranks up to date after the relationship pred -> succ was added (`change` 1) or removed (-1)."""
+        if self._order_before is None and self._scheduled and self.is_wbs.any():
+            self._order_before = (self.level.copy(), self.rank)
+            self._reordered_levels = set()
+        self._writable('in_degree', 'out_degree', 'level')
+        self.in_degree[succ] += change
+        self.out_degree[pred] += change
+        self._relevel(succ)
+        self._rank_edited.add(succ)
+        if self.is_loe[pred] or self.is_loe[succ]:
+            self._loe_edges.clear()
+
+    def _relevel(self, root: int) -> None:
+        """
+        Longest-path levels after an edit of the predecessors of `root`.
+
+        Nodes are visited by their old level, so all of a node's predecessors
+        are settled before it, and only the successors of nodes whose level
+        changed are visited at all.
+        """
+        network, level = self.network, self.level
+        if (level < 0).any():
+            self._relevel_cone(root)
+            return
+        pending = {int(level[root]): {root}}
+        heap = list(pending)
+        while heap:
+            nodes = np.fromiter(pending.pop(heapq.heappop(heap)), dtype=np.int64)
+            counts = network.pred_indptr[nodes + 1] - network.pred_indptr[nodes]
+            preds = network.edge_pred[network.pred_edges[gather_ranges(network.pred_indptr, nodes)]]
+            new = np.zeros(nodes.size, dtype=level.dtype)
+            np.maximum.at(new, np.repeat(np.arange(nodes.size), counts), level[preds] + 1)
+            changed = nodes[new != level[nodes]]
+            if not changed.size:
+                continue
+            level[nodes] = new
+            for node in np.unique(network.edge_succ[gather_ranges(network.succ_indptr, changed)]).tolist():
+                key = int(level[node])
+                if key not in pending:
+                    pending[key] = set()
+                    heapq.heappush(heap, key)
+                pending[key].add(node)
+
+    def _relevel_cone(self, root: int) -> None:
+        """Longest-path levels of the nodes downstream of `root`, the only ones an edit of its predecessors moves."""
+        network, level = self.network, self.level
+        cone = network.reachable([root])
+        nodes = np.flatnonzero(cone)
+        edges = network.pred_edges[gather_ranges(network.pred_indptr, nodes)]
+        owner = network.edge_succ[edges]
+        pred = network.edge_pred[edges]
+        outside = ~cone[pred]
+        start = np.zeros(self.node_count, dtype=np.int64)
+        np.maximum.at(start, owner[outside], level[pred[outside]].astype(np.int64) + 1)
+        # nodes after a logic loop are never released
+        blocked = np.zeros(self.node_count, dtype=bool)
+        blocked[owner[outside & (level[pred] < 0)]] = True
+        remaining = np.bincount(owner[~outside], minlength=self.node_count)
+        frontier = nodes[remaining[nodes] == 0]
+        while frontier.size:
+            level[frontier] = np.where(blocked[frontier], -1, start[frontier])
+            positions = gather_ranges(network.succ_indptr, frontier)
+            succ = network.edge_succ[positions]
+            from_node = network.edge_pred[positions]
+            np.maximum.at(start, succ, level[from_node].astype(np.int64) + 1)
+            blocked[succ[level[from_node] < 0]] = True
+            candidates, counts = np.unique(succ, return_counts=True)
+            remaining[candidates] -= counts
+            frontier = candidates[remaining[candidates] == 0]
+
+    def _summaries_over(self, nodes: np.ndarray) -> np.ndarray:
+        """The WBS summaries with one of `nodes` among their subtasks."""
+        entries = np.sort(self.wbs_entry[nodes])
+        entries = entries[entries >= 0]
+        first, last = np.searchsorted(entries, self._summary_bounds)
+        return self.wbs_summaries[first < last]
+
+    def recompute(self) -> "CPMEngine":
+        """
+        Reschedule after `update_duration`, `add_relationship` and
+        `remove_relationship`.
+
+        The forward pass visits the edited nodes and follows their early dates
+        downstream only as far as they move, and the backward pass does the
+        same upstream with the late dates; see `_Propagation`. When the project
+        finish moves, every late date moves with it and the backward pass runs
+        over the whole network, as does either pass when an edit moves most of
+        it. Total float is worked out again only for the
+        nodes whose dates moved and the WBS summaries over them. The results
+        are the same as those of `schedule` on the edited network.
+        """
+        if not self._scheduled or (self.level < 0).any():
+            # nodes on or after a logic loop are left out of the passes, so a full pass settles them
+            return self.schedule()
+        if not (self._forward_roots or self._backward_roots):
+            return self
+        started, completed, waiting = self._actuals()
+        crossings = self._crossings() if self._order_before is not None else None
+        project_end = self.project_end
+        forward_roots = np.fromiter(self._forward_roots, dtype=np.int64)
+        backward_roots = np.fromiter(self._backward_roots, dtype=np.int64)
+        # an LOE activity whose own relationships were edited spans a different set of them
+        loe_edited = bool(self.is_loe[forward_roots].any() or self.is_loe[backward_roots].any())
+        moved = [forward_roots, self._reschedule_early(forward_roots, started, loe_edited, crossings)]
+        if self.project_end == project_end:
+            moved += [backward_roots, self._reschedule_late(backward_roots, waiting, loe_edited, crossings)]
+        else:
+            moved.append(self._full_pass(False))
+        self.calculate_total_float(np.unique(np.concatenate(moved)))
+        self._clear_edits()
+        return self
+
+    def _reschedule_early(self, roots: np.ndarray, started: np.ndarray, loe_edited: bool,
+                          crossings: tuple | None) -> np.ndarray:
+        """Early dates after an edit of `roots`; the nodes whose early dates moved."""
+        self._writable('early_start', 'early_finish', 'driving_edge')
+        loe = self.is_loe
+        propagation = _Propagation(self, ~started & ~loe & (self.level >= 0), forward=True)
+        propagation.loe_moved = loe_edited
+        # started activities keep their actual dates, only their remaining duration moves their finish
+        propagation.apply(roots[started[roots]], self._early_actuals)
+        propagation.push(roots)
+        latest = self._latest_finish()
+
+        def step(nodes):
+            self._forward_level(self._plan_levels(True, nodes)[0],
+                                lambda summaries, fallback: self._roll_up_summaries(summaries, fallback, True))
+
+        moved = propagation.run(step)
+        if moved is not None and crossings is not None:
+            propagation.push(self._reordered_summaries(crossings, True, propagation.planned))
+            moved = propagation.run(step)
+        if moved is None:
+            return self._full_pass(True, propagation.moved)
+        if propagation.loe_moved or self._latest_finish() != latest:
+            moved = np.concatenate([moved, self._roll_up_loe_dates(forward=True)])
+        return moved
+
+    def _reschedule_late(self, roots: np.ndarray, waiting: np.ndarray, loe_edited: bool,
+                         crossings: tuple | None) -> np.ndarray:
+        """Late dates after an edit of `roots`; the nodes whose late dates moved."""
+        self._writable('late_start', 'late_finish')
+        loe, project_end = self.is_loe, self.project_end
+        propagation = _Propagation(self, waiting & (self.level >= 0), forward=False)
+        propagation.loe_moved = loe_edited
+        propagation.apply(roots[~waiting[roots] & ~loe[roots]], self._late_actuals)
+        propagation.push(roots)
+
+        def step(nodes):
+            self._backward_level(self._plan_levels(False, nodes)[0], project_end,
+                                 lambda summaries, fallback: self._roll_up_summaries(summaries, fallback, False))
+
+        moved = propagation.run(step)
+        if moved is not None and crossings is not None:
+            propagation.push(self._reordered_summaries(crossings, False, propagation.planned))
+            moved = propagation.run(step)
+        if moved is None:
+            return self._full_pass(False, propagation.moved)
+        if propagation.loe_moved:
+            moved = np.concatenate([moved, self._roll_up_loe_dates(forward=False)])
+        return moved
+
+    def _full_pass(self, forward: bool, moved: list[np.ndarray] = ()) -> np.ndarray:
+        """
+        Run the forward or backward pass over the whole network; the nodes
+        whose dates it moved, together with the nodes of `moved`.
+        """
+        names = ('early_start', 'early_finish') if forward else ('late_start', 'late_finish')
+        before = [getattr(self, name).copy() for name in names]
+        if forward:
+            self.forward_pass()
+        else:
+            self.backward_pass()
+        changed = (getattr(self, names[0]) != before[0]) | (getattr(self, names[1]) != before[1])
+        return np.unique(np.concatenate([*moved, np.flatnonzero(changed)]))
+
+    def _roll_up_summaries(self, summaries: np.ndarray, fallback: np.ndarray, forward: bool) -> None:
+        """
+        `_SubtreeRollup.roll_up` of a few summaries, given in processing order,
+        read straight from their subtasks; see `_rolled_up`.
+        """
+        values = self.early_finish if forward else self.late_start
+        for node, default in zip(summaries.tolist(), fallback.tolist()):
+            values[node] = self._rolled_up(node, forward, default)
+
+    def _rolled_up(self, summary: int, forward: bool, fallback: int) -> int:
+        """
+        The latest early finish (forward) or the earliest late start, not
+        before the data date, of the subtasks processed before a summary.
+        LOE activities are only rolled up after a pass, so they never count.
+        """
+        rank, values = self.rank, self.early_finish if forward else self.late_start
+        subtasks = self.subtasks(summary)
+        before = rank[subtasks] < rank[summary] if forward else rank[subtasks] > rank[summary]
+        found = values[subtasks[before & ~self.is_loe[subtasks]]]
+        found = found[found != NAT]
+        if forward:
+            return int(found.max()) if found.size else fallback
+        return max(int(found.min()) if found.size else fallback, self.data_date)
+
+    def _still_held(self, summaries: np.ndarray, forward: bool) -> np.ndarray:
+        """
+        Whether a subtask processed before each of `summaries` still has the
+        date the summary rolled up, so that the summary keeps it.
+
+        The subtask that held the date the last time is looked at first. The
+        search of `_holding_subtasks` takes about as long for every summary
+        as for a few, so when it is needed at all it looks again for each
+        summary whose subtask no longer holds its date.
+        """
+        kept = self._holder_holds(summaries, forward)
+        dates = self.early_finish if forward else self.late_start
+        if (~kept & (dates[summaries] != NAT)).any():
+            stale = self.wbs_summaries[~self._holder_holds(self.wbs_summaries, forward)]
+            stale = stale[dates[stale] != NAT]
+            self._holders[int(forward), stale] = self._holding_subtasks(stale, forward)
+            kept = self._holder_holds(summaries, forward)
+        return kept
+
+    def _holder_holds(self, summaries: np.ndarray, forward: bool) -> np.ndarray:
+        """Whether the subtask last found to hold the date of each of `summaries` still does."""
+        dd, rank = self.data_date, self.rank
+        dates = self.early_finish if forward else self.late_start
+        held, holder = dates[summaries], self._holders[int(forward), summaries]
+        known = np.maximum(holder, 0)
+        value = dates[known] if forward else np.maximum(dates[known], dd)
+        before = rank[known] < rank[summaries] if forward else rank[known] > rank[summaries]
+        return (holder >= 0) & (held != NAT) & (dates[known] != NAT) & (value == held) & before
+
+    def _holding_subtasks(self, summaries: np.ndarray, forward: bool) -> np.ndarray:
+        """
+        The subtask each of `summaries` rolls up its date from, or -1 when no
+        subtask processed before it has that date any more.
+
+        This is `_rolled_up` of many summaries at once for a summary no
+        subtask passes: the subtasks with one of the rolled up dates are
+        taken in WBS tour order and sorted by date, so those of each summary
+        are a slice, and the first of them going forward (the last going
+        backward) holds the date if it comes before the summary.
+        """
+        dd = self.data_date
+        dates = self.early_finish if forward else self.late_start
+        held = dates[summaries]
+        found = np.unique(held)
+        tour = self._subtask_order
+        values = dates[tour]
+        hits, search = np.zeros(tour.size, dtype=bool), found
+        if not forward and found[0] <= dd:
+            # a late start before the data date rolls up as the data date
+            hits, search = (values <= dd) & (values != NAT), found[found > dd]
+        if search.size:
+            # `np.isin` is slow on long arrays, so only the dates in the range of the held ones go through it
+            inside = np.flatnonzero((values >= search[0]) & (values <= search[-1]))
+            hits[inside] |= np.isin(values[inside], search)
+        positions = np.flatnonzero(hits & self._tour_rolls_up)
+        values = values[positions] if forward else np.maximum(values[positions], dd)
+        group = np.searchsorted(found, values)
+        # a stable sort keeps the tour order among the subtasks with the same date
+        order = np.argsort(group, kind='stable')
+        nodes = tour[positions[order]]
+        keys = group[order] * tour.size + positions[order]
+        base = np.searchsorted(found, held) * tour.size
+        first, last = self._subtask_ranges[summaries].T
+        first, last = np.searchsorted(keys, base + first), np.searchsorted(keys, base + last)
+        # ranks and nodes reduce together; the appended 0 keeps every slice end a valid index and
+        # empty slices are masked out
+        ufunc, n = np.minimum if forward else np.maximum, self.node_count
+        reduced = ufunc.reduceat(np.append(self.rank[nodes] * n + nodes, 0),
+                                 np.column_stack((first, last)).ravel())[::2]
+        before = reduced // n < self.rank[summaries] if forward else reduced // n > self.rank[summaries]
+        return np.where((first < last) & before, reduced % n, -1)
+
+    def _crossings(self) -> tuple:
+        """
+        WBS summaries that come before or after a different set of their
+        subtasks than before the relationship edits.
+
+        Only nodes whose level changed, and the nodes of levels whose order
+        changed, can swap places with anything. Summaries among them are
+        rolled up again as a whole; for the summaries over them, every subtask
+        that joined or left the ones processed before the summary is listed
+        with its dates before the edits.
+
+        Returns:
+            tuple: the summaries that moved, then for every subtask that
+                crossed a summary the summary, the subtask, whether it now
+                comes before the summary, and its early finish and late start
+        """
+        level_before, rank_before = self._order_before
+        level, rank, summaries = self.level, self.rank, self.wbs_summaries
+        if (level < 0).any() or (level_before < 0).any():
+            return (summaries,) + tuple(np.zeros(0, dtype=dtype) for dtype in (np.int64, np.int64, bool, np.int64, np.int64))
+        shifted = level != level_before
+        kept = ~shifted & (level >= 0)
+        if self._reordered_levels is not None:
+            # the other levels keep the order of the nodes that stay in them
+            kept &= np.isin(level, list(self._reordered_levels))
+        kept = np.flatnonzero(kept)
+        kept = kept[np.argsort(rank_before[kept])]
+        swapped = (np.diff(rank[kept]) < 0) & (np.diff(level[kept]) == 0)
+        shifted |= np.isin(level, np.unique(level[kept[1:][swapped]]))
+        nodes = np.flatnonzero(shifted & ~self.is_loe)
+        over = self._summaries_over(nodes)
+        over = over[~shifted[over]]
+        lower, upper = self.wbs_bounds[over].T
+        pairs = []
+        for first in range(0, nodes.size, 1024):
+            part = nodes[first:first + 1024]
+            entries = self.wbs_entry[part]
+            joined = rank[part] < rank[over][:, None]
+            crossed = ((lower[:, None] <= entries) & (entries < upper[:, None])
+                       & ((rank_before[part] < rank_before[over][:, None]) != joined))
+            rows, columns = np.nonzero(crossed)
+            pairs.append((over[rows], part[columns], joined[rows, columns]))
+        crossing, subtasks, joined = (np.concatenate(arrays) for arrays in zip(
+            (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool)), *pairs))
+        return (summaries[shifted[summaries]], crossing, subtasks, joined,
+                self.early_finish[subtasks], self.late_start[subtasks])
+
+    def _reordered_summaries(self, crossings: tuple, forward: bool, planned: np.ndarray) -> np.ndarray:
+        """
+        The `planned` summaries of `_crossings` whose early (forward) or late
+        dates may move now that the dates of the other nodes are settled.
+
+        A subtask that joined the ones a summary rolls up moves the summary if
+        it passes its date. One that left them, or joined them with an
+        earlier date or after the summary was rolled up, moves it only if it
+        held that date and no other subtask still does; see `_still_held`.
+        """
+        moved, summaries, subtasks, joined, finishes, starts = crossings
+        if forward:
+            held, now = self.early_finish[summaries], self.early_finish[subtasks]
+            passes = joined & (now > held) | (np.where(joined, now, finishes) == NAT)
+            checks = np.where(joined, ((held == self.early_start[summaries]) & (now != held))
+                              | ((finishes >= held) & (now != finishes)), finishes >= held)
+        else:
+            # subtasks that joined the ones before a summary left the ones after it
+            held, now, dd = self.late_start[summaries], self.late_start[subtasks], self.data_date
+            passes = ~joined & (np.maximum(now, dd) < held) | (np.where(joined, starts, now) == NAT)
+            checks = np.where(joined, np.maximum(starts, dd) <= held,
+                              ((held == self.late_finish[summaries]) & (np.maximum(now, dd) != held))
+                              | ((np.maximum(starts, dd) <= held) & (now != starts)))
+        passes = np.union1d(moved, summaries[passes])
+        checks = np.setdiff1d(summaries[checks], passes)
+        checks = checks[planned[checks]]
+        return np.union1d(passes[planned[passes]], checks[~self._still_held(checks, forward)])
+
+    def _actuals(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        dd = self.data_date
+        started = (self.act_start != NAT) & (self.act_start <= dd) & ~self.is_loe
+        completed = (self.act_end != NAT) & (self.act_end <= dd) & ~self.is_loe
+        return started, completed, ~self.is_loe & ~completed & ~started
+
+    def _plan(self, forward: bool, scope: np.ndarray | None = None,
+              duration: np.ndarray | None = None) -> list[tuple]:
+        """
+        The static work of a pass, cut into one tuple per level; see
+        `_plan_levels`. A `scope` mask limits the plan to some of the nodes.
+        """
+        started, _, waiting = self._actuals()
+        active = (~started & ~self.is_loe) if forward else waiting
+        if scope is not None:
+            active &= scope
+        nodes = np.flatnonzero(active & (self.level >= 0))
+        levels = self.level[nodes] if forward else -self.level[nodes]
+        # the order inside a level only matters to WBS summaries
+        keys = (self.rank[nodes], levels) if self.is_wbs[nodes].any() else (levels,)
+        return self._plan_levels(forward, nodes[np.lexsort(keys)], duration)
+
+    def _plan_levels(self, forward: bool, nodes: np.ndarray, duration: np.ndarray | None = None) -> list[tuple]:
+        """
+        The static work of a pass over `nodes`, given level by level in pass
+        order and by processing rank inside a level, cut into one tuple per level.
+
+        Each tuple holds the nodes scheduled in the level, the edges relaxed
+        into them with the endpoint they read, whether that endpoint's start
+        (forward) or finish (backward) is read and the offset added to it, the
+        `reduceat` segments of the nodes that have edges, the calendar steps
+        of the level, its WBS summaries and the edge numbers of the relaxed
+        edges.
+
+        A `duration` array of shape (nodes, iterations) plans every iteration
+        at once: forward offsets and calendar steps get a second axis, and
+        every timed node steps, zero days included.
+        """
+        duration = self.duration if duration is None else duration
+        batched = duration.ndim > 1
+        cuts = np.flatnonzero(np.diff(self.level[nodes])) + 1
+        level_start = np.concatenate(([0], cuts)).astype(np.int64)
+
+        network = self.network
+        if forward:
+            edges = network.pred_edges[gather_ranges(network.pred_indptr, nodes)]
+            owner = np.repeat(np.arange(nodes.size), self.in_degree[nodes])
+            other = network.edge_pred[edges]
+        else:
+            edges = gather_ranges(network.succ_indptr, nodes)
+            owner = np.repeat(np.arange(nodes.size), self.out_degree[nodes])
+            other = network.edge_succ[edges]
+        kind = self.edge_type[edges]
+        # LOE activities are scheduled after the passes and unknown types never drive a date
+        keep = (kind >= 0) & ~self.is_loe[other]
+        edges, owner, other, kind = edges[keep], owner[keep], other[keep], kind[keep]
+        if forward:
+            pick = (kind == SS) | (kind == SF)
+            shifted = ((kind == FF) | (kind == SF)).reshape((-1, 1) if batched else -1)
+            shift = np.where(shifted, duration[nodes[owner]], 0)
+            offset = self.edge_lag[edges].reshape(shifted.shape) - shift * MINUTES_PER_DAY
+        else:
+            pick = (kind == FF) | (kind == SF)
+            offset = -self.edge_lag[edges]
+
+        counts = np.bincount(owner, minlength=nodes.size)
+        first_edge = np.cumsum(counts) - counts
+        timed = np.flatnonzero(~self.is_milestone[nodes] & ~self.is_wbs[nodes])
+        moving = timed if batched else timed[duration[nodes[timed]] != 0]
+        days = duration[nodes[moving]] * (1 if forward else -1)
+        summaries = np.flatnonzero(self.is_wbs[nodes])
+        linked = np.flatnonzero(counts > 0)
+        if not cuts.size:
+            # a single level, as `_Propagation` plans them, needs no cutting
+            return [(nodes, other, pick, offset, first_edge[linked], linked, timed, moving, days,
+                     self.task_clndr[nodes[moving]], bool(self.constrained[nodes].any()), summaries,
+                     edges)] if nodes.size else []
+        level_of = np.repeat(np.arange(level_start.size), np.diff(np.append(level_start, nodes.size)))
+        edge_cuts = first_edge[cuts]
+        segments = first_edge[linked] - np.concatenate(([0], edge_cuts))[level_of[linked]]
+        constrained = np.add.reduceat(self.constrained[nodes], level_start) > 0 if nodes.size else []
+
+        def split(positions, relative=True):
+            parts = _split(positions, np.searchsorted(positions, cuts))
+            return [part - level_start[i] for i, part in enumerate(parts)] if relative else parts
+
+        def split_by(values, positions):
+            return _split(values, np.searchsorted(positions, cuts))
+
+        return list(zip(
+            _split(nodes, cuts), _split(other, edge_cuts), _split(pick, edge_cuts),
+            _split(offset, edge_cuts), split_by(segments, linked), split(linked), split(timed),
+            split(moving), split_by(days, moving), split_by(self.task_clndr[nodes[moving]], moving),
+            constrained, split(summaries), _split(edges, edge_cuts),
+        )) if nodes.size else []
+
+    def _early_actuals(self, nodes: np.ndarray) -> None:
+        """Early dates of started `nodes`: the actual start, and the actual finish or the remaining duration."""
+        dd, ef = self.data_date, self.early_finish
+        self.early_start[nodes] = self.act_start[nodes]
+        done = (self.act_end[nodes] != NAT) & (self.act_end[nodes] <= dd)
+        ef[nodes[done]] = self.act_end[nodes[done]]
+        running = nodes[~done]
+        ef[running] = np.maximum(dd, self._add_days(self.act_start[running], self.duration[running], running))
+
+    def _late_actuals(self, nodes: np.ndarray) -> None:
+        """Late dates of started or completed `nodes`, from their actual dates, no earlier than the data date."""
+        dd, ls, lf = self.data_date, self.late_start, self.late_finish
+        completed = (self.act_end[nodes] != NAT) & (self.act_end[nodes] <= dd)
+        done, running = nodes[completed], nodes[~completed]
+        lf[done] = self.act_end[done]
+        ls[done] = self.act_start[done]
+        ls[running] = self.act_start[running]
+        lf[running] = np.maximum(dd, self._add_days(self.act_start[running], self.duration[running], running))
+        fixed = nodes[(self.act_start[nodes] == NAT) | (self.act_start[nodes] > dd)]
+        for dates in (ls, lf):
+            dates[fixed] = np.where(dates[fixed] == NAT, NAT, np.maximum(dates[fixed], dd))
+
+    def _forward_level(self, part: tuple, roll_up) -> None:
+        """
+        Early dates of the nodes of one `_plan_levels` level;
+        `roll_up(summaries, fallback)` sets the early finish of its WBS summaries.
+        """
+        nodes, other, pick, offset, segments, linked, timed, moving, days, codes, constrained, summaries, \
+            edges = part
+        dd, es, ef = self.data_date, self.early_start, self.early_finish
+        self.driving_edge[nodes] = -1
+        start = np.full(nodes.size, max(self.project_start, dd), dtype=np.int64)
+        if other.size:
+            values = np.where(pick, es[other], ef[other]) + offset
+            latest = np.maximum.reduceat(values, segments)
+            start[linked] = np.maximum(latest, dd)
+        if constrained:
+            start = self._constrain(nodes, start, (2, 3, 4))
+        es[nodes] = start
+        if other.size:
+            # the relationship drives unless the data date or a constraint moved the start past it
+            driven = start[linked] == latest
+            if constrained:
+                # constraints round the start to the day
+                held = self.constrained[nodes[linked]]
+                driven |= held & (_floor_day(start[linked]) == _floor_day(latest))
+            drivers = edges[_first_max(values, segments, latest)]
+            self.driving_edge[nodes[linked[driven]]] = drivers[driven]
+
+        finish = start.copy()
+        finish[timed] = start[timed] - start[timed] % MINUTES_PER_DAY
+        if moving.size:
+            ordinals = self._days.add_days(finish[moving] // MINUTES_PER_DAY + _EPOCH_DAY, days, codes)
+            finish[moving] = (ordinals - _EPOCH_DAY) * MINUTES_PER_DAY
+        ef[nodes] = finish
+        if summaries.size:
+            # summaries take the latest early finish of the subtasks processed before them
+            roll_up(nodes[summaries], es[nodes[summaries]])
+
+    def _backward_level(self, part: tuple, project_end: int, roll_up) -> None:
+        """
+        Late dates of the nodes of one `_plan_levels` level;
+        `roll_up(summaries, fallback)` sets the late start of its WBS summaries.
+        """
+        nodes, other, pick, offset, segments, linked, timed, moving, days, codes, constrained, summaries, _ = part
+        dd, ls, lf = self.data_date, self.late_start, self.late_finish
+        unset = np.iinfo(np.int64).max
+        finish = np.full(nodes.size, project_end, dtype=np.int64)
+        if other.size:
+            base = np.where(pick, lf[other], ls[other])
+            earliest = np.minimum.reduceat(np.where(base == NAT, unset, base + offset), segments)
+            finish[linked] = np.where(earliest == unset, project_end, earliest)
+        if constrained:
+            finish = self._constrain(nodes, finish, (5, 6, 7))
+
+        start = finish.copy()
+        start[timed] = finish[timed] - finish[timed] % MINUTES_PER_DAY
+        if moving.size:
+            ordinals = self._days.add_days(start[moving] // MINUTES_PER_DAY + _EPOCH_DAY, days, codes)
+            start[moving] = (ordinals - _EPOCH_DAY) * MINUTES_PER_DAY
+        ls[nodes] = np.maximum(start, dd)
+        lf[nodes] = np.maximum(finish, dd)
+        if summaries.size:
+            # summaries take the earliest late start of the subtasks processed before them
+            roll_up(nodes[summaries][::-1], finish[summaries][::-1])
+
+    def _latest_finish(self) -> int:
+        """Latest early finish of the activities other than LOE; the data date if there is none."""
+        finishes = self.early_finish
+        if finishes.size and not self.is_loe[finishes.argmax()]:
+            # the first of the latest finishes is not an LOE activity's, so it is the latest of the others too
+            latest = int(finishes.max())
+        else:
+            latest = int(finishes[~self.is_loe].max(initial=NAT))
+        return latest if latest != NAT else self.data_date
+
+    def _roll_up_loe_dates(self, forward: bool) -> np.ndarray:
+        """Roll the early (forward) or late dates of LOE activities up; the LOE activities whose dates moved."""
+        loe = np.flatnonzero(self.is_loe)
+        if forward:
+            first, second = self.early_start, self.early_finish
+            before = first[loe], second[loe]
+            # LOE activities span from their earliest predecessor start to their latest successor finish
+            self._roll_up_loe(first, np.minimum, from_predecessors=True, fallback=self.data_date)
+            self._roll_up_loe(second, np.maximum, from_predecessors=False, fallback=self._latest_finish())
+        else:
+            first, second = self.late_start, self.late_finish
+            before = first[loe], second[loe]
+            project_end = self.project_end
+            self._roll_up_loe(first, np.minimum, from_predecessors=False, fallback=project_end)
+            self._roll_up_loe(second, np.maximum, from_predecessors=True, fallback=project_end)
+        return loe[(first[loe] != before[0]) | (second[loe] != before[1])]
+
+    def forward_pass(self) -> None:
+        """Early dates of every node."""
+        self._writable('early_start', 'early_finish', 'driving_edge')
+        self.early_start.fill(NAT)
+        self.early_finish.fill(NAT)
+        self.driving_edge.fill(-1)
+        started, _, _ = self._actuals()
+        self._early_actuals(np.flatnonzero(started))
+
+        rollup = None
+
+        def roll_up(summaries, fallback):
+            nonlocal rollup
+            rollup = rollup or _SubtreeRollup(self, self.early_finish, np.maximum, self.rank)
+            rollup.roll_up(summaries, fallback)
+
+        for part in self._plan(forward=True):
+            self._forward_level(part, roll_up)
+        self._roll_up_loe_dates(forward=True)
+
+    def backward_pass(self) -> None:
+        """Late dates of every node."""
+        self._writable('late_start', 'late_finish')
+        self.late_start.fill(NAT)
+        self.late_finish.fill(NAT)
+        project_end = self.project_end
+        _, _, waiting = self._actuals()
+        self._late_actuals(np.flatnonzero(~self.is_loe & ~waiting))
+
+        rollup = None
+
+        def roll_up(summaries, fallback):
+            nonlocal rollup
+            rollup = rollup or _SubtreeRollup(self, self.late_start, np.minimum, -self.rank)
+            rollup.roll_up(summaries, fallback, lower=self.data_date)
+
+        for part in self._plan(forward=False):
+            self._backward_level(part, project_end, roll_up)
+        self._roll_up_loe_dates(forward=False)
+
+    def _roll_up_loe(self, dates: np.ndarray, ufunc: np.ufunc, from_predecessors: bool, fallback: int) -> None:
+        """
+        Set LOE activities to the `ufunc` (np.minimum or np.maximum) of the same
+        dates of their predecessors or successors, or to `fallback`.
+
+        Dates of ordinary neighbours are reduced by LOE activity in one grouped
+        reduction. A link between two LOE activities reads the neighbour only when
+        it comes earlier in the table, as those are the ones already set when
+        LOE activities are handled one after the other; the links are followed
+        round by round until no date moves.
+        """
+        if from_predecessors not in self._loe_edges:
+            network, loe = self.network, self.is_loe
+            if from_predecessors:
+                owner, other = network.edge_succ, network.edge_pred
+            else:
+                owner, other = network.edge_pred, network.edge_succ
+            edges = np.flatnonzero(loe[owner])
+            edges = edges[np.argsort(owner[edges], kind='stable')]
+            owner, other = owner[edges], other[edges]
+            nodes = np.flatnonzero(loe)
+            plain, linked = ~loe[other], loe[other] & (other < owner)
+            starts = np.flatnonzero(np.diff(owner[plain], prepend=-1))
+            self._loe_edges[from_predecessors] = (
+                nodes, other[plain], starts, np.searchsorted(nodes, owner[plain][starts]),
+                np.searchsorted(nodes, owner[linked]), np.searchsorted(nodes, other[linked]))
+        nodes, other, starts, owners, linked_owner, linked_other = self._loe_edges[from_predecessors]
+        unset = np.iinfo(np.int64).max if ufunc is np.minimum else NAT
+        values = dates[other]
+        # NAT already loses every maximum
+        values = np.where(values == NAT, unset, values) if ufunc is np.minimum else values
+        result = np.full(nodes.size, unset, dtype=np.int64)
+        if starts.size:
+            result[owners] = ufunc.reduceat(values, starts)
+        # an LOE activity linked to earlier ones takes their dates instead of the fallback
+        fallen = result == unset
+        fallen[linked_owner] = False
+        result[fallen] = fallback
+        while linked_owner.size:
+            # one round for every LOE activity in the longest chain of them
+            updated = result.copy()
+            ufunc.at(updated, linked_owner, result[linked_other])
+            if (updated == result).all():
+                break
+            result = updated
+        dates[nodes] = result
+
+    def calculate_total_float(self, nodes: np.ndarray | None = None) -> None:
+        """
+        Total float in working days; LOE activities have infinite float and
+        completed activities none. A `nodes` array limits the calculation to
+        those nodes and to the WBS summaries over them.
+        """
+        self._writable('total_float')
+        tf = self.total_float
+        dd = self.data_date
+        everything = nodes is None
+        # the float of a summary only depends on its subtasks
+        nodes = np.arange(self.node_count) if everything else nodes[~self.is_wbs[nodes]]
+        before = tf[nodes]
+        tf[nodes] = np.nan
+        tf[nodes[self.is_loe[nodes]]] = np.inf
+        completed = nodes[~self.is_loe[nodes] & ~self.is_wbs[nodes]]
+        completed = completed[(self.act_end[completed] != NAT) & (self.act_end[completed] <= dd)]
+        tf[completed] = 0
+
+        activities = np.setdiff1d(nodes[~self.is_loe[nodes] & ~self.is_wbs[nodes]], completed, assume_unique=True)
+        early = np.where(self.early_start[activities] == NAT, NAT, np.maximum(self.early_start[activities], dd))
+        late = self.late_start[activities]
+        known = (early != NAT) & (late != NAT)
+        if (~known).any():
+            self.logger.warning(f"Unable to calculate total float for {int((~known).sum())} activities")
+        activities, early, late = activities[known], early[known], late[known]
+        tf[activities] = self._days_between(early, late, activities)
+
+        # summaries take the lowest float of the subtasks listed before them in the table
+        if everything:
+            summaries = self.wbs_summaries
+            _SubtreeRollup(self, tf, np.minimum, np.arange(self.node_count)).roll_up(summaries, np.zeros(summaries.size))
+        else:
+            self._roll_up_float(nodes, before)
+
+        negative = int((tf < 0).sum())
+        if negative:
+            self.logger.warning(f"Negative total float detected for {negative} activities")
+
+    def _roll_up_float(self, nodes: np.ndarray, before: np.ndarray) -> None:
+        """
+        Float of the WBS summaries after the float of `nodes` moved from
+        `before`.
+
+        A summary keeps the lowest float of its subtasks, so a subtask moves
+        it only if the subtask held that float before or goes below it now.
+        Summaries are settled in table order, as a summary reads the ones
+        listed before it.
+        """
+        tf = self.total_float
+        heap: list[int] = []
+
+        def reach(changed, old):
+            over = self._summaries_over(changed)
+            if not over.size:
+                return
+            new, held = tf[changed], tf[over][:, None]
+            first, last = self.wbs_bounds[over].T
+            entries = self.wbs_entry[changed]
+            reached = (first[:, None] <= entries) & (entries < last[:, None]) & (changed < over[:, None])
+            # a float that appears or goes away can change whether a summary has any to roll up
+            reached &= np.isnan(old) | np.isnan(new) | (old <= held) | (new < held)
+            for summary in over[reached.any(axis=1)].tolist():
+                heapq.heappush(heap, summary)
+
+        moved = (tf[nodes] != before) & ~(np.isnan(tf[nodes]) & np.isnan(before))
+        reach(nodes[moved], before[moved])
+        settled = -1
+        while heap:
+            summary = heapq.heappop(heap)
+            if summary == settled:
+                continue
+            settled, old = summary, tf[summary]
+            subtasks = self.subtasks(summary)
+            floats = tf[subtasks[subtasks < summary]]
+            floats = floats[~np.isnan(floats)]
+            tf[summary] = floats.min() if floats.size else 0
+            if tf[summary] != old:
+                reach(np.array([summary]), np.array([old]))
+
+    def _require_current(self) -> None:
+        """Raise unless the dates are those of the network as it is now."""
+        if not self._scheduled:
+            raise ValueError("The network is not scheduled; call schedule() first")
+        if self._forward_roots or self._backward_roots:
+            raise ValueError("The network has edits that are not scheduled; call recompute() first")
+
+    def critical_path(self, float_threshold: float = 0) -> list[str]:
+        """
+        Critical activities: completed ones in table order, then the others in
+        topological order.
+
+        Raises:
+            ValueError: when edits are not scheduled yet
+        """
+        self._require_current()
+        critical = ~self.is_loe & ~np.isnan(self.total_float) & (self.total_float <= float_threshold)
+        completed = (self.act_end != NAT) & (self.act_end <= self.data_date)
+        done = np.flatnonzero(critical & completed)
+        open_nodes = np.flatnonzero(critical & ~completed)
+        open_nodes = open_nodes[np.argsort(self.rank[open_nodes], kind='stable')]
+        return self.task_ids[np.concatenate((done, open_nodes))].tolist()
+
+    def _driving_chain(self, node: int, open_nodes: np.ndarray | None = None) -> list[int]:
+        """Nodes of the driving chain that ends at `node`, last first, passing only `open_nodes` if given."""
+        chain = [node]
+        edge = self.driving_edge[node]
+        while edge >= 0:
+            node = int(self.network.edge_pred[edge])
+            if open_nodes is not None and not open_nodes[node]:
+                break
+            chain.append(node)
+            if self.is_wbs[node] and self.edge_type[edge] in (FS, FF):
+                # the finish of a summary is rolled up from the subtask that finishes last
+                subtask = self._finishing_subtask(node)
+                if subtask >= 0:
+                    if open_nodes is not None and not open_nodes[subtask]:
+                        break
+                    node = subtask
+                    chain.append(node)
+            edge = self.driving_edge[node]
+        return chain
+
+    def _finishing_subtask(self, node: int) -> int:
+        """First subtask, processed before the WBS summary `node`, whose early finish is the summary's; -1 if none."""
+        subtasks = self.subtasks(node)
+        subtasks = subtasks[~self.is_loe[subtasks] & (self.rank[subtasks] < self.rank[node])]
+        subtasks = subtasks[self.early_finish[subtasks] == self.early_finish[node]]
+        return int(subtasks[np.argmin(self.rank[subtasks])]) if subtasks.size else -1
+
+    def _finishing_node(self) -> int:
+        """Activity that finishes the project; of several, the one on the highest level. -1 if none is scheduled."""
+        nodes = np.flatnonzero(~self.is_loe & ~self.is_wbs & (self.early_finish != NAT))
+        if not nodes.size:
+            return -1
+        return int(nodes[np.lexsort((nodes, self.level[nodes], self.early_finish[nodes]))[-1]])
+
+    def driving_path(self, to_task) -> list[str]:
+        """
+        Chain of driving relationships that ends at an activity, first activity first.
+
+        The walk follows the predecessor that set the early start of each
+        activity, recorded in the forward pass, and stops at an activity whose
+        start no relationship drives: one started before the data date, one
+        scheduled at the project start or data date, or one held by a
+        constraint. A WBS summary driving through its finish passes the chain
+        on to the subtask its finish is rolled up from.
+
+        Raises:
+            ValueError: for an unknown activity, or when edits are not
+                scheduled yet
+        """
+        self._require_current()
+        return self.task_ids[self._driving_chain(self._node(to_task))[::-1]].tolist()
+
+    def longest_path(self) -> list[str]:
+        """Driving path of the activity that finishes the project; see `driving_path`."""
+        self._require_current()
+        last = self._finishing_node()
+        return self.task_ids[self._driving_chain(last)[::-1]].tolist() if last >= 0 else []
+
+    def _relationship_float(self) -> np.ndarray:
+        """
+        Minutes each relationship could slip before it moved the early start of
+        its successor; NaN for relationships that set no date.
+        """
+        network, kind = self.network, self.edge_type
+        pred, succ = network.edge_pred, network.edge_succ
+        base = np.where((kind == SS) | (kind == SF), self.early_start[pred], self.early_finish[pred])
+        shift = np.where((kind == FF) | (kind == SF), self.duration[succ], 0) * MINUTES_PER_DAY
+        known = (kind >= 0) & ~self.is_loe[pred] & (base != NAT) & (self.early_start[succ] != NAT)
+        return np.where(known, self.early_start[succ] - (base + self.edge_lag - shift), np.nan)
+
+    def float_paths(self, paths: int = 10, ranking: str = 'free_float', end_task=None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Multiple float paths, as P6 numbers them, ending at one activity.
+
+        Path 1 is the driving path of the end activity, `longest_path` by
+        default. Every next path starts
+        from the activity, not yet on a path, that leads to one with the least
+        float: with `free_float`, the sum of the relationship free floats to the
+        end activity; with `total_float`, its total float first. From there the
+        path follows driving relationships back until it meets an activity on
+        an earlier path. Each relationship is looked at once, from its
+        successor, so the cost is that of a heap over the relationships.
+
+        Paths and the search pass through LOE activities and WBS summaries,
+        which get no number, so a WBS summary between two activities does not
+        end a path. Completed activities are on no path.
+
+        Args:
+            paths (int): number of paths to number
+            ranking (str): one of `FLOAT_PATH_RANKINGS`
+            end_task: task_id of the activity the paths lead to; defaults to
+                the activity that finishes the project
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: path number of every node, and its
+                position on that path from the first activity; 0 for nodes on
+                no path
+
+        Raises:
+            ValueError: for an unknown ranking or end activity, or when edits
+                are not scheduled yet
+        """
+        if ranking not in FLOAT_PATH_RANKINGS:
+            raise ValueError(f"Unknown float path ranking {ranking!r}, expected one of {FLOAT_PATH_RANKINGS}")
+        self._require_current()
+        float_path = np.zeros(self.node_count, dtype=np.int64)
+        float_path_order = np.zeros(self.node_count, dtype=np.int64)
+        end = self._finishing_node() if end_task is None else self._node(end_task)
+        completed = (self.act_end != NAT) & (self.act_end <= self.data_date)
+        open_nodes = ~completed & (self.early_start != NAT)
+        numbered = open_nodes & ~self.is_loe & ~self.is_wbs
+        if end < 0 or not open_nodes[end]:
+            return float_path, float_path_order
+
+        slack = self._relationship_float()
+        total_float = np.nan_to_num(self.total_float, nan=np.inf)
+        network = self.network
+
+        def key(node, accumulated):
+            return (total_float[node], accumulated) if ranking == 'total_float' else (accumulated,)
+
+        heap = [(key(end, 0.0), end)]
+        path = 0
+        while heap and path < paths:
+            (*_, accumulated), node = heapq.heappop(heap)
+            if not open_nodes[node]:
+                continue
+            chain = np.array(self._driving_chain(node, open_nodes)[::-1])
+            open_nodes[chain] = False
+            activities = chain[numbered[chain]]
+            if activities.size:
+                path += 1
+                float_path[activities] = path
+                float_path_order[activities] = np.arange(1, activities.size + 1)
+            # the predecessors of the new path, by their float to the end activity
+            edges = network.pred_edges[gather_ranges(network.pred_indptr, chain)]
+            edges = edges[open_nodes[network.edge_pred[edges]] & ~np.isnan(slack[edges])]
+            for pred, value in zip(network.edge_pred[edges].tolist(), (slack[edges] + accumulated).tolist()):
+                heapq.heappush(heap, (key(pred, value), pred))
+        return float_path, float_path_order
+
+    def to_frame(self) -> pd.DataFrame:
+        """Scheduled dates and total float of every activity."""
+        def dates(values):
+            return values.astype('datetime64[m]').astype('datetime64[ns]')
+
+        return pd.DataFrame({
+            'task_id': self.task_ids,
+            'early_start': dates(self.early_start),
+            'early_finish': dates(self.early_finish),
+            'late_start': dates(self.late_start),
+            'late_finish': dates(self.late_finish),
+            'total_float': self.total_float,
+        })
@@ -0,0 +1,100 @@
+from typing import Callable, Hashable
+
+from xerparser.src._lazy import lazy_import
+
+nx = lazy_import("networkx")
+
+
+def logic_loops(graph) -> list[list]:
+    """
+    Find the logic loops of a network as its strongly connected components.
+
+    Every activity on a loop belongs to exactly one component, so the
+    components are found in linear time however many elementary cycles run
+    through them. Components of a single activity only count when the
+    activity is its own predecessor.
+
+    Args:
+        graph (nx.DiGraph): activity network
+
+    Returns:
+        list[list]: the activities of each loop in graph order, loops ordered
+            by their first activity
+    """
+    position = {node: i for i, node in enumerate(graph)}
+    loops = []
+    for component in nx.strongly_connected_components(graph):
+        node = next(iter(component))
+        if len(component) > 1 or graph.has_edge(node, node):
+            loops.append(sorted(component, key=position.__getitem__))
+    return sorted(loops, key=lambda loop: position[loop[0]])
+
+
+def feedback_edges(graph, loops: list[list] = None,
+                   preference: Callable[[Hashable, Hashable], float] = None) -> list[tuple]:
+    """
+    Choose a minimal set of relationships whose removal breaks every logic loop.
+
+    The relationships removed are the back edges of a depth-first search over
+    each loop, started from its first activity and following the relationships
+    removal prefers least first. Removing them leaves only the search tree and
+    forward edges, so no loop remains, and each of them closes a loop with the
+    tree on its own, so none can be kept. The choice only depends on the order
+    of the graph and the preference.
+
+    Args:
+        graph (nx.DiGraph): activity network, left unchanged
+        loops (list[list], optional): loops from `logic_loops`. Defaults to the
+            loops of the graph.
+        preference (Callable, optional): removal preference of a relationship
+            (u, v); the search follows relationships with lower values first,
+            so higher values are the ones left as back edges. Ties go by graph
+            order. Defaults to graph order alone.
+
+    Returns:
+        list[tuple]: (predecessor, successor) pairs in graph order
+    """
+    if loops is None:
+        loops = logic_loops(graph)
+    position = {node: i for i, node in enumerate(graph)}
+
+    def keep_order(edge):
+        rank = (position[edge[0]], position[edge[1]])
+        return (preference(*edge), rank) if preference is not None else rank
+
+    removed = []
+    for loop in loops:
+        members = set(loop)
+        # the search follows the relationships removal prefers least first, so they tend to stay
+        successors = {
+            node: sorted((succ for succ in graph.successors(node) if succ in members),
+                         key=lambda succ, node=node: keep_order((node, succ)))
+            for node in loop
+        }
+        removed.extend(_back_edges(loop, successors))
+    return sorted(removed, key=lambda edge: (position[edge[0]], position[edge[1]]))
+
+
+def _back_edges(loop: list, successors: dict) -> list[tuple]:
+    """Edges into an activity that is still on the stack of an iterative depth-first search."""
+    state = dict.fromkeys(loop, 0)  # 0 unvisited, 1 on the stack, 2 finished
+    back = []
+    for root in loop:
+        if state[root]:
+            continue
+        state[root] = 1
+        stack = [(root, iter(successors[root]))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if state[child] == 1:
+                    back.append((node, child))
+                elif not state[child]:
+                    state[child] = 1
+                    stack.append((child, iter(successors[child])))
+                    break
+            else:
+                state[node] = 2
+                stack.pop()
+    return back
+
@@ -0,0 +1,109 @@
+import logging
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from local.libs.compiled_calendar import MINUTES_PER_DAY, CalendarSet, CompiledCalendar
+
+MILESTONE_TYPES = ('TT_Mile', 'TT_FinMile')
+DISTRIBUTION_COLUMNS = ['task_id', 'date', 'hours']
+MAX_SPREAD_DAYS = 366 * 20
+"""Longest remaining span spread by default; longer spans come from bad dates."""
+
+_EPOCH_MINUTE = date(1970, 1, 1).toordinal() * MINUTES_PER_DAY  # absolute minute of datetime64 minute 0
+
+
+def remaining_hours_per_day(task_df: pd.DataFrame, calendars: CalendarSet, late_dates: bool = False,
+                            max_days: int = MAX_SPREAD_DAYS) -> pd.DataFrame:
+    """
+    Spread the remaining duration of every activity over the working time of
+    its calendar.
+
+    Each day between the remaining start and finish receives the share of
+    `remain_drtn_hr_cnt` that its working minutes make up of the working
+    minutes of the whole span, so the hours of an activity always add up to
+    its remaining duration. An activity without working time between its
+    dates puts all hours on its start date. Completed activities, milestones
+    and activities without remaining hours or dates are skipped, as are
+    activities spanning more than `max_days` calendar days, which are logged.
+
+    Args:
+        task_df (pd.DataFrame): TASK table
+        calendars (CalendarSet): compiled calendars, e.g. `WorkingDayCalculator.calendars`
+        late_dates (bool, optional): use the remaining late dates instead of
+            the remaining early dates. Defaults to False.
+        max_days (int, optional): longest span, in calendar days, that is
+            spread over days. Defaults to MAX_SPREAD_DAYS.
+
+    Returns:
+        pd.DataFrame: one row per activity and day with working time, with
+            columns task_id, date and hours, sorted by activity order and date
+    """
+    start_col, end_col = ('rem_late_start_date', 'rem_late_end_date') if late_dates else ('restart_date', 'reend_date')
+    if task_df is None or task_df.empty or start_col not in task_df.columns or end_col not in task_df.columns:
+        return pd.DataFrame(columns=DISTRIBUTION_COLUMNS)
+
+    starts = pd.to_datetime(task_df[start_col], errors='coerce').to_numpy(dtype='datetime64[m]')
+    ends = pd.to_datetime(task_df[end_col], errors='coerce').to_numpy(dtype='datetime64[m]')
+    hours = pd.to_numeric(task_df['remain_drtn_hr_cnt'], errors='coerce').to_numpy(dtype=np.float64)
+    keep = ~np.isnat(starts) & ~np.isnat(ends) & (hours > 0)
+    if 'status_code' in task_df.columns:
+        keep &= (task_df['status_code'] != 'TK_Complete').to_numpy()
+    if 'task_type' in task_df.columns:
+        keep &= ~task_df['task_type'].isin(MILESTONE_TYPES).to_numpy()
+    # every day of a span becomes a row, so a placeholder date (e.g. 9999) would expand to millions
+    span = (ends.astype(np.int64) - starts.astype(np.int64)) // MINUTES_PER_DAY
+    too_long = keep & (span > max_days)
+    if too_long.any():
+        logging.warning(f"Skipping {int(too_long.sum())} activities spanning more than {max_days} days: "
+                        f"{', '.join(map(str, task_df['task_id'].to_numpy()[too_long][:10]))}")
+        keep &= ~too_long
+    rows = np.flatnonzero(keep)
+    if not rows.size:
+        return pd.DataFrame(columns=DISTRIBUTION_COLUMNS)
+
+    first = starts[rows].astype(np.int64) + _EPOCH_MINUTE
+    last = np.maximum(ends[rows].astype(np.int64) + _EPOCH_MINUTE, first)
+    codes, uniques = pd.factorize(task_df['clndr_id'].to_numpy()[rows].astype(str))
+    order = np.argsort(codes, kind='stable')
+    bounds = np.cumsum(np.bincount(codes, minlength=len(uniques)))
+
+    parts = []
+    for clndr_id, group in zip(uniques, np.split(order, bounds[:-1])):
+        task, days, day_hours = _spread(calendars.get(clndr_id), first[group], last[group], hours[rows[group]])
+        parts.append((rows[group][task], days, day_hours))
+    positions, days, day_hours = (np.concatenate(values) for values in zip(*parts))
+
+    order = np.lexsort((days, positions))
+    return pd.DataFrame({
+        'task_id': task_df['task_id'].to_numpy()[positions[order]],
+        'date': (days[order] - _EPOCH_MINUTE // MINUTES_PER_DAY).astype('datetime64[D]'),
+        'hours': day_hours[order],
+    })
+
+
+def _spread(calendar: CompiledCalendar, first: np.ndarray, last: np.ndarray,
+            hours: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Hours of each task per day as (task position, day ordinal, hours) for days with hours."""
+    first_day = first // MINUTES_PER_DAY
+    # a finish at midnight ends on the day before
+    last_day = np.maximum((last - 1) // MINUTES_PER_DAY, first_day)
+    counts = last_day - first_day + 1
+    task = np.repeat(np.arange(first.size), counts)
+    offsets = np.arange(task.size) - np.repeat(np.cumsum(counts) - counts, counts)
+    days = first_day[task] + offsets
+
+    day_start = days * MINUTES_PER_DAY
+    lo = np.maximum(first[task], day_start)
+    hi = np.minimum(last[task], day_start + MINUTES_PER_DAY)
+    # one lookup for every boundary, so all of them are read from the same timeline
+    worked = calendar.working_minutes_until(np.concatenate((lo, hi, first, last)))
+    size = task.size
+    day_minutes = worked[size:2 * size] - worked[:size]
+    total = (worked[2 * size + first.size:] - worked[2 * size:2 * size + first.size])[task]
+
+    share = np.where(total > 0, day_minutes / np.maximum(total, 1), offsets == 0)
+    day_hours = hours[task] * share
+    keep = day_hours > 0
+    return task[keep], days[keep], day_hours[keep]
@@ -0,0 +1,124 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterable, Mapping
+
+import numpy as np
+
+from local.libs.cpm_engine import CPMEngine
+
+IN_PROCESS_WORK = 2_000_000
+"""Scenarios times activities below which `evaluate_scenarios` stays in the calling process."""
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """
+    Overrides of one what-if run against a scheduled network.
+
+    Attributes:
+        durations (Mapping): target duration hours by task_id
+        add_relationships (tuple): (pred_task_id, task_id, pred_type, lag_hr)
+            of relationships to add or change; type and lag are optional
+        remove_relationships (tuple): (pred_task_id, task_id) of relationships
+            to remove
+    """
+
+    durations: Mapping = field(default_factory=dict)
+    add_relationships: tuple = ()
+    remove_relationships: tuple = ()
+
+    @classmethod
+    def from_overrides(cls, overrides) -> "Scenario":
+        """Scenario from a `Scenario` or a mapping of its fields."""
+        return overrides if isinstance(overrides, cls) else cls(**overrides)
+
+    def apply(self, engine: CPMEngine) -> None:
+        """Edit `engine`; `recompute` reschedules."""
+        for task_id, hours in self.durations.items():
+            engine.update_duration(task_id, hours)
+        for pred_task_id, task_id in self.remove_relationships:
+            engine.remove_relationship(pred_task_id, task_id)
+        for relationship in self.add_relationships:
+            engine.add_relationship(*relationship)
+
+
+@dataclass(frozen=True)
+class ScenarioResult:
+    """
+    Schedule of one scenario.
+
+    `error` is set instead of raising when the overrides could not be applied,
+    e.g. when a relationship would close a logic loop, so one bad scenario
+    does not stop the batch.
+    """
+
+    project_finish: np.datetime64 | None = None
+    early_finish: np.ndarray | None = None
+    total_float: np.ndarray | None = None
+    critical: frozenset = frozenset()
+    error: str | None = None
+
+    @classmethod
+    def from_engine(cls, engine: CPMEngine, float_threshold: float = 0) -> "ScenarioResult":
+        critical = ~engine.is_loe & ~np.isnan(engine.total_float) & (engine.total_float <= float_threshold)
+        return cls(
+            project_finish=np.datetime64(engine.project_end, 'm'),
+            early_finish=engine.early_finish.astype('datetime64[m]'),
+            total_float=engine.total_float.copy(),
+            critical=frozenset(engine.task_ids[critical].tolist()),
+        )
+
+
+def _evaluate(base: CPMEngine, scenario: Scenario) -> ScenarioResult:
+    engine = base.copy()
+    try:
+        scenario.apply(engine)
+    except ValueError as e:
+        return ScenarioResult(error=str(e))
+    return ScenarioResult.from_engine(engine.recompute())
+
+
+_base: CPMEngine | None = None
+
+
+def _init_worker(engine: CPMEngine) -> None:
+    global _base
+    _base = engine
+
+
+def _evaluate_in_worker(scenario: Scenario) -> ScenarioResult:
+    return _evaluate(_base, scenario)
+
+
+def evaluate_scenarios(engine: CPMEngine, scenarios: Iterable, workers: int | None = None) -> list[ScenarioResult]:
+    """
+    Schedule what-if variants of a network without changing it.
+
+    Each scenario edits a copy of the scheduled engine that shares its network,
+    calendars and activity data, and is rescheduled incrementally. Workers get
+    the engine once, when they start, and only scenarios and results travel
+    between processes. Small batches are evaluated in the calling process.
+
+    Args:
+        engine (CPMEngine): network to vary; scheduled first if it has pending edits
+        scenarios (Iterable): `Scenario` objects or mappings of their fields
+        workers (int | None, optional): number of worker processes; 1
+            evaluates in the calling process. Defaults to the number of CPUs.
+
+    Returns:
+        list[ScenarioResult]: one result per scenario, in order
+    """
+    scenarios = [Scenario.from_overrides(overrides) for overrides in scenarios]
+    engine.recompute()
+    if engine.is_wbs.any():
+        # worked out once here instead of in every worker
+        engine.rank
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(scenarios) < 2 or len(scenarios) * engine.node_count < IN_PROCESS_WORK:
+        return [_evaluate(engine, scenario) for scenario in scenarios]
+
+    chunksize = max(1, min(64, len(scenarios) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(engine,)) as pool:
+        return list(pool.map(_evaluate_in_worker, scenarios, chunksize=chunksize))
@@ -0,0 +1,448 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+
+from local.libs.compiled_calendar import MINUTES_PER_DAY
+from local.libs.cpm_engine import NAT, CPMEngine, _SubtreeRollup
+
+DISTRIBUTIONS = ('triangular', 'pert', 'uniform')
+"""Duration distributions understood by `ScheduleRisk`."""
+
+DISTRIBUTION_COLUMNS = ['task_id', 'distribution', 'min_hr_cnt', 'most_likely_hr_cnt', 'max_hr_cnt']
+"""Columns of a duration distribution table; durations are hours, like `target_drtn_hr_cnt`."""
+
+
+def distributions_from_udfs(xer, minimum: str, most_likely: str, maximum: str,
+                            distribution: str = 'triangular', hours_per_unit: float = 1.0) -> pd.DataFrame:
+    """
+    Duration distribution table from activity UDFs.
+
+    Args:
+        xer: parsed Xer with UDFTYPE and UDFVALUE tables
+        minimum (str): label of the UDF holding the optimistic duration
+        most_likely (str): label of the UDF holding the most likely duration;
+            not needed by uniform distributions
+        maximum (str): label of the UDF holding the pessimistic duration
+        distribution (str): one of `DISTRIBUTIONS`
+        hours_per_unit (float): hours in one unit of the UDF values, e.g. 8
+            for durations entered in days
+
+    Returns:
+        pd.DataFrame: table with `DISTRIBUTION_COLUMNS`, one row per activity
+            that has the minimum and maximum UDFs
+    """
+    udf_types, udf_values = xer.tables.get('UDFTYPE'), xer.tables.get('UDFVALUE')
+    if udf_types is None or udf_values is None:
+        return pd.DataFrame(columns=DISTRIBUTION_COLUMNS)
+    task_udfs = udf_types[udf_types['table_name'] == 'TASK']
+    labels = dict(zip(task_udfs['udf_type_id'], task_udfs['udf_type_label']))
+    values = udf_values[udf_values['udf_type_id'].isin(list(labels))].assign(
+        label=lambda df: df['udf_type_id'].map(labels),
+        hours=lambda df: pd.to_numeric(df['udf_number'], errors='coerce') * hours_per_unit,
+    )
+    table = values.pivot_table(index='fk_id', columns='label', values='hours', aggfunc='last')
+    table = table.reindex(columns=[minimum, most_likely, maximum])
+    table.columns = ['min_hr_cnt', 'most_likely_hr_cnt', 'max_hr_cnt']
+    table = table.dropna(subset=['min_hr_cnt', 'max_hr_cnt'])
+    table = table.rename_axis('task_id').reset_index()
+    table.insert(1, 'distribution', distribution)
+    return table[DISTRIBUTION_COLUMNS]
+
+
+@dataclass(frozen=True)
+class RiskResult:
+    """
+    Outcome of a Monte Carlo run.
+
+    Attributes:
+        project_finish (np.ndarray): project finish of every iteration, `datetime64[m]`
+        activities (pd.DataFrame): per activity, the early finish at each
+            percentile (`p50` ...), the criticality index (share of iterations
+            with total float at or under the threshold) and the cruciality index
+            (correlation of the sampled duration with the project finish);
+            NaN where they do not apply, e.g. for LOE activities
+    """
+
+    project_finish: np.ndarray
+    activities: pd.DataFrame
+
+    def finish_percentiles(self, percentiles=(10, 50, 80, 90)) -> pd.Series:
+        """Project finish at each percentile, to the minute."""
+        minutes = self.project_finish.astype(np.int64)
+        values = np.percentile(minutes, percentiles, method='lower')
+        return pd.Series(values.astype('datetime64[m]'), index=[f'p{p:g}' for p in percentiles])
+
+
+HISTOGRAM_BINS = 1 << 21
+"""Most (activity, day) counts a finish histogram keeps before it bins days together."""
+
+
+class _FinishHistogram:
+    """
+    Per-activity counts of early finish days, kept sparse.
+
+    Only the (activity, day) pairs that occur are counted, as sorted keys and
+    counts, so the memory follows how widely each activity's finish spreads,
+    not the span of the whole project. When the pairs outgrow `max_bins`,
+    days are counted in bins of 2, 4, ... days; percentiles are then rounded
+    up to the end of their bin. The bin width only depends on the finishes
+    counted, so histograms of separate runs merge to the same counts.
+    """
+
+    _OFFSET = 1 << 31
+
+    def __init__(self, n: int, max_bins: int = HISTOGRAM_BINS) -> None:
+        self.n = n
+        self.max_bins = max_bins
+        self.width = 1
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def _key(self, nodes: np.ndarray, days: np.ndarray) -> np.ndarray:
+        return (nodes.astype(np.int64) << 32) | (np.floor_divide(days, self.width) + self._OFFSET)
+
+    def add(self, days: np.ndarray, known: np.ndarray) -> None:
+        if not known.any():
+            return
+        # sorting each row first leaves the keys sorted
+        days = np.sort(np.where(known, days, np.iinfo(np.int64).max), axis=1)
+        nodes, columns = np.nonzero(np.arange(known.shape[1]) < known.sum(axis=1)[:, None])
+        keys = self._key(nodes, days[nodes, columns])
+        del days, nodes, columns
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        self._fold(keys[starts], np.diff(np.r_[starts, keys.size]))
+
+    def merge(self, other: '_FinishHistogram') -> None:
+        if not other.keys.size:
+            return
+        keys, counts = other.keys, other.counts
+        while self.width < other.width:
+            self._coarsen()
+        if other.width < self.width:
+            keys = self._key(keys >> 32, ((keys & 0xFFFFFFFF) - self._OFFSET) * other.width)
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            keys, counts = keys[starts], np.add.reduceat(counts, starts)
+        self._fold(keys, counts)
+
+    def _fold(self, keys: np.ndarray, counts: np.ndarray) -> None:
+        """Add the counts of distinct sorted keys, binning days more coarsely while there are too many."""
+        position = np.searchsorted(self.keys, keys)
+        found = position < self.keys.size
+        found[found] = self.keys[position[found]] == keys[found]
+        self.counts[position[found]] += counts[found]
+        fresh = ~found
+        self.keys = np.insert(self.keys, position[fresh], keys[fresh])
+        self.counts = np.insert(self.counts, position[fresh], counts[fresh])
+        while self.keys.size > self.max_bins:
+            self._coarsen()
+
+    def _coarsen(self) -> None:
+        """Double the bin width."""
+        bins = (self.keys & 0xFFFFFFFF) - self._OFFSET
+        self.width *= 2
+        keys = ((self.keys >> 32) << 32) | (np.floor_divide(bins, 2) + self._OFFSET)
+        # halving keeps the keys sorted
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        self.keys, self.counts = keys[starts], np.add.reduceat(self.counts, starts)
+
+    def percentiles(self, percentiles) -> np.ndarray:
+        """Day of each percentile for every activity; NaN for activities without a finish."""
+        result = np.full((self.n, len(percentiles)), np.nan)
+        if not self.keys.size:
+            return result
+        nodes = self.keys >> 32
+        last_day = ((self.keys & 0xFFFFFFFF) - self._OFFSET) * self.width + self.width - 1
+        cumulative = np.cumsum(self.counts)
+        first = np.searchsorted(nodes, np.arange(self.n), side='left')
+        end = np.searchsorted(nodes, np.arange(self.n), side='right')
+        before = np.where(first > 0, cumulative[first - 1], 0)
+        total = np.where(end > first, cumulative[end - 1], 0) - before
+        counted = total > 0
+        for column, percentile in enumerate(percentiles):
+            # smallest day with at least the percentile of the iterations at or before it
+            rank = np.maximum(np.ceil(total * percentile / 100), 1).astype(np.int64)
+            position = np.searchsorted(cumulative, before + rank, side='left')
+            result[counted, column] = last_day[position[counted]]
+        return result
+
+
+class _Tally:
+    """Statistics of the iterations scheduled so far; tallies of separate runs merge."""
+
+    def __init__(self, n: int) -> None:
+        self.histogram = _FinishHistogram(n)
+        self.critical = np.zeros(n, dtype=np.int64)
+        # running sums for the correlation of every duration with the project finish
+        self.sum_d, self.sum_dd, self.sum_df = np.zeros(n), np.zeros(n), np.zeros(n)
+        self.finishes = []
+
+    def merge(self, other: '_Tally') -> None:
+        self.histogram.merge(other.histogram)
+        self.critical += other.critical
+        self.sum_d += other.sum_d
+        self.sum_dd += other.sum_dd
+        self.sum_df += other.sum_df
+        self.finishes.extend(other.finishes)
+
+
+class ScheduleRisk:
+    """
+    Monte Carlo schedule risk analysis on top of a `CPMEngine`.
+
+    Activity durations are drawn from triangular, PERT or uniform
+    distributions, and a batch of iterations is scheduled together: dates are
+    (activity, iteration) arrays and each level of the network is relaxed for
+    every iteration at once. The passes follow the engine's, except that LOE
+    activities are left out; they never drive other activities.
+
+    Args:
+        engine (CPMEngine): scheduled network; activities without a
+            distribution keep their duration
+        distributions (pd.DataFrame): table with `DISTRIBUTION_COLUMNS`
+        seed (int | None): seed of the random generator
+    """
+
+    def __init__(self, engine: CPMEngine, distributions: pd.DataFrame, seed: int | None = None) -> None:
+        self.logger = logging.getLogger('ScheduleRisk')
+        self.engine = engine
+        self.rng = np.random.default_rng(seed)
+        unknown = set(distributions['distribution']) - set(DISTRIBUTIONS)
+        if unknown:
+            raise ValueError(f"Unknown duration distribution(s): {sorted(unknown)}")
+        nodes = pd.Index(engine.task_ids).get_indexer(distributions['task_id'].astype(str))
+        if (nodes < 0).any():
+            self.logger.warning(f"{int((nodes < 0).sum())} distribution(s) for unknown activities ignored")
+        table = distributions[nodes >= 0]
+        self.nodes = nodes[nodes >= 0]
+        self.kind = table['distribution'].to_numpy(dtype=object)
+        low = pd.to_numeric(table['min_hr_cnt'], errors='coerce').to_numpy(dtype=np.float64)
+        high = pd.to_numeric(table['max_hr_cnt'], errors='coerce').to_numpy(dtype=np.float64)
+        mode = pd.to_numeric(table['most_likely_hr_cnt'], errors='coerce').to_numpy(dtype=np.float64)
+        self.low, self.high = np.minimum(low, high), np.maximum(low, high)
+        self.mode = np.clip(np.where(np.isnan(mode), (self.low + self.high) / 2, mode), self.low, self.high)
+        # only activities with a duration vary
+        varying = engine.has_duration[self.nodes] & ~np.isnan(self.low) & ~np.isnan(self.high)
+        self.nodes, self.kind = self.nodes[varying], self.kind[varying]
+        self.low, self.high, self.mode = self.low[varying], self.high[varying], self.mode[varying]
+
+    def sample(self, iterations: int, rng: np.random.Generator | None = None) -> np.ndarray:
+        """Durations in whole days, shape (activities, iterations)."""
+        engine = self.engine
+        rng = rng or self.rng
+        duration = np.repeat(engine.duration[:, None], iterations, axis=1)
+        hours = np.repeat(self.low[:, None], iterations, axis=1)
+        spread = self.high - self.low
+        wide = spread > 0
+        for kind in DISTRIBUTIONS:
+            rows = np.flatnonzero((self.kind == kind) & wide)
+            if not rows.size:
+                continue
+            low, high, mode = self.low[rows, None], self.high[rows, None], self.mode[rows, None]
+            size = (rows.size, iterations)
+            if kind == 'triangular':
+                hours[rows] = rng.triangular(low, mode, high, size=size)
+            elif kind == 'uniform':
+                hours[rows] = rng.uniform(low, high, size=size)
+            else:
+                alpha = 1 + 4 * (mode - low) / (high - low)
+                beta = 1 + 4 * (high - mode) / (high - low)
+                hours[rows] = low + (high - low) * rng.beta(alpha, beta, size=size)
+        duration[self.nodes] = np.floor_divide(hours, 24).astype(np.int64)
+        return duration
+
+    def _step(self, minutes: np.ndarray, days: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+        """`CPMEngine._add_days` for (node, iteration) arrays."""
+        iterations = minutes.shape[1]
+        return self.engine._add_days(minutes.ravel(), days.ravel(), np.repeat(nodes, iterations)).reshape(minutes.shape)
+
+    def forward_pass(self, duration: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Early start and finish of every iteration."""
+        engine = self.engine
+        dd = engine.data_date
+        shape = duration.shape
+        es, ef = np.full(shape, NAT, dtype=np.int64), np.full(shape, NAT, dtype=np.int64)
+        started, _, _ = engine._actuals()
+        done = started & (engine.act_end != NAT) & (engine.act_end <= dd)
+        es[started] = engine.act_start[started, None]
+        ef[done] = engine.act_end[done, None]
+        running = np.flatnonzero(started & ~done)
+        start = np.repeat(engine.act_start[running, None], shape[1], axis=1)
+        ef[running] = np.maximum(dd, self._step(start, duration[running], running))
+
+        default = max(engine.project_start, dd)
+        rollup = None
+        for nodes, other, pick, offset, segments, linked, timed, _, days, _, constrained, summaries, _ \
+                in engine._plan(forward=True, duration=duration):
+            start = np.full((nodes.size, shape[1]), default, dtype=np.int64)
+            if other.size:
+                values = np.where(pick[:, None], es[other], ef[other]) + offset
+                start[linked] = np.maximum(np.maximum.reduceat(values, segments, axis=0), dd)
+            if constrained:
+                start = engine._constrain(nodes, start, (2, 3, 4))
+            es[nodes] = start
+            finish = start.copy()
+            if timed.size:
+                finish[timed] = self._step(start[timed], days, nodes[timed])
+            ef[nodes] = finish
+            if summaries.size:
+                rollup = rollup or _SubtreeRollup(engine, ef, np.maximum, engine.rank)
+                rollup.roll_up(nodes[summaries], es[nodes[summaries]])
+        return es, ef
+
+    def backward_pass(self, duration: np.ndarray, project_end: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Late start and finish of every iteration."""
+        engine = self.engine
+        dd = engine.data_date
+        shape = duration.shape
+        ls, lf = np.full(shape, NAT, dtype=np.int64), np.full(shape, NAT, dtype=np.int64)
+        started, completed, waiting = engine._actuals()
+        lf[completed] = engine.act_end[completed, None]
+        ls[completed] = engine.act_start[completed, None]
+        running = np.flatnonzero(started & ~completed)
+        ls[running] = engine.act_start[running, None]
+        start = np.repeat(engine.act_start[running, None], shape[1], axis=1)
+        lf[running] = np.maximum(dd, self._step(start, duration[running], running))
+        fixed = ~engine.is_loe & ~waiting & ((engine.act_start == NAT) | (engine.act_start > dd))
+        for dates in (ls, lf):
+            dates[fixed] = np.where(dates[fixed] == NAT, NAT, np.maximum(dates[fixed], dd))
+
+        unset = np.iinfo(np.int64).max
+        rollup = None
+        for nodes, other, pick, offset, segments, linked, timed, _, days, _, constrained, summaries, _ \
+                in engine._plan(forward=False, duration=duration):
+            finish = np.repeat(project_end[None, :], nodes.size, axis=0)
+            if other.size:
+                base = np.where(pick[:, None], lf[other], ls[other])
+                earliest = np.minimum.reduceat(np.where(base == NAT, unset, base + offset[:, None]), segments, axis=0)
+                finish[linked] = np.where(earliest == unset, project_end, earliest)
+            if constrained:
+                finish = engine._constrain(nodes, finish, (5, 6, 7))
+            start = finish.copy()
+            if timed.size:
+                start[timed] = self._step(finish[timed], days, nodes[timed])
+            ls[nodes] = np.maximum(start, dd)
+            lf[nodes] = np.maximum(finish, dd)
+            if summaries.size:
+                rollup = rollup or _SubtreeRollup(engine, ls, np.minimum, -engine.rank)
+                rollup.roll_up(nodes[summaries][::-1], finish[summaries][::-1], lower=dd)
+        return ls, lf
+
+    def total_float(self, es: np.ndarray, ls: np.ndarray) -> np.ndarray:
+        """Total float in working days of every iteration, as `CPMEngine.calculate_total_float`."""
+        engine = self.engine
+        dd = engine.data_date
+        tf = np.full(es.shape, np.nan)
+        tf[engine.is_loe] = np.inf
+        completed = ~engine.is_loe & ~engine.is_wbs & (engine.act_end != NAT) & (engine.act_end <= dd)
+        tf[completed] = 0
+        nodes = np.flatnonzero(~engine.is_loe & ~engine.is_wbs & ~completed)
+        early = np.where(es[nodes] == NAT, NAT, np.maximum(es[nodes], dd))
+        late = ls[nodes]
+        known = (early != NAT) & (late != NAT)
+        rows = np.broadcast_to(nodes[:, None], known.shape)
+        values = tf[nodes]
+        values[known] = engine._days_between(early[known], late[known], rows[known])
+        tf[nodes] = values
+        summaries = np.flatnonzero(engine.is_wbs)
+        if summaries.size:
+            _SubtreeRollup(engine, tf, np.minimum, np.arange(engine.node_count)).roll_up(
+                summaries, np.zeros((summaries.size, es.shape[1])))
+        return tf
+
+    def _tally(self, batches: list[tuple[np.random.Generator, int]], float_threshold: float) -> _Tally:
+        engine = self.engine
+        tally = _Tally(engine.node_count)
+        for rng, iterations in batches:
+            duration = self.sample(iterations, rng)
+            es, ef = self.forward_pass(duration)
+            known = ef != NAT
+            project_end = np.where(known, ef, NAT).max(axis=0)
+            project_end = np.where(project_end == NAT, engine.data_date, project_end)
+            ls, _ = self.backward_pass(duration, project_end)
+            tally.critical += (self.total_float(es, ls) <= float_threshold).sum(axis=1)
+            tally.histogram.add(np.floor_divide(ef, MINUTES_PER_DAY), known)
+            tally.finishes.append(project_end)
+            days, finish = duration.astype(np.float64), (project_end / MINUTES_PER_DAY)[None, :]
+            tally.sum_d += days.sum(axis=1)
+            tally.sum_dd += (days * days).sum(axis=1)
+            tally.sum_df += (days * finish).sum(axis=1)
+        return tally
+
+    def run(self, iterations: int = 1000, percentiles=(10, 50, 80, 90), float_threshold: float = 0,
+            batch_size: int | None = None, workers: int | None = None) -> RiskResult:
+        """
+        Run the simulation.
+
+        Batches of iterations are split over worker processes, which get the
+        network once, when they start, and send back their statistics. Every
+        batch draws from its own generator, spawned from the seed, so results
+        do not depend on the number of workers.
+
+        Args:
+            iterations (int): number of iterations
+            percentiles: early finish percentiles reported per activity
+            float_threshold (float): total float, in days, at or under which an
+                activity counts as critical
+            batch_size (int | None): iterations scheduled together; defaults to
+                what keeps each date array near 64 MB
+            workers (int | None): number of worker processes; 1 runs in the
+                calling process. Defaults to the number of CPUs.
+
+        Returns:
+            RiskResult: project finishes and activity statistics
+        """
+        engine = self.engine
+        n = engine.node_count
+        batch_size = batch_size or max(1, min(iterations, (8 << 20) // max(n, 1)))
+        sizes = [min(batch_size, iterations - done) for done in range(0, iterations, batch_size)]
+        batches = list(zip(self.rng.spawn(len(sizes)), sizes))
+        workers = min(workers or os.cpu_count() or 1, len(batches))
+        if workers <= 1:
+            tally = self._tally(batches, float_threshold)
+        else:
+            if engine.is_wbs.any():
+                # worked out once here instead of in every worker
+                engine.rank
+            # consecutive batches per worker keep the project finishes in order
+            groups = [batches[len(batches) * i // workers:len(batches) * (i + 1) // workers] for i in range(workers)]
+            tally = _Tally(n)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self,)) as pool:
+                for part in pool.map(_tally_in_worker, groups, repeat(float_threshold)):
+                    tally.merge(part)
+
+        project_finish = np.concatenate(tally.finishes)
+        finish_days = project_finish / MINUTES_PER_DAY
+        mean_d = tally.sum_d / iterations
+        cov = tally.sum_df / iterations - mean_d * finish_days.mean()
+        std_d = np.sqrt(np.maximum(tally.sum_dd / iterations - mean_d ** 2, 0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cruciality = np.where(std_d > 0, cov / (std_d * finish_days.std()), np.nan)
+
+        completed = (engine.act_end != NAT) & (engine.act_end <= engine.data_date)
+        criticality = np.where(engine.is_loe | completed, np.nan, tally.critical / iterations)
+        activities = pd.DataFrame({'task_id': engine.task_ids})
+        days = tally.histogram.percentiles(percentiles)
+        for column, percentile in enumerate(percentiles):
+            day = days[:, column]
+            minutes = np.where(np.isnan(day), NAT, np.nan_to_num(day).astype(np.int64) * MINUTES_PER_DAY)
+            activities[f'p{percentile:g}'] = minutes.astype('datetime64[m]')
+        activities['criticality'] = criticality
+        activities['cruciality'] = np.where(engine.is_loe, np.nan, cruciality)
+        return RiskResult(project_finish.astype('datetime64[m]'), activities)
+
+
+_risk: ScheduleRisk | None = None
+
+
+def _init_worker(risk: ScheduleRisk) -> None:
+    global _risk
+    _risk = risk
+
+
+def _tally_in_worker(batches: list[tuple[np.random.Generator, int]], float_threshold: float) -> _Tally:
+    return _risk._tally(batches, float_threshold)
@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 import logging
 import os
 from typing import Tuple
@@ -5,12 +7,12 @@ from typing import Tuple
 import pandas as pd
 from datetime import datetime
 
-from mdutils import MdUtils
-from mdutils.tools.Table import Table
-
 from local.libs.total_float_method import TotalFloatCPMCalculator
 from local.libs.xer_file_creation import XerFileGenerator, ProgressCalculator
 from xerparser import Xer
+from xerparser.src._lazy import lazy_import
+
+mdutils = lazy_import("mdutils")
 
 
 class ScheduleSplitter:
@@ -87,7 +89,7 @@ class ScheduleSplitter:
             return
 
         project_info = self.xer.project_df
-        mdFile = MdUtils(file_name=output_file, title='Project Progress Report')
+        mdFile = mdutils.MdUtils(file_name=output_file, title='Project Progress Report')
 
         # Table of Contents
         mdFile.new_table_of_contents(table_title='Contents', depth=2)
@@ -1,12 +1,41 @@
 # total_float_method.py
+from __future__ import annotations
+
 import logging
 
-import networkx as nx
+import numpy as np
 import pandas as pd
-from mdutils import MdUtils
 
+from xerparser.src._lazy import lazy_import
+
+from local.libs.compiled_calendar import schedule_horizon
+from local.libs.cpm_engine import DURATION_TYPES, NAT, CPMEngine
+from local.libs.cycles import feedback_edges, logic_loops
+from local.libs.wbs_index import WBSIndex
 from local.libs.working_day_calculator import WorkingDayCalculator
 
+nx = lazy_import("networkx")
+mdutils = lazy_import("mdutils")
+
+
+def _schedule_result(name: str, doc: str) -> property:
+    """
+    Result dict of the calculator, keyed by task_id. After `schedule` it is
+    built from the engine arrays on first access; the reference passes fill it in place.
+    """
+    def get(self):
+        values = self._results.get(name)
+        if values is None:
+            values = self._results[name] = self._engine_result(name) if self.engine is not None else {}
+        return values
+
+    def set_(self, values):
+        self._results[name] = values
+
+    return property(get, set_, doc=doc)
+
+KNOWN_TASK_TYPES = ('TT_Task', 'TT_Rsrc', 'TT_LOE', 'TT_Mile', 'TT_FinMile', 'TT_WBS')
+
 
 class TotalFloatCPMCalculator:
     """
@@ -18,16 +47,24 @@ class TotalFloatCPMCalculator:
         xer (Xer): The XER object containing project data.
         workdays_df (pd.DataFrame): DataFrame containing workdays information.
         exceptions_df (pd.DataFrame): DataFrame containing exceptions information.
-        graph (nx.DiGraph): Directed graph representing project activities and dependencies.
+        graph (nx.DiGraph): Directed graph of all the activities and dependencies, built by `build_graph`
+            on first access.
+        loop_graph (nx.DiGraph | None): Graph of the activities on or after a logic loop that
+            `calculate_critical_path` breaks the loops on; None when the schedule has no loops.
+        engine (CPMEngine): Array engine of the last schedule.
         early_start (dict): Dictionary mapping tasks to their early start dates.
         early_finish (dict): Dictionary mapping tasks to their early finish dates.
         late_start (dict): Dictionary mapping tasks to their late start dates.
         late_finish (dict): Dictionary mapping tasks to their late finish dates.
         total_float (dict): Dictionary mapping tasks to their total float values.
         critical_path (list): List of tasks that form the critical path.
+        driving_path (list): Chain of driving relationships to the activity that finishes the project,
+            first activity first.
         data_date (pd.Timestamp): The date of the last recalculation of the project.
         cycles (list): List to store cycles detected in the project graph.
         removed_cycle_tasks (list): List to store tasks that were removed to break cycles.
+        float_path_count (int): Number of float paths `update_task_df` numbers.
+        float_path_ranking (str): How float paths are ranked, 'free_float' or 'total_float'.
     """
 
     def __init__(self, xer_object):
@@ -37,16 +74,31 @@ class TotalFloatCPMCalculator:
         self.xer = xer_object
         self.workdays_df = pd.DataFrame(columns=['clndr_id', 'day', 'start_time', 'end_time'])
         self.exceptions_df = pd.DataFrame(columns=['clndr_id', 'exception_date', 'start_time', 'end_time'])
-        self.graph = nx.DiGraph()
-        self.early_start = {}
-        self.early_finish = {}
-        self.late_start = {}
-        self.late_finish = {}
-        self.total_float = {}
+        self._graph = None
+        self.loop_graph = None
+        self.engine = None  # CPMEngine of the last schedule
+        self._results = {}  # result dicts, see _schedule_result
         self.critical_path = []
+        self.driving_path = []
         self.data_date = pd.to_datetime(self.xer.project_df['last_recalc_date'].iloc[0])
         self.cycles = []  # New property to store cycles
         self.removed_cycle_tasks = []  # New property to store removed tasks
+        self.subtask_index = None  # WBS tour index of the graph nodes, see _subtask_index
+        self.float_path_count = 10
+        self.float_path_ranking = 'free_float'
+
+    early_start = _schedule_result('early_start', "Early start date by task_id")
+    early_finish = _schedule_result('early_finish', "Early finish date by task_id")
+    late_start = _schedule_result('late_start', "Late start date by task_id")
+    late_finish = _schedule_result('late_finish', "Late finish date by task_id")
+    total_float = _schedule_result('total_float', "Total float in days by task_id")
+
+    @property
+    def graph(self):
+        """Directed graph of all the activities and dependencies, see `build_graph`."""
+        if self._graph is None:
+            self.build_graph()
+        return self._graph
 
     def apply_activity_constraints(self, node, is_forward_pass=True):
         # Define valid constraint types
@@ -148,72 +200,91 @@ class TotalFloatCPMCalculator:
     def set_exceptions_df(self, exception):
         self.exceptions_df = exception.copy()
 
+    def task_durations(self, task_df: pd.DataFrame) -> list:
+        """
+        Durations of the graph nodes: whole days of the target duration; milestones,
+        WBS summaries and unknown task types have none.
+
+        Args:
+        task_df (pd.DataFrame): TASK rows.
+
+        Returns:
+        list: One duration per row, NaN where the target duration is not a number.
+        """
+        hours = pd.to_numeric(task_df['target_drtn_hr_cnt'], errors='coerce')
+        days = pd.to_timedelta(hours, unit='h').dt.days.astype(object)
+        days = days.where(task_df['task_type'].isin(DURATION_TYPES), 0)
+        return [day if pd.isna(day) else int(day) for day in days]
+
     def build_graph(self):
-        for _, task in self.xer.task_df.iterrows():
-            task_type = task['task_type']
-
-            # Handle different task types
-            if task_type in ['TT_Mile', 'TT_FinMile']:
-                duration = 0  # Milestones have zero duration
-            elif task_type == 'TT_LOE':
-                # Level of Effort tasks are handled separately
-                duration = pd.to_timedelta(pd.to_numeric(task['target_drtn_hr_cnt']), unit='h').days
-            elif task_type in ['TT_Task', 'TT_Rsrc']:
-                # Regular tasks and resource-dependent tasks
-                duration = pd.to_timedelta(pd.to_numeric(task['target_drtn_hr_cnt']), unit='h').days
-            elif task_type == 'TT_WBS':
-                # WBS summary tasks
-                duration = 0  # Duration will be calculated based on subtasks
-            else:
-                print(f"Warning: Unknown task type {task_type} for task {task['task_id']}")
-                duration = 0
-
-            act_start_date = pd.to_datetime(task['act_start_date'], errors='coerce')
-            act_end_date = pd.to_datetime(task['act_end_date'], errors='coerce')
-
-            self.graph.add_node(task['task_id'],
-                                duration=duration,
-                                calendar_id=task['clndr_id'],
-                                cstr_type=task['cstr_type'],
-                                cstr_date=task['cstr_date'],
-                                cstr_type2=task['cstr_type2'],
-                                cstr_date2=task['cstr_date2'],
-                                act_start_date=act_start_date,
-                                act_end_date=act_end_date,
-                                task_type=task_type,
-                                is_loe=(task_type == 'TT_LOE'),
-                                wbs_id=task['wbs_id'])  # Added WBS ID
-
-        for _, pred in self.xer.taskpred_df.iterrows():
-            try:
-                lag = pd.to_timedelta(pd.to_numeric(pred['lag_hr_cnt']), unit='h')
-            except ValueError:
-                print(
-                    f"Warning: Invalid lag for relationship {pred['pred_task_id']} -> {pred['task_id']}: {pred['lag_hr_cnt']}")
-                lag = pd.Timedelta(seconds=0)
-            self.graph.add_edge(pred['pred_task_id'], pred['task_id'], lag=lag, taskpred_type=pred['pred_type'])
-
-        # Handle WBS summary tasks
-        for node in self.graph.nodes:
-            if self.graph.nodes[node]['task_type'] == 'TT_WBS':
-                self.graph.nodes[node]['subtasks'] = self.get_subtasks(node)
-
-    def detect_cycles(self):
-        try:
-            self.cycles = list(nx.simple_cycles(self.graph))
-            if self.cycles:
-                self.logger.error(f"Cycles detected in the graph: {self.cycles}")
-            return self.cycles
-        except nx.NetworkXNoCycle:
-            self.cycles = []
-            return []
+        self._graph = nx.DiGraph()
+        task_df = self.xer.task_df
+        task_type = task_df['task_type']
+        durations = self.task_durations(task_df)
+        for task_id, unknown in task_df.loc[~task_type.isin(KNOWN_TASK_TYPES), ['task_id', 'task_type']].values:
+            print(f"Warning: Unknown task type {unknown} for task {task_id}")
+
+        act_start_dates = pd.to_datetime(task_df['act_start_date'], errors='coerce')
+        act_end_dates = pd.to_datetime(task_df['act_end_date'], errors='coerce')
+        columns = zip(task_df['task_id'], durations, task_df['clndr_id'], task_df['cstr_type'], task_df['cstr_date'],
+                      task_df['cstr_type2'], task_df['cstr_date2'], act_start_dates, act_end_dates, task_type,
+                      task_df['wbs_id'])
+        self.graph.add_nodes_from(
+            (task_id, {'duration': duration,
+                       'calendar_id': clndr_id,
+                       'cstr_type': cstr_type,
+                       'cstr_date': cstr_date,
+                       'cstr_type2': cstr_type2,
+                       'cstr_date2': cstr_date2,
+                       'act_start_date': act_start,
+                       'act_end_date': act_end,
+                       'task_type': type_,
+                       'is_loe': type_ == 'TT_LOE',
+                       'wbs_id': wbs_id})
+            for task_id, duration, clndr_id, cstr_type, cstr_date, cstr_type2, cstr_date2, act_start, act_end, type_,
+            wbs_id in columns)
+
+        taskpred_df = self.xer.taskpred_df
+        lag_hours = pd.to_numeric(taskpred_df['lag_hr_cnt'], errors='coerce')
+        invalid = lag_hours.isna() & taskpred_df['lag_hr_cnt'].notna()
+        for pred_task_id, task_id, lag in taskpred_df.loc[invalid, ['pred_task_id', 'task_id', 'lag_hr_cnt']].values:
+            print(f"Warning: Invalid lag for relationship {pred_task_id} -> {task_id}: {lag}")
+        lags = pd.to_timedelta(lag_hours.where(~invalid, 0), unit='h')
+        self.graph.add_edges_from(
+            (pred_task_id, task_id, {'lag': lag, 'taskpred_type': pred_type})
+            for pred_task_id, task_id, lag, pred_type in zip(taskpred_df['pred_task_id'], taskpred_df['task_id'],
+                                                             lags, taskpred_df['pred_type']))
+
+        # Handle WBS summary tasks: each keeps the (first, last) slice of its subtasks in the WBS
+        # tour order and get_subtasks lists them when a pass needs them
+        self.subtask_index = None
+        summaries = [node for node, task_type in self.graph.nodes(data='task_type') if task_type == 'TT_WBS']
+        if summaries:
+            wbs_index, _, entries = self._subtask_index()
+            slices = wbs_index.subtree_slices(entries, [self.graph.nodes[node]['wbs_id'] for node in summaries])
+            nx.set_node_attributes(self.graph, dict(zip(summaries, map(tuple, slices.tolist()))), 'subtask_slice')
+
+    def detect_cycles(self, graph=None):
+        """
+        Find the logic loops of the graph as strongly connected components.
+
+        Args:
+        graph (nx.DiGraph, optional): Graph to search; `graph` by default.
+
+        Returns:
+        list: A list of loops, where each loop is the list of task IDs of one strongly connected component.
+        """
+        self.cycles = logic_loops(self.graph if graph is None else graph)
+        for loop in self.cycles:
+            self.logger.error(f"Logic loop of {len(loop)} tasks detected in the graph: {loop}")
+        return self.cycles
 
     def get_cycles(self):
         """
-        Returns an array of all the cycles in the tasks.
+        Returns the logic loops found by `detect_cycles`.
 
         Returns:
-        list: A list of cycles, where each cycle is a list of task IDs forming the cycle.
+        list: A list of loops, where each loop is the list of task IDs of one strongly connected component.
         """
         return self.cycles
 
@@ -288,7 +359,7 @@ class TotalFloatCPMCalculator:
                     self.early_finish[node] = self.early_start[node]
                 elif task_type == 'TT_WBS':
                     # For WBS summary tasks, early finish is the max of its subtasks
-                    subtasks = self.graph.nodes[node]['subtasks']
+                    subtasks = self.get_subtasks(node)
                     if subtasks:
                         subtask_finishes = [self.early_finish[subtask] for subtask in subtasks if
                                             self.early_finish[subtask] is not None]
@@ -306,7 +377,10 @@ class TotalFloatCPMCalculator:
                     )
                     self.early_finish[node] = pd.Timestamp(calculated_finish)
 
-        # Handle LOE tasks after all other tasks have been scheduled
+        # Handle LOE tasks after all other tasks have been scheduled. LOE finishes never pass the
+        # latest finish of the other tasks, so the project finish is taken once.
+        non_none_finishes = [finish for finish in self.early_finish.values() if finish is not None]
+        project_finish = max(non_none_finishes) if non_none_finishes else self.data_date
         for node in self.graph.nodes:
             if self.graph.nodes[node]['task_type'] == 'TT_LOE':
                 predecessors = list(self.graph.predecessors(node))
@@ -326,12 +400,10 @@ class TotalFloatCPMCalculator:
                         self.early_finish[node] = max(successor_finishes)
                     else:
                         # If all successors have None as early_finish, use project end date
-                        non_none_finishes = [finish for finish in self.early_finish.values() if finish is not None]
-                        self.early_finish[node] = max(non_none_finishes) if non_none_finishes else self.data_date
+                        self.early_finish[node] = project_finish
                 else:
                     # If there are no successors, use project end date
-                    non_none_finishes = [finish for finish in self.early_finish.values() if finish is not None]
-                    self.early_finish[node] = max(non_none_finishes) if non_none_finishes else self.data_date
+                    self.early_finish[node] = project_finish
 
         self.logger.info("Forward pass completed")
 
@@ -405,7 +477,7 @@ class TotalFloatCPMCalculator:
                     self.late_start[node] = self.late_finish[node]
                 elif task_type == 'TT_WBS':
                     # For WBS summary tasks, late start is the min of its subtasks
-                    subtasks = self.graph.nodes[node]['subtasks']
+                    subtasks = self.get_subtasks(node)
                     if subtasks:
                         subtask_starts = [self.late_start[subtask] for subtask in subtasks if
                                           self.late_start[subtask] is not None]
@@ -468,12 +540,10 @@ class TotalFloatCPMCalculator:
                 self.total_float[node] = float('inf')
             elif task_type == 'TT_WBS':
                 # WBS Summary tasks' float is the minimum float of their subtasks
-                subtasks = self.graph.nodes[node]['subtasks']
-                if subtasks:
-                    self.total_float[node] = min(
-                        self.total_float[subtask] for subtask in subtasks if subtask in self.total_float)
-                else:
-                    self.total_float[node] = 0
+                subtasks = self.get_subtasks(node)
+                # subtasks listed after the summary have no float yet
+                self.total_float[node] = min(
+                    (self.total_float[subtask] for subtask in subtasks if subtask in self.total_float), default=0)
             elif pd.notnull(self.graph.nodes[node]['act_end_date']) and self.graph.nodes[node][
                 'act_end_date'] <= self.data_date:
                 # Completed tasks have zero float
@@ -499,139 +569,202 @@ class TotalFloatCPMCalculator:
                 self.logger.warning(f"Negative total float detected for task {node}: {self.total_float[node]}")
 
     def determine_critical_path(self, float_threshold=0):
-        self.critical_path = []
-        critical_tasks = []
-        completed_critical_tasks = []
-
-        for node, data in self.graph.nodes(data=True):
-            task_type = data['task_type']
-            total_float = self.total_float.get(node)
-            is_completed = pd.notnull(data['act_end_date']) and data['act_end_date'] <= self.data_date
-
-            if task_type == 'TT_LOE':
-                continue  # Exclude Level of Effort tasks from critical path
+        """
+        Critical activities of the last schedule: completed ones in table order, then the others
+        in topological order. Reads the engine arrays, so no graph is needed. Also sets
+        `driving_path`, the chain of activities that actually drives the project finish.
 
-            if total_float is None:
-                self.logger.warning(
-                    f"Task {node} has no total float calculated. Skipping in critical path determination.")
-                continue
+        Args:
+        float_threshold (int): Largest total float, in days, of a critical activity.
 
-            if total_float <= float_threshold:
-                if is_completed:
-                    completed_critical_tasks.append(node)
-                else:
-                    critical_tasks.append(node)
+        Returns:
+        list: The task IDs of the critical path.
+        """
+        engine = self.engine
+        self.critical_path = engine.critical_path(float_threshold)
 
-        # Sort non-completed critical tasks topologically
-        try:
-            critical_subgraph = self.graph.subgraph(critical_tasks)
-            sorted_critical_tasks = list(nx.topological_sort(critical_subgraph))
-        except nx.NetworkXUnfeasible:
-            self.logger.error("Critical path contains a cycle. Unable to determine a valid critical path.")
-            return
+        unknown = int((~engine.is_loe & np.isnan(engine.total_float)).sum())
+        if unknown:
+            self.logger.warning(
+                f"{unknown} tasks have no total float calculated. Skipping them in critical path determination.")
 
-        # Combine completed and non-completed critical tasks
-        self.critical_path = completed_critical_tasks + sorted_critical_tasks
+        nodes = pd.Index(engine.task_ids).get_indexer(self.critical_path)
+        completed = (engine.act_end[nodes] != NAT) & (engine.act_end[nodes] <= engine.data_date)
 
         # Log completed critical tasks
-        if completed_critical_tasks:
-            self.logger.info(f"Completed critical tasks: {', '.join(map(str, completed_critical_tasks))}")
-
-        # Verify critical path continuity
-        for i in range(len(sorted_critical_tasks) - 1):
-            current_task = sorted_critical_tasks[i]
-            next_task = sorted_critical_tasks[i + 1]
-            if next_task not in self.graph.successors(current_task):
-                self.logger.warning(f"Discontinuity in critical path between tasks {current_task} and {next_task}")
-
-        # Check if critical path starts from a start task and ends at an end task
-        start_tasks = [node for node in self.graph.nodes if not list(self.graph.predecessors(node))]
-        end_tasks = [node for node in self.graph.nodes if not list(self.graph.successors(node))]
-
-        if self.critical_path and self.critical_path[0] not in start_tasks:
+        if completed.any():
+            self.logger.info(f"Completed critical tasks: {', '.join(engine.task_ids[nodes[completed]])}")
+
+        # The driving chain to the project finish links the critical activities by relationship;
+        # critical activities off it are on parallel chains or held by constraints
+        self.driving_path = engine.longest_path()
+        driving = pd.Index(engine.task_ids).get_indexer(self.driving_path)
+        off_chain = np.setdiff1d(nodes[~completed], driving)
+        if off_chain.size:
+            self.logger.info(f"Critical tasks off the driving path: {', '.join(engine.task_ids[off_chain])}")
+        slack = driving[~(engine.total_float[driving] <= float_threshold)]
+        if slack.size:
+            self.logger.warning(f"Driving path runs through non-critical tasks: {', '.join(engine.task_ids[slack])}")
+
+        # Check if the driving path starts from a start task and ends at an end task
+        if driving.size and engine.in_degree[driving[0]] > 0:
             self.logger.warning("Critical path does not start from a project start task.")
 
-        if self.critical_path and self.critical_path[-1] not in end_tasks:
+        if driving.size and engine.out_degree[driving[-1]] > 0:
             self.logger.warning("Critical path does not end at a project end task.")
 
         # Log the identified critical path
         self.logger.info(f"Critical path identified: {' -> '.join(map(str, self.critical_path))}")
 
         # Calculate and log the critical path length
-        if self.critical_path:
-            critical_path_length = sum(self.graph.nodes[node]['duration'] for node in self.critical_path
-                                       if not pd.notnull(self.graph.nodes[node]['act_end_date']))
+        if nodes.size:
+            critical_path_length = int(engine.duration[nodes[engine.act_end[nodes] == NAT]].sum())
             self.logger.info(f"Critical path length: {critical_path_length} days")
 
         # Identify near-critical paths
         near_critical_threshold = float_threshold * 1.1  # 10% more than the critical threshold
-        near_critical_tasks = [node for node, data in self.graph.nodes(data=True)
-                               if self.total_float.get(node, float('inf')) <= near_critical_threshold
-                               and node not in self.critical_path]
-
-        if near_critical_tasks:
-            self.logger.info(f"Near-critical tasks identified: {', '.join(map(str, near_critical_tasks))}")
+        near_critical = engine.total_float <= near_critical_threshold
+        near_critical[nodes] = False
+        if near_critical.any():
+            self.logger.info(f"Near-critical tasks identified: {', '.join(engine.task_ids[near_critical])}")
 
         return self.critical_path
 
     def calculate_critical_path(self):
-        self.working_day_calculator = WorkingDayCalculator(self.workdays_df, self.exceptions_df)
-        self.build_graph()
-
-        cycles = self.detect_cycles()
-        if cycles:
-            self.logger.error("Cycles detected in the graph. Attempting to break cycles.")
-            self.break_cycles(cycles)
-
-        # Check if cycles still exist and use a fallback method if necessary
-        if self.detect_cycles():
-            self.logger.warning("Cycles still exist after initial attempt to break them. Using fallback method.")
-            self.break_cycles_fallback()
-
-        # Final check for cycles
-        final_cycles = self.detect_cycles()
-        if final_cycles:
-            self.logger.error("Unable to break all cycles. Cannot calculate critical path.")
-            return []
-
-        try:
-            self.forward_pass()
-            self.backward_pass()
-            self.calculate_total_float()
-            return self.determine_critical_path()
-        except nx.NetworkXUnfeasible:
-            self.logger.error("Unable to calculate critical path due to remaining cycles.")
-            return []
-
-    def break_cycles(self, cycles):
-        for cycle in cycles:
-            max_lag = pd.Timedelta(seconds=0)
-            edge_to_remove = None
-            for i in range(len(cycle)):
-                u, v = cycle[i], cycle[(i + 1) % len(cycle)]
-                if self.graph.has_edge(u, v):
-                    lag = self.graph[u][v].get('lag', pd.Timedelta(seconds=0))
-                    if isinstance(lag, (int, float)):
-                        lag = pd.Timedelta(seconds=lag)
-                    if lag > max_lag:
-                        max_lag = lag
-                        edge_to_remove = (u, v)
+        # Once calendar frames are set, the calendars are compiled from the CALENDAR table
+        # through the shared calendar cache, so every window of a project reuses them.
+        calendar_df = None
+        if not (self.workdays_df.empty and self.exceptions_df.empty):
+            calendar_df = getattr(self.xer, 'calendar_df', None)
+        # Calendars are compiled once over the dates of the schedule and grow past them on demand
+        horizon = schedule_horizon(self.xer.task_df, getattr(self.xer, 'project_df', None))
+        self.working_day_calculator = WorkingDayCalculator(self.workdays_df, self.exceptions_df, calendar_df,
+                                                           horizon=horizon)
+        engine = CPMEngine.from_xer(self.xer, self.working_day_calculator.calendars,
+                                    exclude_edges=self.removed_cycle_tasks)
+
+        # Only the activities the engine could not level are on or after a logic loop,
+        # so the loops are broken on a graph of them alone
+        self.loop_graph = None
+        if (engine.level < 0).any():
+            self.build_loop_graph(engine)
+            cycles = self.detect_cycles(self.loop_graph)
+            if cycles:
+                self.logger.error("Cycles detected in the graph. Attempting to break cycles.")
+                self.break_cycles(cycles, self.loop_graph)
+
+                if not nx.is_directed_acyclic_graph(self.loop_graph):
+                    self.logger.warning("Cycles still exist after initial attempt to break them. Using fallback method.")
+                    self.break_cycles_fallback(self.loop_graph)
+
+                if not nx.is_directed_acyclic_graph(self.loop_graph):
+                    self.logger.error("Unable to break all cycles. Cannot calculate critical path.")
+                    return []
+            engine = None
+
+        self.schedule(engine)
+        return self.determine_critical_path()
+
+    def build_loop_graph(self, engine):
+        """
+        Set `loop_graph` to the graph of the activities the engine left unleveled: those on a
+        logic loop and those after one.
 
-            if edge_to_remove:
-                self.graph.remove_edge(*edge_to_remove)
-                self.removed_cycle_tasks.append(edge_to_remove)
-                self.logger.warning(f"Removed edge {edge_to_remove} to break cycle.")
-            else:
-                self.logger.error(f"Unable to break cycle: {cycle}")
+        Every logic loop lies within them, so `detect_cycles` and the cycle breaking methods
+        work on this graph as they would on `graph`.
+
+        Args:
+        engine (CPMEngine): Engine of the schedule.
+        """
+        network = engine.network
+        looped = engine.level < 0
+        edges = np.flatnonzero(looped[network.edge_pred] & looped[network.edge_succ])
+        edges = edges[np.argsort(engine.edge_order[edges], kind='stable')]
+        self.loop_graph = nx.DiGraph()
+        self.loop_graph.add_nodes_from(
+            (task_id, {'duration': int(duration)})
+            for task_id, duration in zip(engine.task_ids[looped], engine.duration[looped]))
+        self.loop_graph.add_edges_from(
+            (pred, succ, {'lag': pd.Timedelta(hours=lag)})
+            for pred, succ, lag in zip(engine.task_ids[network.edge_pred[edges]],
+                                       engine.task_ids[network.edge_succ[edges]], network.lag_hr[edges]))
+
+    def schedule(self, engine=None):
+        """
+        Forward pass, backward pass and total float with the array engine.
+
+        Gives the same dates and floats as `forward_pass`, `backward_pass` and
+        `calculate_total_float`, which are kept as the reference implementation.
+
+        Args:
+        engine (CPMEngine, optional): Unscheduled engine of the schedule; by default one is
+            built without the relationships removed to break cycles.
+        """
+        if engine is None:
+            engine = CPMEngine.from_xer(self.xer, self.working_day_calculator.calendars,
+                                        exclude_edges=self.removed_cycle_tasks)
+        self.engine = engine.schedule()
+        # the result dicts are built from the engine arrays when first read
+        self._results = {}
+
+    def _engine_result(self, name):
+        """Result dict of the engine by task_id, as the reference passes give it."""
+        if name == 'total_float':
+            return {task_id: None if np.isnan(value) else (value if np.isinf(value) else int(value))
+                    for task_id, value in zip(self.engine.task_ids, self.engine.total_float.tolist())}
+        return dict(zip(self.engine.task_ids, self._engine_column(name, self.engine.task_ids)))
+
+    def _engine_column(self, name, task_ids) -> pd.Series:
+        """
+        Engine result of each task id: dates as datetime64[ns] with NaT, total float
+        with inf where it is unknown.
+        """
+        nodes = self.engine.task_index.get_indexer(pd.Index(task_ids).astype(str))
+        known = nodes >= 0
+        values = getattr(self.engine, name)[np.where(known, nodes, 0)]
+        if name == 'total_float':
+            return pd.Series(np.where(known & ~np.isnan(values), values, np.inf))
+        dates = values.astype('datetime64[m]').astype('datetime64[ns]')
+        return pd.Series(np.where(known, dates, np.datetime64('NaT', 'ns')))
+
+    def break_cycles(self, cycles, graph=None):
+        """
+        Remove a minimal set of relationships that breaks every logic loop.
+
+        The relationships with the largest lag are the ones preferred for removal.
+
+        Args:
+        cycles (list): Logic loops from `detect_cycles`.
+        graph (nx.DiGraph, optional): Graph the loops were found in; `graph` by default.
+        """
+        graph = self.graph if graph is None else graph
 
-    def break_cycles_fallback(self):
+        def lag_hours(u, v):
+            lag = graph[u][v].get('lag', pd.Timedelta(seconds=0))
+            if isinstance(lag, (int, float)):
+                lag = pd.Timedelta(seconds=lag)
+            return 0 if pd.isna(lag) else lag / pd.Timedelta(hours=1)
+
+        for edge_to_remove in feedback_edges(graph, cycles, preference=lag_hours):
+            graph.remove_edge(*edge_to_remove)
+            self.removed_cycle_tasks.append(edge_to_remove)
+            self.logger.warning(f"Removed edge {edge_to_remove} to break cycle.")
+
+    def break_cycles_fallback(self, graph=None):
+        """
+        Break the remaining loops one relationship at a time, removing the one into the shortest activity.
+
+        Args:
+        graph (nx.DiGraph, optional): Graph to break the loops of; `graph` by default.
+        """
+        graph = self.graph if graph is None else graph
         while True:
             try:
-                list(nx.topological_sort(self.graph))
+                list(nx.topological_sort(graph))
                 break  # If topological sort succeeds, the graph is acyclic
             except nx.NetworkXUnfeasible:
                 try:
-                    cycle = nx.find_cycle(self.graph)
+                    cycle = nx.find_cycle(graph)
                     if not cycle:
                         break  # No more cycles found
                 except nx.NetworkXNoCycle:
@@ -640,13 +773,13 @@ class TotalFloatCPMCalculator:
                 min_weight = float('inf')
                 edge_to_remove = None
                 for u, v in cycle:
-                    weight = self.graph.nodes[v]['duration']
+                    weight = graph.nodes[v]['duration']
                     if weight < min_weight:
                         min_weight = weight
                         edge_to_remove = (u, v)
 
                 if edge_to_remove:
-                    self.graph.remove_edge(*edge_to_remove)
+                    graph.remove_edge(*edge_to_remove)
                     self.removed_cycle_tasks.append(edge_to_remove)
                     self.logger.warning(f"Removed edge {edge_to_remove} to break cycle in fallback method.")
                 else:
@@ -654,7 +787,7 @@ class TotalFloatCPMCalculator:
                     break
 
         # After breaking cycles, check if the graph is acyclic
-        if list(nx.simple_cycles(self.graph)):
+        if not nx.is_directed_acyclic_graph(graph):
             self.logger.error("Unable to break all cycles. The graph still contains cycles.")
 
     def get_removed_cycle_tasks(self):
@@ -673,15 +806,25 @@ class TotalFloatCPMCalculator:
         once it is changed it changes the provide XER
 
         '''
-        self.xer.task_df['early_start'] = self.xer.task_df['task_id'].map(self.early_start).fillna(pd.NaT)
-        self.xer.task_df['early_finish'] = self.xer.task_df['task_id'].map(self.early_finish).fillna(pd.NaT)
-        self.xer.task_df['late_start'] = self.xer.task_df['task_id'].map(self.late_start).fillna(pd.NaT)
-        self.xer.task_df['late_finish'] = self.xer.task_df['task_id'].map(self.late_finish).fillna(pd.NaT)
-        self.xer.task_df['total_float'] = self.xer.task_df['task_id'].map(self.total_float).fillna(float('inf'))
-        self.xer.task_df['is_critical'] = False
-        self.xer.task_df.loc[self.xer.task_df['task_id'].isin(self.critical_path), 'is_critical'] = True
-        self.xer.task_df['target_start_date'] = self.xer.task_df.apply(self.calculate_forecast_start, axis=1)
-        self.xer.task_df['target_end_date'] = self.xer.task_df.apply(self.calculate_forecast_finish, axis=1)
+        task_df = self.xer.task_df
+        # the engine arrays are assigned a column at a time; the dicts of the reference passes are mapped
+        for name in ('early_start', 'early_finish', 'late_start', 'late_finish', 'total_float'):
+            if self.engine is not None:
+                task_df[name] = self._engine_column(name, task_df['task_id']).to_numpy()
+            else:
+                task_df[name] = task_df['task_id'].map(getattr(self, name)).fillna(
+                    float('inf') if name == 'total_float' else pd.NaT)
+        task_df['is_critical'] = task_df['task_id'].isin(self.critical_path)
+        if self.engine is not None:
+            nodes = self.engine.task_index.get_indexer(task_df['task_id'].astype(str))
+            float_path, float_path_order = self.engine.float_paths(self.float_path_count, self.float_path_ranking)
+            task_df['float_path'] = np.where(nodes >= 0, float_path[nodes], 0).astype(int)
+            task_df['float_path_order'] = np.where(nodes >= 0, float_path_order[nodes], 0).astype(int)
+        act_end = pd.to_datetime(task_df['act_end_date'], errors='coerce')
+        completed = act_end.notna() & (act_end <= self.data_date)
+        task_df['target_start_date'] = pd.to_datetime(task_df['early_start'], errors='coerce').where(
+            ~completed, pd.to_datetime(task_df['act_start_date'], errors='coerce'))
+        task_df['target_end_date'] = self.calculate_forecast_finishes(task_df)
 
     def calculate_forecast_start(self, task):
         if pd.notnull(task['act_end_date']) and task['act_end_date'] <= self.data_date:
@@ -696,11 +839,31 @@ class TotalFloatCPMCalculator:
             forecast_start = self.calculate_forecast_start(task)
             if pd.isnull(forecast_start):
                 return pd.NaT
-            duration = self.graph.nodes[task['task_id']].get('duration', 0)
-            calendar_id = self.graph.nodes[task['task_id']].get('calendar_id')
+            duration = self.task_durations(pd.DataFrame([task]))[0]
+            calendar_id = task['clndr_id']
             forecast_finish = self.working_day_calculator.add_working_days(forecast_start, duration, calendar_id)
             return forecast_finish
 
+    def calculate_forecast_finishes(self, task_df: pd.DataFrame) -> pd.Series:
+        """
+        Vectorized `calculate_forecast_finish` for every row of a TASK DataFrame.
+        The calendar arithmetic runs once per calendar instead of once per task.
+        """
+        act_end = pd.to_datetime(task_df['act_end_date'], errors='coerce')
+        completed = act_end.notna() & (act_end <= self.data_date)
+        if self.engine is not None:
+            starts = self._engine_column('early_start', task_df['task_id']).set_axis(task_df.index)
+        else:
+            starts = pd.to_datetime(task_df['task_id'].map(self.early_start), errors='coerce')
+
+        durations = self.task_durations(task_df)
+        calendar_ids = task_df['clndr_id'].tolist()
+
+        finishes = self.working_day_calculator.calendars.add_working_days(
+            starts.to_numpy(dtype='datetime64[ns]'), durations, calendar_ids)
+        finishes = pd.Series(finishes.astype('datetime64[ns]'), index=task_df.index)
+        return finishes.where(~completed, act_end)
+
     def get_project_duration(self):
         if not self.critical_path:
             return None
@@ -721,7 +884,7 @@ class TotalFloatCPMCalculator:
             print(f"Project Duration: {project_duration.days} days")
 
     def generate_critical_path_report(self):
-        mdFile = MdUtils(file_name='Critical_Path_Report', title='Critical Path Report')
+        mdFile = mdutils.MdUtils(file_name='Critical_Path_Report', title='Critical Path Report')
 
         mdFile.new_header(level=1, title='Project Information')
         project_info = self.xer.project_df.iloc[0]
@@ -792,34 +955,32 @@ class TotalFloatCPMCalculator:
         mdFile.create_md_file()
         self.logger.info("Critical Path Report generated successfully.")
 
+    def _subtask_index(self):
+        """WBS tour index of the graph nodes, built once per graph: the index, the sorted nodes and their entries."""
+        if self.subtask_index is None:
+            wbs_index = WBSIndex(self.xer.projwbs_df)
+            nodes = np.array(self.graph.nodes, dtype=object)
+            order, entries = wbs_index.sort_activities([self.graph.nodes[node].get('wbs_id') for node in nodes])
+            self.subtask_index = (wbs_index, nodes[order], entries)
+        return self.subtask_index
+
     def get_subtasks(self, wbs_node):
         """
         Get the subtasks of a WBS summary task.
 
+        Subtasks are the tasks assigned to the summary's WBS element or to any element below it in
+        the PROJWBS tree, the slice of the WBS tour index that `build_graph` stores on the summary.
+
         Args:
         wbs_node (str): The task_id of the WBS summary task.
 
         Returns:
         list: A list of task_ids that are subtasks of the given WBS summary task.
         """
-        subtasks = []
-
-        # Get the WBS information for the summary task
-        wbs_info = self.xer.projwbs_df[self.xer.projwbs_df['wbs_id'] == self.graph.nodes[wbs_node]['wbs_id']]
-
-        if wbs_info.empty:
-            return subtasks
-
-        wbs_path = wbs_info['wbs_short_name'].iloc[0]
-
-        # Find all tasks that belong to this WBS or its sub-WBS
-        for task_id, task_data in self.graph.nodes(data=True):
-            task_wbs_id = task_data.get('wbs_id')
-            if task_wbs_id:
-                task_wbs_info = self.xer.projwbs_df[self.xer.projwbs_df['wbs_id'] == task_wbs_id]
-                if not task_wbs_info.empty:
-                    task_wbs_path = task_wbs_info['wbs_short_name'].iloc[0]
-                    if task_wbs_path.startswith(wbs_path) and task_id != wbs_node:
-                        subtasks.append(task_id)
-
-        return subtasks
+        wbs_index, nodes, entries = self._subtask_index()
+        data = self.graph.nodes[wbs_node]
+        if 'subtask_slice' in data:
+            first, last = data['subtask_slice']
+        else:
+            (first, last), = wbs_index.subtree_slices(entries, [data.get('wbs_id')])
+        return [node for node in nodes[first:last].tolist() if node != wbs_node]
@@ -0,0 +1,110 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+
+class WBSIndex:
+    """
+    Euler tour of the PROJWBS tree.
+
+    Every WBS element is numbered in depth-first preorder from the
+    `parent_wbs_id` links, so the elements under a WBS element, itself
+    included, are exactly the tour numbers from its entry up to its exit.
+    Sorting activities by the tour entry of their WBS turns "all activities
+    under WBS X" into a slice found with two binary searches.
+
+    Attributes:
+        wbs_ids (np.ndarray): WBS ids in PROJWBS order
+        entry (np.ndarray): preorder number of each WBS element
+        exit (np.ndarray): entry plus the size of its subtree, exclusive
+    """
+
+    def __init__(self, projwbs_df: pd.DataFrame | None):
+        self.logger = logging.getLogger('WBSIndex')
+        if projwbs_df is None or projwbs_df.empty:
+            projwbs_df = pd.DataFrame(columns=['wbs_id', 'parent_wbs_id'])
+        projwbs_df = projwbs_df.drop_duplicates('wbs_id')
+        self.wbs_ids = projwbs_df['wbs_id'].to_numpy(dtype=object)
+        self._rows = {wbs_id: row for row, wbs_id in enumerate(self.wbs_ids)}
+        if 'parent_wbs_id' in projwbs_df.columns:
+            parents = [self._rows.get(parent, -1) for parent in projwbs_df['parent_wbs_id']]
+        else:
+            parents = [-1] * self.wbs_ids.size
+        self.entry, self.exit = self._tour(parents)
+
+    def _tour(self, parents: list[int]) -> tuple[np.ndarray, np.ndarray]:
+        size = len(parents)
+        children = [[] for _ in range(size)]
+        roots = []
+        for row, parent in enumerate(parents):
+            (children[parent] if parent >= 0 and parent != row else roots).append(row)
+
+        entry = np.full(size, -1, dtype=np.int64)
+        exit_ = np.full(size, -1, dtype=np.int64)
+        counter = 0
+        # elements on a parent loop are not under any root; each loop is toured from its first element
+        is_root = set(roots)
+        for root in roots + list(range(size)):
+            if entry[root] >= 0:
+                continue
+            if root not in is_root:
+                self.logger.warning(f"WBS {self.wbs_ids[root]} is on a parent_wbs_id loop")
+            entry[root] = counter
+            counter += 1
+            stack = [(root, iter(children[root]))]
+            while stack:
+                row, pending = stack[-1]
+                for child in pending:
+                    if entry[child] < 0:
+                        entry[child] = counter
+                        counter += 1
+                        stack.append((child, iter(children[child])))
+                        break
+                else:
+                    exit_[row] = counter
+                    stack.pop()
+        return entry, exit_
+
+    def entries(self, wbs_ids) -> np.ndarray:
+        """Tour entry of each WBS id; -1 for ids that are not in PROJWBS."""
+        rows = np.fromiter((self._rows.get(wbs_id, -1) for wbs_id in wbs_ids), dtype=np.int64)
+        # row -1 reads the appended sentinel
+        return np.append(self.entry, -1)[rows]
+
+    def bounds(self, wbs_ids) -> tuple[np.ndarray, np.ndarray]:
+        """Half-open tour range of the subtree of each WBS id; empty for unknown ids."""
+        rows = np.fromiter((self._rows.get(wbs_id, -1) for wbs_id in wbs_ids), dtype=np.int64)
+        return np.append(self.entry, 0)[rows], np.append(self.exit, 0)[rows]
+
+    def sort_activities(self, wbs_ids) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Order activities by the tour entry of their WBS.
+
+        Args:
+            wbs_ids: WBS id of every activity
+
+        Returns:
+            tuple: positions of the activities with a known WBS in tour order,
+                and the tour entry of each of them
+        """
+        entries = self.entries(wbs_ids)
+        order = np.flatnonzero(entries >= 0)
+        order = order[np.argsort(entries[order], kind='stable')]
+        return order, entries[order]
+
+    def subtree_slices(self, sorted_entries: np.ndarray, wbs_ids) -> np.ndarray:
+        """
+        Slices of activities under each WBS id.
+
+        Args:
+            sorted_entries (np.ndarray): tour entries from `sort_activities`
+            wbs_ids: WBS ids to look up
+
+        Returns:
+            np.ndarray: (first, last) into the order from `sort_activities` for
+                every WBS id
+        """
+        first, last = self.bounds(wbs_ids)
+        return np.column_stack((np.searchsorted(sorted_entries, first, side='left'),
+                                np.searchsorted(sorted_entries, last, side='left')))
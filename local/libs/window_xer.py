@@ -1,21 +1,29 @@
+from __future__ import annotations
+
 import logging
 import os
 import datetime
 
-from typing import Tuple, NamedTuple, Union, Optional, List, Dict, Set
+from typing import TYPE_CHECKING, Tuple, NamedTuple, Union, Optional, List, Dict, Set
 
 import pandas as pd
-from mdutils import MdUtils
 
 from local.libs.total_float_method import TotalFloatCPMCalculator
 from local.libs.xer_file_creation import XerFileGenerator
 from xerparser import Xer
+from xerparser.src._lazy import lazy_import
+
+if TYPE_CHECKING:
+    from mdutils import MdUtils
+
+mdutils = lazy_import("mdutils")
 
 
 class WindowXER(NamedTuple):
     xer: Xer
     critical_path: list
     file_path: str
+    driving_path: list
 
 
 class WindowAnalyzer:
@@ -138,7 +146,8 @@ class WindowAnalyzer:
             is_end_window (bool): A boolean indicating whether it's an end window or not.
 
         Returns:
-            WindowXER: A named tuple containing the processed window XER, critical path information, and file path.
+            WindowXER: A named tuple containing the processed window XER, critical path information, file path
+                and the driving path to the project finish.
         """
         window_xer = self.xer_generator.create_modified_copy(date)
 
@@ -153,7 +162,7 @@ class WindowAnalyzer:
         file_name = os.path.join(folder_path, f"{date.strftime('%Y-%m-%d')}_{window_type}_window.xer")
         self.xer_generator.build_xer_file(window_xer, file_name)
 
-        return WindowXER(window_xer, critical_path, file_name)
+        return WindowXER(window_xer, critical_path, file_name, calculator.driving_path)
 
     def filter_tasks(self, tasks_df: pd.DataFrame, start_date: pd.Timestamp, end_date: pd.Timestamp) -> pd.DataFrame:
         """
@@ -207,7 +216,7 @@ class WindowAnalyzer:
         file_name = os.path.join(self.report_xer_folder_path,
                                  f"window_analysis_report_{start_date.strftime('%Y-%m-%d')}_{end_date.strftime('%Y-%m-%d')}")
 
-        mdFile = MdUtils(
+        mdFile = mdutils.MdUtils(
             file_name=file_name,
             title="Window Analysis Report")
 
@@ -353,9 +362,12 @@ class WindowAnalyzer:
         num_rows = len(summary_data) // 3  # 3 is the number of columns
         md_file_utils.new_table(columns=3, rows=num_rows, text=summary_data, text_align='left')
 
-        # New critical path
+        # New critical path, as the chain of driving relationships to the project finish
         md_file_utils.new_header(level=2, title="New Critical Path")
-        new_critical_path = [task for task in end_critical_path[divergence_index:]
+        start_driving_path, end_driving_path = start_window.driving_path, end_window.driving_path
+        driving_divergence = next((i for i, (start_task, end_task) in enumerate(zip(start_driving_path, end_driving_path))
+                                   if start_task != end_task), min(len(start_driving_path), len(end_driving_path)))
+        new_critical_path = [task for task in end_driving_path[driving_divergence:]
                              if pd.to_datetime(
                 end_window.xer.task_df[end_window.xer.task_df['task_id'] == task].iloc[0]['act_start_date'] or
                 end_window.xer.task_df[end_window.xer.task_df['task_id'] == task].iloc[0]['target_start_date'])
@@ -460,18 +472,27 @@ class WindowAnalyzer:
         start_task = start_window.xer.task_df[start_window.xer.task_df['task_code'] == monitored_task_code].iloc[0]
         end_task = end_window.xer.task_df[end_window.xer.task_df['task_code'] == monitored_task_code].iloc[0]
 
-        start_predecessors = set(
-            start_window.xer.taskpred_df[start_window.xer.taskpred_df['task_id'] == start_task['task_id']][
-                'pred_task_id'])
-        end_predecessors = set(
-            end_window.xer.taskpred_df[end_window.xer.taskpred_df['task_id'] == end_task['task_id']]['pred_task_id'])
+        start_network = start_window.xer.network
+        end_network = end_window.xer.network
+        start_node = start_network.index_of(start_task['task_id'])[0]
+        end_node = end_network.index_of(end_task['task_id'])[0]
+
+        start_predecessors = set(start_network.task_ids[start_network.predecessors(start_node)])
+        end_predecessors = set(end_network.task_ids[end_network.predecessors(end_node)])
 
         all_predecessors = start_predecessors.union(end_predecessors)
 
         impacting_tasks = []
         for pred in all_predecessors:
-            start_pred = start_window.xer.task_df[start_window.xer.task_df['task_id'] == pred].iloc[0]
-            end_pred = end_window.xer.task_df[end_window.xer.task_df['task_id'] == pred].iloc[0]
+            # network nodes are numbered by row position in task_df
+            start_row = start_network.index_of(pred)[0]
+            end_row = end_network.index_of(pred)[0]
+            if start_row < 0 or end_row < 0:
+                logging.warning(f"Predecessor {pred} of {monitored_task_code} is missing from the "
+                            f"{'start' if start_row < 0 else 'end'} window and is skipped")
+                continue
+            start_pred = start_window.xer.task_df.iloc[start_row]
+            end_pred = end_window.xer.task_df.iloc[end_row]
 
             start_duration = self.calculate_duration(start_pred['target_start_date'], start_pred['target_end_date'])
             end_duration = self.calculate_duration(
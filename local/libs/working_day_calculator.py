@@ -1,104 +1,95 @@
 import pandas as pd
-import numpy as np
-from datetime import datetime, date, time, timedelta
+from datetime import datetime, date
 import logging
 
+from local.libs.compiled_calendar import (
+    MINUTES_PER_DAY,
+    CalendarSet,
+    CompiledCalendar,
+    compile_calendar_df,
+    compile_calendars,
+    to_ordinal,
+)
+
 
 class WorkingDayCalculator:
-    def __init__(self, workdays_df, exceptions_df):
+    def __init__(self, workdays_df, exceptions_df, calendar_df=None, busday=True, horizon=None):
         self.workdays_df = workdays_df.copy() if not workdays_df.empty else pd.DataFrame()
         self.exceptions_df = exceptions_df.copy() if not exceptions_df.empty else pd.DataFrame()
-        self.exceptions_dict = self._create_exception_dict(exceptions_df)
-        self.workdays_dict = self._create_workdays_dict(workdays_df)
-
-    def _create_exception_dict(self, exceptions_df):
-        # Create a dictionary for exception dates
-        exceptions_dict = {}
-        for _, row in exceptions_df.iterrows():
-            key = (str(row['clndr_id']), row['exception_date'])
-            exceptions_dict[key] = (row['start_time'], row['end_time']) if pd.notna(row['start_time']) and pd.notna(
-                row['end_time']) else None
-        return exceptions_dict
-
-    def _create_workdays_dict(self, workdays_df):
-        # Create a dictionary for regular workdays
-        workdays_dict = {}
-        for _, row in workdays_df.iterrows():
-            key = (str(row['clndr_id']), int(row['day']))
-            if key not in workdays_dict:
-                workdays_dict[key] = []
-            if pd.notna(row['start_time']) and pd.notna(row['end_time']):
-                workdays_dict[key].append((row['start_time'], row['end_time']))
-        return workdays_dict
+        # horizon: (first, last) dates to compile every calendar over up front, see schedule_horizon
+        if calendar_df is not None and 'clndr_data' in calendar_df.columns:
+            # Calendars are compiled from clndr_data through the process-wide calendar cache
+            calendars = compile_calendar_df(calendar_df, horizon)
+        else:
+            calendars = compile_calendars(workdays_df, exceptions_df)
+            if horizon is not None:
+                for calendar in calendars.values():
+                    calendar.ensure(to_ordinal(horizon[0]), to_ordinal(horizon[1]))
+        # busday: answer the vectorized day arithmetic with numpy busdaycalendars where possible
+        self.calendars = CalendarSet(calendars, busday=busday)
+
+    def get_calendar(self, calendar_id) -> CompiledCalendar:
+        """Compiled calendar of a calendar id; unknown calendars work every day."""
+        return self.calendars.get(calendar_id)
 
     def is_working_day(self, date_to_check, calendar_id):
-        calendar_id = str(calendar_id)
-
         date_to_check = self._ensure_date(date_to_check)
         if date_to_check is None:
             return False
-
-        # Check exceptions first
-        exception = self.exceptions_dict.get((calendar_id, date_to_check), None)
-        if exception is not None:
-            return exception is not None
-
-        if len(self.workdays_dict) == 0:
-            return True
-
-        # If not an exception, check regular workdays
-        weekday = date_to_check.isoweekday()  # Get weekday as 1-7
-        workday = self.workdays_dict.get((calendar_id, weekday), [])
-        return len(workday) > 0
+        return bool(self.get_calendar(calendar_id).is_working_day(date_to_check.toordinal()))
 
     def add_working_days(self, start_date, days, calendar_id):
-        calendar_id = str(calendar_id)
         start_date = self._ensure_date(start_date)
         if start_date is None:
             return None
 
-        # Check if start_date is within valid range
-        if start_date.year < 1 or start_date.year > 9999:
-            raise ValueError("Start date is out of valid range")
-
         try:
             days = int(days)
         except ValueError:
             logging.warning(f"Invalid days value: {days}")
             return None
 
-        # Limit the number of days to a reasonable value
-        if abs(days) > 365 * 3:  # Limit to 100 years
-            raise ValueError("Number of days is too large")
-
-        current_date = start_date
-        remaining_days = abs(days)
-        day_increment = 1 if days >= 0 else -1
+        result = self.get_calendar(calendar_id).add_working_days(start_date.toordinal(), days)
+        return date.fromordinal(int(result))
 
-        count = 0
-        while remaining_days > 0:
-            current_date += timedelta(days=day_increment)
-            if self.is_working_day(current_date, calendar_id):
-                remaining_days -= 1
-            if count > 365:
-                continue
-            count = count + 1
-
-        return current_date
     def get_working_days_between(self, start_date, end_date, calendar_id):
-        calendar_id = str(calendar_id)
         start_date = self._ensure_date(start_date)
         end_date = self._ensure_date(end_date)
         if start_date is None or end_date is None:
             return None
 
-        if start_date > end_date:
-            start_date, end_date = end_date, start_date
+        calendar = self.get_calendar(calendar_id)
+        return int(calendar.working_days_between(start_date.toordinal(), end_date.toordinal()))
 
-        date_range = pd.date_range(start=start_date, end=end_date)
-        working_days = sum(self.is_working_day(date, calendar_id) for date in date_range)
+    def add_working_hours(self, start, hours, calendar_id):
+        start = self._ensure_timestamp(start)
+        if start is None:
+            return None
+        try:
+            minutes = round(float(hours) * 60)
+        except (TypeError, ValueError):
+            logging.warning(f"Invalid hours value: {hours}")
+            return None
 
-        return working_days
+        absolute = start.toordinal() * MINUTES_PER_DAY + start.hour * 60 + start.minute
+        result = int(self.get_calendar(calendar_id).add_working_minutes(absolute, minutes))
+        days, minute = divmod(result, MINUTES_PER_DAY)
+        return pd.Timestamp(date.fromordinal(days)) + pd.Timedelta(minutes=minute)
+
+    def get_working_hours_between(self, start, end, calendar_id):
+        start = self._ensure_timestamp(start)
+        end = self._ensure_timestamp(end)
+        if start is None or end is None:
+            return None
+        first, last = (t.toordinal() * MINUTES_PER_DAY + t.hour * 60 + t.minute for t in (start, end))
+        return int(self.get_calendar(calendar_id).working_minutes_between(first, last)) / 60
+
+    def _ensure_timestamp(self, value):
+        timestamp = pd.to_datetime(value, errors='coerce')
+        if pd.isnull(timestamp):
+            logging.warning(f"Failed to convert to a valid timestamp: {value}")
+            return None
+        return timestamp
 
     def _ensure_date(self, date_obj):
         if isinstance(date_obj, (datetime, date)):
@@ -112,4 +103,4 @@ class WorkingDayCalculator:
                 return None
         except ValueError:
             logging.warning(f"Failed to convert to date: {date_obj}")
-            return None
\ No newline at end of file
+            return None
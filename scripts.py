@@ -28,5 +28,5 @@ def test_task_rsrc_compare():
 
 def rem_hours_per_day_test():
     subprocess.run(
-        ["python", "-m", "unittest", "tests.test_parser.TestParser.test_rem_hour_calc"]
+        ["python", "-m", "unittest", "tests.test_remaining_hours"]
     )
@@ -0,0 +1,112 @@
+"""
+Synthetic .xer exports for the scheduling tests.
+
+`generated_xer` writes a random but reproducible project: three calendars (one
+derived from another), a small WBS tree, tasks, milestones, LOE and WBS
+summary activities, actual dates before the data date, constraints and a mix
+of relationship types and lags.
+"""
+
+import random
+
+WEEK = (
+    "(0||CalendarData()(  (0||DaysOfWeek()(    (0||1()())"
+    + "".join(f"    (0||{day}()(      (0||0(s|08:00|f|12:00)())      (0||1(s|13:00|f|17:00)())))" for day in range(2, 7))
+    + "    (0||7()())))  (0||VIEW(ShowTotal|Y)())  (0||Exceptions()(    (0||0(d|45292)())    (0||1(d|45406)())"
+    "    (0||2(d|45411)(      (0||0(s|08:00|f|12:00)())))))"
+)
+SHIFT = (
+    "(0||CalendarData()(  (0||DaysOfWeek()(    (0||1()())"
+    + "".join(f"    (0||{day}()(      (0||0(s|07:00|f|15:00)())))" for day in range(2, 7))
+    + "    (0||7()())))  (0||VIEW(ShowTotal|Y)())  (0||Exceptions()(    (0||0(d|45285)())    (0||1(d|45286)())))"
+)
+DERIVED = "(0||CalendarData()(  (0||VIEW(ShowTotal|Y)())  (0||Exceptions()(    (0||0(d|45300)())))"
+
+TASK_FIELDS = (
+    "task_id", "proj_id", "wbs_id", "clndr_id", "task_code", "task_name", "task_type", "status_code",
+    "target_drtn_hr_cnt", "remain_drtn_hr_cnt", "act_start_date", "act_end_date", "early_start_date",
+    "early_end_date", "late_start_date", "late_end_date", "target_start_date", "target_end_date",
+    "cstr_type", "cstr_date", "cstr_type2", "cstr_date2", "float_path", "float_path_order",
+)
+
+
+def _table(name: str, fields, rows) -> list[str]:
+    return [f"%T\t{name}", "%F\t" + "\t".join(fields), *("%R\t" + "\t".join(map(str, row)) for row in rows)]
+
+
+def generated_xer(n_tasks: int = 300, seed: int = 0, loops: int = 0) -> str:
+    """
+    Text of a synthetic .xer export.
+
+    Args:
+        n_tasks (int, optional): number of activities. Defaults to 300.
+        seed (int, optional): seed of the generator. Defaults to 0.
+        loops (int, optional): number of relationships that lead back to an
+            earlier activity and close a logic loop with it. Defaults to 0.
+
+    Returns:
+        str: contents of the export
+    """
+    rnd = random.Random(seed)
+    lines = ["ERMHDR\t19.12\t2024-03-01\tProject\tadmin\tAdmin User\tdbxDatabaseNoName\tProject Management\tUSD"]
+    lines += _table(
+        "CALENDAR",
+        ("clndr_id", "default_flag", "clndr_name", "proj_id", "base_clndr_id", "last_chng_date", "clndr_type",
+         "day_hr_cnt", "week_hr_cnt", "month_hr_cnt", "year_hr_cnt", "rsrc_private", "clndr_data"),
+        [(1, "Y", "Standard", "", "", "2024-01-01 00:00", "CA_Base", 8, 40, 172, 2000, "N", WEEK),
+         (2, "N", "Shift", "", "", "2024-01-01 00:00", "CA_Base", 8, 40, 172, 2000, "N", SHIFT),
+         (3, "N", "Derived", 100, 2, "2024-01-01 00:00", "CA_Project", 8, 40, 172, 2000, "N", DERIVED)],
+    )
+    lines += _table(
+        "PROJECT",
+        ("proj_id", "proj_short_name", "last_recalc_date", "plan_start_date", "plan_end_date", "export_flag"),
+        [(100, "DEMO", "2024-03-01 08:00", "2024-01-02 08:00", "", "Y")],
+    )
+
+    wbs_rows = [(1000, 100, "DEMO", "Demo", "", "Y")]
+    for i in range(1, 8):
+        parent = rnd.choice(wbs_rows)[0]
+        wbs_rows.append((1000 + i, 100, f"W{i}", f"WBS {i}", parent, "N"))
+    lines += _table("PROJWBS", ("wbs_id", "proj_id", "wbs_short_name", "wbs_name", "parent_wbs_id",
+                                "proj_node_flag"), wbs_rows)
+
+    task_rows = []
+    for i in range(n_tasks):
+        draw = rnd.random()
+        task_type = ("TT_Task" if draw < .8 else "TT_Mile" if draw < .88 else "TT_FinMile" if draw < .93
+                     else "TT_LOE" if draw < .97 else "TT_WBS")
+        if i == 0:
+            task_type = "TT_Mile"
+        hours = 0 if "Mile" in task_type else rnd.choice([8, 16, 40, 80, 120, 12, 4])
+        clndr_id = rnd.choice([1, 1, 2, 3])
+        act_start = act_end = ""
+        if i < n_tasks * 0.1:
+            act_start = "2024-01-%02d 08:00" % rnd.randint(2, 20)
+            if rnd.random() < .6:
+                act_end = "2024-02-%02d 17:00" % rnd.randint(1, 25)
+        cstr_type = cstr_date = ""
+        if rnd.random() < .05:
+            cstr_type = rnd.choice(["CS_MSO", "CS_MSOA", "CS_MEO", "CS_MEOB", "CS_ALAP"])
+            cstr_date = "2024-05-%02d 08:00" % rnd.randint(1, 28)
+        task_id = 5000 + i
+        task_rows.append((task_id, 100, rnd.choice(wbs_rows)[0], clndr_id, f"A{task_id}", f"Task {task_id}",
+                          task_type, "TK_NotStart", hours, hours, act_start, act_end, "", "", "", "",
+                          "2024-01-02 08:00", "2024-01-05 17:00", cstr_type, cstr_date, "", "", "", ""))
+    lines += _table("TASK", TASK_FIELDS, task_rows)
+
+    pairs = []
+    for succ in range(1, n_tasks):
+        for _ in range(rnd.choice([1, 1, 2])):
+            pairs.append((rnd.randint(max(0, succ - 15), succ - 1), succ))
+    for _ in range(loops):
+        # reversing a relationship closes a loop with it
+        pred, succ = rnd.choice(pairs[len(pairs) // 2:])
+        pairs.append((succ, pred))
+    lines += _table(
+        "TASKPRED",
+        ("task_pred_id", "task_id", "pred_task_id", "proj_id", "pred_proj_id", "pred_type", "lag_hr_cnt", "comments"),
+        [(9001 + k, 5000 + succ, 5000 + pred, 100, 100, rnd.choice(["PR_FS", "PR_FS", "PR_FS", "PR_SS", "PR_FF", "PR_SF"]),
+          rnd.choice([0, 0, 0, 8, 16, -8]), "") for k, (pred, succ) in enumerate(pairs)],
+    )
+    lines.append("%E")
+    return "\n".join(lines) + "\n"
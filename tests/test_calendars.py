@@ -0,0 +1,481 @@
+"""
+Unittests for the calendar frames, compiled calendars and calendar cache.
+"""
+
+import os
+import pickle
+import random
+import sys
+import threading
+import unittest
+from datetime import date, datetime, time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from local.libs.calendar_parser import EXCEPTION_COLUMNS, WORKDAY_COLUMNS, CalendarParser
+from local.libs.compiled_calendar import (
+    MINUTES_PER_DAY, CalendarCache, CalendarSet, CompiledCalendar, compile_calendar_df, compile_calendars,
+)
+from local.libs.working_day_calculator import WorkingDayCalculator
+from tests.generated_xer import DERIVED, SHIFT, WEEK, generated_xer
+from xerparser import Xer
+from xerparser.schemas.calendars import _process_calendar_data, base_chains, parse_clndr_data, resolve_clndr_data
+
+# Monday 08:00-12:00 and 11:00-14:00 (overlapping), Tuesday 09:00-17:00;
+# 2024-01-01 (45292) is a holiday and 2024-01-06 (45297), a Saturday, is worked 10:00-12:00
+OVERLAPPING = (
+    "(0||CalendarData()(  (0||DaysOfWeek()(    (0||1()())"
+    "    (0||2()(      (0||0(s|08:00|f|12:00)())      (0||1(s|11:00|f|14:00)())))"
+    "    (0||3()(      (0||0(s|09:00|f|17:00)())))"
+    "    (0||4()())    (0||5()())    (0||6()())    (0||7()())))"
+    "  (0||Exceptions()(    (0||0(d|45292)())    (0||1(d|45297)(      (0||0(s|10:00|f|12:00)())))))"
+)
+
+
+START = date(2024, 1, 1).toordinal()
+
+
+def five_day_week(clndr_id: str = "1") -> CompiledCalendar:
+    """Monday to Friday with two holidays and one worked Saturday."""
+    holidays = [date(2024, 1, 1).toordinal(), date(2024, 12, 25).toordinal()]
+    return CompiledCalendar(clndr_id, [True] * 5 + [False] * 2, holidays, [date(2024, 3, 2).toordinal()])
+
+
+def is_working(calendar: CompiledCalendar, ordinal: int) -> bool:
+    """Brute force working day test from the calendar definition."""
+    if ordinal in calendar.working_exceptions:
+        return True
+    if ordinal in calendar.holidays:
+        return False
+    return bool(calendar.week_mask[date.fromordinal(ordinal).weekday()])
+
+
+def walk(calendar: CompiledCalendar, ordinal: int, days: int) -> int:
+    """Brute force add_working_days: step a day at a time."""
+    step = 1 if days > 0 else -1
+    while days:
+        ordinal += step
+        days -= step * is_working(calendar, ordinal)
+    return ordinal
+
+
+def calendar_frame(*rows) -> pd.DataFrame:
+    """CALENDAR table of (clndr_id, base_clndr_id, clndr_data) rows."""
+    return pd.DataFrame(rows, columns=["clndr_id", "base_clndr_id", "clndr_data"])
+
+
+class TestCalendarParser(unittest.TestCase):
+    def test_frames(self):
+        parser = CalendarParser(calendar_frame(("7", "", OVERLAPPING)))
+        parser.parse_calendars()
+        self.assertEqual(list(parser.workdays_df.columns), WORKDAY_COLUMNS)
+        self.assertEqual(list(parser.exceptions_df.columns), EXCEPTION_COLUMNS)
+        self.assertEqual(parser.workdays_df.values.tolist(), [
+            ["7", 2, time(8), time(14)],
+            ["7", 3, time(9), time(17)],
+        ])
+        self.assertEqual(parser.exceptions_df.values.tolist(), [
+            ["7", date(2024, 1, 1), None, None],
+            ["7", date(2024, 1, 6), time(10), time(12)],
+        ])
+
+    def test_one_pass_matches_calendar_by_calendar(self):
+        calendars = calendar_frame(("1", "", WEEK), ("2", "", SHIFT), ("3", "2", DERIVED), ("7", "", OVERLAPPING))
+        whole = CalendarParser(calendars)
+        whole.parse_calendars()
+        single = CalendarParser(calendars)
+        for clndr_id, clndr_data, bases in (("1", WEEK, ()), ("2", SHIFT, ()), ("3", DERIVED, (SHIFT,)),
+                                            ("7", OVERLAPPING, ())):
+            single.parse_calendar_data(clndr_id, clndr_data, bases)
+        pd.testing.assert_frame_equal(whole.workdays_df, single.workdays_df)
+        pd.testing.assert_frame_equal(whole.exceptions_df, single.exceptions_df)
+        # the derived calendar has the week of its base
+        workdays = whole.workdays_df
+        self.assertEqual(workdays.loc[workdays["clndr_id"] == "3"].values[:, 1:].tolist(),
+                         workdays.loc[workdays["clndr_id"] == "2"].values[:, 1:].tolist())
+
+    def test_bad_calendars_are_skipped(self):
+        parser = CalendarParser(calendar_frame(("1", "", WEEK), ("2", "", ""), ("", "", SHIFT)))
+        with self.assertLogs(level="WARNING"):
+            parser.parse_calendars()
+        self.assertEqual(set(parser.workdays_df["clndr_id"]), {"1"})
+        with self.assertRaises(ValueError):
+            CalendarParser(pd.DataFrame({"clndr_id": ["1"]}))
+
+
+
+class TestCompiledCalendar(unittest.TestCase):
+    def test_bitmap_and_counts(self):
+        calendar = five_day_week()
+        ordinals = np.arange(START - 30, START + 400)
+        expected = [is_working(calendar, ordinal) for ordinal in ordinals]
+        np.testing.assert_array_equal(calendar.is_working_day(ordinals), expected)
+        self.assertFalse(calendar.is_working_day([date(2024, 1, 1).toordinal()])[0])
+        self.assertTrue(calendar.is_working_day([date(2024, 3, 2).toordinal()])[0])
+        rnd = random.Random(0)
+        pairs = [(rnd.randrange(START - 30, START + 400), rnd.randrange(START - 30, START + 400)) for _ in range(300)]
+        first, last = np.array(pairs).T
+        counts = calendar.working_days_between(first, last)
+        for (a, b), count in zip(pairs, counts):
+            self.assertEqual(count, sum(is_working(calendar, o) for o in range(min(a, b), max(a, b) + 1)))
+
+    def test_add_working_days(self):
+        calendar = five_day_week()
+        rnd = random.Random(1)
+        starts = np.array([rnd.randrange(START - 30, START + 400) for _ in range(300)])
+        days = np.array([rnd.randint(-40, 40) for _ in range(300)])
+        found = calendar.add_working_days(starts, days)
+        for start, step, result in zip(starts.tolist(), days.tolist(), found.tolist()):
+            self.assertEqual(result, walk(calendar, start, step), (date.fromordinal(start), step))
+
+    def test_range_grows_on_demand(self):
+        calendar = five_day_week()
+        calendar.ensure(START, START + 10)
+        compiled = calendar.compiled
+        # twenty years on, far outside the compiled range
+        later = calendar.add_working_days([START], [5200])[0]
+        self.assertEqual(later, walk(calendar, START, 5200))
+        self.assertIsNot(calendar.compiled, compiled)
+        self.assertLessEqual(calendar.first_ordinal, START)
+        self.assertGreaterEqual(calendar.last_ordinal, later)
+        # published ranges are read-only snapshots
+        self.assertFalse(calendar.working.flags.writeable)
+        np.testing.assert_array_equal(np.cumsum(calendar.working), calendar.cumulative)
+
+    def test_no_working_days(self):
+        calendar = CompiledCalendar("0", [False] * 7)
+        with self.assertRaises(ValueError):
+            calendar.add_working_days([START], [1])
+
+
+
+class TestCalendarSet(unittest.TestCase):
+    def setUp(self):
+        self.calendars = CalendarSet({
+            "1": five_day_week("1"),
+            "2": CompiledCalendar("2", [True] * 6 + [False], [date(2024, 2, 5).toordinal()]),
+        })
+        rnd = random.Random(2)
+        self.clndr_ids = [rnd.choice(["1", "2", "9"]) for _ in range(200)]
+        self.starts = np.array([np.datetime64("2024-01-01") + rnd.randrange(-30, 400) for _ in range(200)])
+        self.days = np.array([float(rnd.randint(-30, 30)) for _ in range(200)])
+
+    def test_rows_match_their_calendar(self):
+        found = self.calendars.add_working_days(self.starts, self.days, self.clndr_ids)
+        counts = self.calendars.working_days_between(self.starts, found, self.clndr_ids)
+        working = self.calendars.is_working_day(self.starts, self.clndr_ids)
+        for row, clndr_id in enumerate(self.clndr_ids):
+            calendar = self.calendars.get(clndr_id)
+            ordinal = self.starts[row].astype(object).toordinal()
+            expected = walk(calendar, ordinal, int(self.days[row]))
+            self.assertEqual(found[row].astype(object).toordinal(), expected)
+            self.assertEqual(working[row], is_working(calendar, ordinal))
+            self.assertEqual(counts[row], calendar.working_days_between([ordinal], [expected])[0])
+
+    def test_unknown_calendars_work_every_day(self):
+        found = self.calendars.add_working_days(["2024-01-05"], [3], ["unknown"])
+        np.testing.assert_array_equal(found, np.array(["2024-01-08"], dtype="datetime64[D]"))
+        self.assertEqual(self.calendars.working_days_between(["2024-01-06"], ["2024-01-07"], "unknown")[0], 2)
+
+    def test_missing_values(self):
+        found = self.calendars.add_working_days(["2024-01-05", "NaT", "2024-01-05"], [1, 1, np.nan], "1")
+        self.assertEqual(found[0], np.datetime64("2024-01-08"))
+        self.assertTrue(np.isnat(found[1:]).all())
+        counts = self.calendars.working_days_between(["2024-01-05", "NaT"], ["2024-01-08", "2024-01-08"], "1")
+        np.testing.assert_array_equal(counts, [2, -1])
+
+    def test_fractional_days_are_truncated(self):
+        whole = self.calendars.add_working_days(self.starts, np.trunc(self.days), self.clndr_ids)
+        fractional = self.calendars.add_working_days(self.starts, self.days + np.sign(self.days) * .7, self.clndr_ids)
+        np.testing.assert_array_equal(whole, fractional)
+
+
+
+class TestBusdayBackend(unittest.TestCase):
+    """np.busday_offset / np.busday_count against the compiled bitmaps."""
+
+    @staticmethod
+    def random_calendar(clndr_id: str, rnd: random.Random) -> CompiledCalendar:
+        week = [rnd.random() < .6 for _ in range(7)]
+        week[rnd.randrange(7)] = True
+        days = [START + rnd.randrange(-400, 800) for _ in range(40)]
+        holidays = days[:30]
+        # worked exceptions on worked weekdays, some also listed as holidays, some with short shifts
+        worked = [day for day in days[20:] if week[(day - 1) % 7]]
+        shifts = {day: [(600, 720)] for day in worked[::2]}
+        return CompiledCalendar(clndr_id, week, holidays, worked, exception_shifts=shifts)
+
+    def test_matches_the_compiled_calendars(self):
+        rnd = random.Random(38)
+        calendars = {str(k): self.random_calendar(str(k), rnd) for k in range(12)}
+        # Sunday to Thursday, and a week with a worked Saturday, which has no busdaycalendar
+        calendars["sun"] = CompiledCalendar("sun", [True] * 4 + [False, False, True], [START + 6, START + 13])
+        calendars["sat"] = five_day_week("sat")
+        self.assertIsNone(calendars["sat"].busdaycalendar)
+        for clndr_id, calendar in calendars.items():
+            if clndr_id != "sat":
+                self.assertIsNotNone(calendar.busdaycalendar, clndr_id)
+        clndr_ids = [rnd.choice(list(calendars)) for _ in range(3000)]
+        starts = np.array([np.datetime64("2024-01-01") + rnd.randrange(-500, 900) for _ in clndr_ids])
+        days = np.array([rnd.choice([0, rnd.randint(-60, 60), rnd.randint(-400, 400)]) for _ in clndr_ids])
+        busday, compiled = CalendarSet(calendars), CalendarSet(calendars, busday=False)
+        self.assertTrue(busday.busday)
+        found = busday.add_working_days(starts, days, clndr_ids)
+        np.testing.assert_array_equal(found, compiled.add_working_days(starts, days, clndr_ids))
+        ends = starts + days
+        np.testing.assert_array_equal(busday.working_days_between(starts, ends, clndr_ids),
+                                      compiled.working_days_between(starts, ends, clndr_ids))
+        for row in range(0, len(clndr_ids), 10):
+            calendar = calendars[clndr_ids[row]]
+            ordinal = starts[row].astype(object).toordinal()
+            with self.subTest(row=row, clndr_id=clndr_ids[row]):
+                self.assertEqual(found[row].astype(object).toordinal(), walk(calendar, ordinal, int(days[row])))
+
+
+class TestWorkingMinutes(unittest.TestCase):
+    """Working-minute arithmetic against a minute by minute walk over the shifts of every day."""
+
+    FIRST, LAST = START - 60, START + 180
+
+    @classmethod
+    def setUpClass(cls):
+        frame = calendar_frame(("1", "", WEEK), ("2", "", SHIFT), ("3", "", OVERLAPPING))
+        cls.calendars = compile_calendar_df(frame)
+        cls.calculator = WorkingDayCalculator(pd.DataFrame(), pd.DataFrame(), frame)
+        cls.worked = {clndr_id: cls.minute_mask(calendar) for clndr_id, calendar in cls.calendars.items()}
+
+    @classmethod
+    def minute_mask(cls, calendar: CompiledCalendar) -> np.ndarray:
+        """Whether each minute from FIRST to LAST is worked."""
+        mask = np.zeros((cls.LAST - cls.FIRST + 1) * MINUTES_PER_DAY, dtype=bool)
+        for ordinal in range(cls.FIRST, cls.LAST + 1):
+            if not is_working(calendar, ordinal):
+                continue
+            weekday = date.fromordinal(ordinal).weekday()
+            for start, end in calendar.exception_shifts.get(ordinal, calendar.week_shifts[weekday]):
+                offset = (ordinal - cls.FIRST) * MINUTES_PER_DAY
+                mask[offset + start:offset + end] = True
+        return mask
+
+    def minute(self, absolute: int) -> int:
+        return absolute - self.FIRST * MINUTES_PER_DAY
+
+    def walk_minutes(self, clndr_id: str, start: int, amount: int) -> int:
+        """Step a minute at a time; forwards ends after the last worked minute, backwards on its start."""
+        worked, position = self.worked[clndr_id], self.minute(start)
+        while amount > 0:
+            amount -= worked[position]
+            position += 1
+        while amount < 0:
+            position -= 1
+            amount += worked[position]
+        return position + self.FIRST * MINUTES_PER_DAY
+
+    def starts(self, rnd: random.Random, count: int) -> list[int]:
+        """Random minutes on shift boundaries, inside shifts and on non-working days."""
+        first = (START + 7) * MINUTES_PER_DAY
+        picks = []
+        for _ in range(count):
+            day = first + rnd.randrange(100) * MINUTES_PER_DAY
+            picks.append(day + rnd.choice([0, 420, 480, 600, 660, 720, 780, 900, 1020, rnd.randrange(MINUTES_PER_DAY)]))
+        # the holidays and the worked exceptions of the calendars
+        picks += [START * MINUTES_PER_DAY + 600, (START + 5) * MINUTES_PER_DAY + 540, (START + 5) * MINUTES_PER_DAY + 720]
+        return picks
+
+    def test_add_working_minutes(self):
+        rnd = random.Random(34)
+        for clndr_id, calendar in self.calendars.items():
+            starts = self.starts(rnd, 150)
+            amounts = [rnd.choice([0, 1, 59, 60, 120, 240, 480, 2400, -1, -60, -240, -480, -2400]) for _ in starts]
+            found = calendar.add_working_minutes(starts, amounts)
+            for start, amount, result in zip(starts, amounts, found.tolist()):
+                with self.subTest(clndr_id=clndr_id, start=start, amount=amount):
+                    self.assertEqual(result, self.walk_minutes(clndr_id, start, amount))
+
+    def test_working_minutes_between(self):
+        rnd = random.Random(35)
+        for clndr_id, calendar in self.calendars.items():
+            firsts = self.starts(rnd, 150)
+            lasts = [first + rnd.choice([-1, 1, 1]) * rnd.randrange(14 * MINUTES_PER_DAY) for first in firsts]
+            counts = calendar.working_minutes_between(firsts, lasts)
+            cumulative = np.r_[0, np.cumsum(self.worked[clndr_id])]
+            for first, last, count in zip(firsts, lasts, counts.tolist()):
+                lo, hi = sorted((self.minute(first), self.minute(last)))
+                with self.subTest(clndr_id=clndr_id, first=first, last=last):
+                    self.assertEqual(count, cumulative[hi] - cumulative[lo])
+
+    def test_working_hours_across_shifts_and_exceptions(self):
+        calculator = self.calculator
+        # WEEK: 08:00-12:00 and 13:00-17:00 on weekdays; 2024-01-01 and 2024-04-24 off, 2024-04-29 only 08:00-12:00
+        self.assertEqual(calculator.add_working_hours("2024-01-02 11:00", 2, "1"), pd.Timestamp("2024-01-02 14:00"))
+        self.assertEqual(calculator.add_working_hours("2024-01-02 12:00", 4, "1"), pd.Timestamp("2024-01-02 17:00"))
+        self.assertEqual(calculator.add_working_hours("2024-01-02 13:00", -1, "1"), pd.Timestamp("2024-01-02 11:00"))
+        self.assertEqual(calculator.add_working_hours("2023-12-29 16:00", 2, "1"), pd.Timestamp("2024-01-02 09:00"))
+        self.assertEqual(calculator.add_working_hours("2024-04-23 16:00", 2, "1"), pd.Timestamp("2024-04-25 09:00"))
+        self.assertEqual(calculator.add_working_hours("2024-04-26 16:00", 5, "1"), pd.Timestamp("2024-04-29 12:00"))
+        self.assertEqual(calculator.add_working_hours("2024-04-30 08:00", -5, "1"), pd.Timestamp("2024-04-26 16:00"))
+        self.assertEqual(calculator.get_working_hours_between("2024-04-26 08:00", "2024-04-29 17:00", "1"), 12)
+        # SHIFT: 07:00-15:00 on weekdays; 2023-12-25 and 2023-12-26 off
+        self.assertEqual(calculator.add_working_hours("2023-12-22 14:00", 3, "2"), pd.Timestamp("2023-12-27 09:00"))
+        self.assertEqual(calculator.get_working_hours_between("2023-12-22 14:00", "2023-12-27 09:00", "2"), 3)
+        # OVERLAPPING: Monday 08:00-14:00 once merged, Tuesday 09:00-17:00
+        self.assertEqual(calculator.get_working_hours_between("2024-01-08 07:00", "2024-01-09 10:00", "3"), 7)
+        self.assertEqual(calculator.add_working_hours("2024-01-05 12:00", 1, "3"), pd.Timestamp("2024-01-06 11:00"))
+
+
+class TestCalendarModel(unittest.TestCase):
+    """The CALENDAR objects, the calendar frames and the compiled calendars read one parsed clndr_data."""
+
+    def setUp(self):
+        self.xer = Xer(generated_xer(20, 0))
+        self.objects = _process_calendar_data(self.xer.calendar_df)
+        self.from_frames = compile_calendars(self.xer.workday_df, self.xer.exception_df)
+
+    def test_parsed_once(self):
+        for data in (WEEK, SHIFT, DERIVED):
+            self.assertIs(parse_clndr_data(data), parse_clndr_data(str(data)))
+        self.assertIs(self.objects["3"].clndr_data, resolve_clndr_data((DERIVED, SHIFT)))
+
+    def test_parsed_data_is_read_only(self):
+        data = parse_clndr_data(WEEK)
+        with self.assertRaises(TypeError):
+            data.work_week[1] = ()
+        copy = pickle.loads(pickle.dumps(data))
+        self.assertEqual(dict(copy.work_week), dict(data.work_week))
+        self.assertEqual(dict(copy.exceptions), dict(data.exceptions))
+
+    def test_views_agree(self):
+        days = [date(2023, 12, 1).toordinal() + i for i in range(200)]
+        for clndr_id, calendar in self.objects.items():
+            with self.subTest(clndr_id=clndr_id):
+                expected = [calendar.is_workday(datetime.fromordinal(day)) for day in days]
+                np.testing.assert_array_equal(self.from_frames[clndr_id].is_working_day(days), expected)
+                np.testing.assert_array_equal(calendar.compiled.is_working_day(days), expected)
+                # the same working minutes in every week, whichever way the calendar was compiled
+                first, last = np.array([days[0], days[-1]]) * 1440
+                self.assertEqual(self.from_frames[clndr_id].working_minutes_between(first, last),
+                                 calendar.compiled.working_minutes_between(first, last))
+
+    def test_frames_and_cache_compile_alike(self):
+        cache = CalendarCache()
+        for clndr_id, calendar in self.objects.items():
+            with self.subTest(clndr_id=clndr_id):
+                compiled = cache.get(calendar.data, clndr_id, bases=calendar.bases)
+                frames = self.from_frames[clndr_id]
+                np.testing.assert_array_equal(compiled.week_mask, frames.week_mask)
+                np.testing.assert_array_equal(compiled.holidays, frames.holidays)
+                np.testing.assert_array_equal(compiled.working_exceptions, frames.working_exceptions)
+                self.assertEqual(compiled.week_shifts, frames.week_shifts)
+                self.assertEqual(compiled.exception_shifts, frames.exception_shifts)
+
+
+
+class TestCalendarCache(unittest.TestCase):
+    def test_shared_across_xers(self):
+        cache = CalendarCache()
+        first = compile_calendar_df(Xer(generated_xer(20, 0)).calendar_df, cache=cache)
+        # another export of the same programme, with other activities
+        second = compile_calendar_df(Xer(generated_xer(40, 5)).calendar_df, cache=cache)
+        for clndr_id in first:
+            self.assertIs(first[clndr_id], second[clndr_id])
+        self.assertEqual(cache.stats()["misses"], 3)
+        self.assertEqual(cache.stats()["hits"], 3)
+
+    def test_key(self):
+        self.assertEqual(CalendarCache.key(WEEK), CalendarCache.key(str(WEEK)))
+        self.assertNotEqual(CalendarCache.key(WEEK), CalendarCache.key(SHIFT))
+        # the same data on another base, or compiled for another horizon, is another calendar
+        self.assertNotEqual(CalendarCache.key(DERIVED, bases=(SHIFT,)), CalendarCache.key(DERIVED, bases=(WEEK,)))
+        self.assertNotEqual(CalendarCache.key(WEEK), CalendarCache.key(WEEK, (date(2024, 1, 1), date(2024, 12, 31))))
+        cache = CalendarCache()
+        self.assertIsNot(cache.get(DERIVED, "3", bases=(SHIFT,)), cache.get(DERIVED, "3", bases=(WEEK,)))
+
+    def test_bytes_budget(self):
+        calendars = [WEEK, SHIFT, OVERLAPPING]
+        horizon = (date(2020, 1, 1), date(2030, 12, 31))
+        cache = CalendarCache(max_bytes=10 ** 9)
+        size = cache.get(WEEK, "1", horizon).nbytes
+        cache = CalendarCache(max_bytes=int(size * 2.5))
+        for data in calendars:
+            cache.get(data, "", horizon)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        self.assertLessEqual(cache.nbytes, cache.max_bytes)
+        # a cached calendar growing far past its horizon evicts the least recently used one
+        cache.get(OVERLAPPING, "", horizon).ensure(date(1950, 1, 1).toordinal(), date(2100, 1, 1).toordinal())
+        self.assertEqual(len(cache), 1)
+        cache.clear()
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_concurrent_growth(self):
+        calendar = CalendarCache().get(WEEK, "1", (date(2024, 1, 1), date(2024, 1, 31)))
+        days = np.arange(0, 5000, 100)
+        expected = [walk(calendar, START, step) for step in days.tolist()]
+        results = {}
+
+        def run(worker):
+            results[worker] = calendar.add_working_days(np.full(days.size, START), days).tolist()
+
+        threads = [threading.Thread(target=run, args=(worker,)) for worker in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for worker in range(8):
+            self.assertEqual(results[worker], expected)
+
+
+
+class TestBaseCalendars(unittest.TestCase):
+    # a week of its own, and a holiday on 2024-01-06, which OVERLAPPING works: its
+    # exceptions replace those of the base on the same date
+    OWN_WEEK = SHIFT.replace("(0||0(d|45285)())", "(0||0(d|45297)())")
+
+    def test_chains(self):
+        calendars = calendar_frame(("1", "", WEEK), ("2", "1", DERIVED), ("3", "2", DERIVED), ("4", "9", DERIVED),
+                                   ("5", "6", DERIVED), ("6", "5", DERIVED))
+        with self.assertLogs(level="WARNING") as logs:
+            chains = base_chains(calendars)
+        self.assertEqual(chains["1"], (WEEK,))
+        self.assertEqual(chains["2"], (DERIVED, WEEK))
+        self.assertEqual(chains["3"], (DERIVED, DERIVED, WEEK))
+        # a missing base and a base loop end the chain
+        self.assertEqual(chains["4"], (DERIVED,))
+        self.assertEqual(len(chains["5"]), 2)
+        self.assertTrue(any("not found" in line for line in logs.output))
+        self.assertTrue(any("loop" in line for line in logs.output))
+
+    def test_resolution(self):
+        inherited = resolve_clndr_data((DERIVED, WEEK))
+        week, derived = parse_clndr_data(WEEK), parse_clndr_data(DERIVED)
+        self.assertFalse(derived.work_week)
+        self.assertEqual(dict(inherited.work_week), dict(week.work_week))
+        self.assertEqual(dict(inherited.exceptions), {**week.exceptions, **derived.exceptions})
+        own = resolve_clndr_data((self.OWN_WEEK, OVERLAPPING))
+        self.assertEqual(dict(own.work_week), dict(parse_clndr_data(self.OWN_WEEK).work_week))
+        # the worked Saturday of the base is a holiday of the derived calendar
+        self.assertEqual(own.exceptions[date(2024, 1, 6)], ())
+        self.assertEqual(own.exceptions[date(2024, 1, 1)], ())
+
+    def test_derived_calendars_everywhere(self):
+        calendars = calendar_frame(("1", "", WEEK), ("2", "1", DERIVED), ("3", "2", DERIVED))
+        parser = CalendarParser(calendars)
+        parser.parse_calendars()
+        from_frames = compile_calendars(parser.workdays_df, parser.exceptions_df)
+        from_cache = compile_calendar_df(calendars, cache=CalendarCache())
+        # DERIVED adds a holiday on Tuesday 2024-01-09 to the week of WEEK
+        days = [date(2024, 1, 1).toordinal() + i for i in range(130)]
+        base = from_cache["1"].is_working_day(days)
+        for clndr_id in ("2", "3"):
+            with self.subTest(clndr_id=clndr_id):
+                derived = from_cache[clndr_id].is_working_day(days)
+                np.testing.assert_array_equal(derived, from_frames[clndr_id].is_working_day(days))
+                self.assertEqual(np.flatnonzero(base != derived).tolist(), [8])
+                self.assertEqual(from_cache[clndr_id].week_shifts, from_cache["1"].week_shifts)
+
+
+if __name__ == "__main__":
+    unittest.main()
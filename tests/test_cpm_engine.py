@@ -0,0 +1,198 @@
+"""
+Unittests for rescheduling a CPMEngine after edits.
+
+`recompute` must give the same schedule as a new engine over the edited
+tables, and reschedule a typical edit of a 50,000 activity network in
+under 10 ms.
+"""
+
+import logging
+import os
+import random
+import sys
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from local.libs.cpm_engine import CPMEngine
+from local.libs.working_day_calculator import WorkingDayCalculator
+from tests.generated_xer import generated_xer
+from xerparser import Xer
+
+RESULTS = ("early_start", "early_finish", "late_start", "late_finish", "total_float", "level", "rank")
+
+
+class EditedSchedule:
+    """A generated schedule with the TASK and TASKPRED tables kept in step with the edits of its engine."""
+
+    def __init__(self, n_tasks: int, seed: int) -> None:
+        self.xer = Xer(generated_xer(n_tasks, seed))
+        self.calendars = WorkingDayCalculator(self.xer.workday_df, self.xer.exception_df,
+                                              self.xer.calendar_df).calendars
+        self.task_df = self.xer.task_df.copy()
+        self.taskpred_df = self.xer.taskpred_df.copy()
+        self.task_ids = self.task_df['task_id'].astype(str).tolist()
+        self.engine = self.fresh()
+
+    def fresh(self) -> CPMEngine:
+        project = self.xer.project_df.iloc[0]
+        return CPMEngine(self.task_df, self.taskpred_df, self.calendars, project['last_recalc_date'],
+                         project['plan_start_date'], self.xer.projwbs_df).schedule()
+
+    def edit(self, rnd: random.Random) -> str:
+        """Apply one random edit to the engine and the tables; the kind of edit made."""
+        draw = rnd.random()
+        if draw < .4:
+            task_id, hours = rnd.choice(self.task_ids), rnd.choice([0, 8, 48, 240, 2400])
+            self.engine.update_duration(task_id, hours)
+            self.task_df.loc[self.task_df['task_id'].astype(str) == task_id, 'target_drtn_hr_cnt'] = str(hours)
+            return 'duration'
+        if draw < .75:
+            pred, succ = rnd.sample(self.task_ids, 2)
+            pred_type, lag = rnd.choice(['PR_FS', 'PR_SS', 'PR_FF', 'PR_SF']), rnd.choice([0, 8, -16])
+            try:
+                self.engine.add_relationship(pred, succ, pred_type, lag)
+            except ValueError:
+                return 'loop'
+            row = {'task_pred_id': f'new{len(self.taskpred_df)}', 'task_id': succ, 'pred_task_id': pred,
+                   'pred_type': pred_type, 'lag_hr_cnt': str(lag)}
+            self.taskpred_df = pd.concat([self.taskpred_df, pd.DataFrame([row])], ignore_index=True)
+            return 'add'
+        row = self.taskpred_df.iloc[rnd.randrange(len(self.taskpred_df))]
+        pred, succ = str(row['pred_task_id']), str(row['task_id'])
+        self.engine.remove_relationship(pred, succ)
+        same = (self.taskpred_df['pred_task_id'].astype(str) == pred) & (self.taskpred_df['task_id'].astype(str) == succ)
+        self.taskpred_df = self.taskpred_df[~same]
+        return 'remove'
+
+
+class TestRecompute(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        logging.disable(logging.WARNING)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+
+    def test_matches_new_engine(self):
+        for seed in range(3):
+            schedule, rnd = EditedSchedule(400, seed), random.Random(seed)
+            for step in range(40):
+                kind = schedule.edit(rnd)
+                schedule.engine.recompute()
+                expected = schedule.fresh()
+                for name in RESULTS:
+                    with self.subTest(seed=seed, step=step, edit=kind, result=name):
+                        np.testing.assert_array_equal(getattr(schedule.engine, name), getattr(expected, name))
+
+    def test_several_edits_before_recompute(self):
+        schedule, rnd = EditedSchedule(400, 7), random.Random(7)
+        for _ in range(3):
+            for _ in range(5):
+                schedule.edit(rnd)
+            schedule.engine.recompute()
+        expected = schedule.fresh()
+        for name in RESULTS:
+            np.testing.assert_array_equal(getattr(schedule.engine, name), getattr(expected, name), err_msg=name)
+
+    def test_adding_an_existing_relationship_replaces_it(self):
+        schedule = EditedSchedule(200, 3)
+        engine = schedule.engine
+        row = schedule.taskpred_df.iloc[10]
+        pred, succ = str(row['pred_task_id']), str(row['task_id'])
+        edges = engine.network.edge_count
+        engine.add_relationship(pred, succ, 'PR_SS', 24.0, 'replaced')
+        self.assertEqual(engine.network.edge_count, edges)
+        edge = engine.network.edge_index(engine._node(pred), engine._node(succ))
+        self.assertEqual(engine.network.pred_type[edge], 1)
+        self.assertEqual(engine.network.lag_hr[edge], 24.0)
+        self.assertEqual(engine.network.task_pred_ids[edge], 'replaced')
+        self.assertEqual(engine.edge_lag[edge], 24 * 60)
+        engine.recompute()
+        same = ((schedule.taskpred_df['pred_task_id'].astype(str) == pred)
+                & (schedule.taskpred_df['task_id'].astype(str) == succ))
+        schedule.taskpred_df.loc[same, ['pred_type', 'lag_hr_cnt']] = ['PR_SS', '24']
+        expected = schedule.fresh()
+        for name in RESULTS:
+            np.testing.assert_array_equal(getattr(engine, name), getattr(expected, name), err_msg=name)
+
+    def test_queries_need_a_current_schedule(self):
+        schedule = EditedSchedule(100, 2)
+        engine = schedule.engine
+        engine.update_duration(schedule.task_ids[5], 80)
+        for query in (engine.critical_path, engine.longest_path, engine.float_paths,
+                      lambda: engine.driving_path(schedule.task_ids[5])):
+            with self.assertRaises(ValueError):
+                query()
+        engine.recompute()
+        self.assertEqual(engine.longest_path(), schedule.fresh().longest_path())
+
+
+class TestRecomputeTime(unittest.TestCase):
+    """Interactive edits of a 50,000 activity network."""
+
+    @classmethod
+    def setUpClass(cls):
+        logging.disable(logging.WARNING)
+        cls.schedule = EditedSchedule(50000, 1)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+
+    def test_under_ten_milliseconds(self):
+        engine, rnd, task_ids = self.schedule.engine, random.Random(1), self.schedule.task_ids
+
+        def add():
+            node = rnd.randrange(len(task_ids) - 1)
+            succ = min(len(task_ids) - 1, node + rnd.randint(1, 30))
+            engine.add_relationship(task_ids[node], task_ids[succ], 'PR_FS', 0)
+
+        def remove():
+            edge = rnd.randrange(engine.network.edge_count)
+            engine.remove_relationship(task_ids[engine.network.edge_pred[edge]],
+                                       task_ids[engine.network.edge_succ[edge]])
+
+        edits = {'duration': lambda: engine.update_duration(rnd.choice(task_ids), rnd.choice([0, 8, 48, 240])),
+                 'add': add, 'remove': remove}
+        for kind, edit in edits.items():
+            seconds = []
+            while len(seconds) < 30:
+                start = time.perf_counter()
+                try:
+                    edit()
+                except ValueError:
+                    # the relationship would close a loop
+                    continue
+                engine.recompute()
+                seconds.append(time.perf_counter() - start)
+            with self.subTest(edit=kind):
+                self.assertLess(np.median(seconds), .01)
+
+
+class TestOutOfRangeDates(unittest.TestCase):
+    def test_out_of_range_dates_are_ignored(self):
+        schedule = EditedSchedule(200, 4)
+        tasks = schedule.task_df
+        rows = {tasks.index[150]: ('cstr_date', '9999-12-31 00:00'), tasks.index[160]: ('cstr_date', '0001-01-01 00:00'),
+                tasks.index[5]: ('act_start_date', '0001-01-01 08:00'), tasks.index[6]: ('act_end_date', '9999-12-31 17:00')}
+        tasks.loc[[tasks.index[150], tasks.index[160]], 'cstr_type'] = ['CS_MSO', 'CS_MEO']
+        for row, (column, _) in rows.items():
+            tasks.loc[row, column] = None
+        expected = schedule.fresh()
+        for row, (column, date) in rows.items():
+            tasks.loc[row, column] = pd.Timestamp(date) if tasks[column].dtype.kind == 'M' else date
+        with self.assertLogs('CPMEngine', level='WARNING') as logs:
+            engine = schedule.fresh()
+        self.assertTrue(any('outside the years' in line for line in logs.output))
+        for name in RESULTS:
+            np.testing.assert_array_equal(getattr(engine, name), getattr(expected, name), err_msg=name)
+
+
+if __name__ == "__main__":
+    unittest.main()
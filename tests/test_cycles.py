@@ -0,0 +1,123 @@
+"""
+Unittests for finding and breaking logic loops.
+
+`logic_loops` and `feedback_edges` are checked against networkx on small
+graphs with nested and overlapping loops.
+"""
+
+import os
+import random
+import sys
+import unittest
+
+import networkx as nx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from local.libs.cycles import feedback_edges, logic_loops
+
+
+def graph(*edges, nodes=()) -> nx.DiGraph:
+    g = nx.DiGraph()
+    g.add_nodes_from(nodes)
+    g.add_edges_from(edges)
+    return g
+
+
+# a -> b -> c -> a with the nested loop b -> c -> b, and d -> e -> f -> d sharing e -> f with e -> f -> g -> e
+NESTED = graph(("a", "b"), ("b", "c"), ("c", "a"), ("c", "b"), ("c", "d"))
+OVERLAPPING = graph(("d", "e"), ("e", "f"), ("f", "d"), ("f", "g"), ("g", "e"), ("g", "h"), ("h", "h"), ("h", "i"))
+
+
+def random_graph(seed: int) -> nx.DiGraph:
+    rnd = random.Random(seed)
+    g = nx.DiGraph()
+    g.add_nodes_from(range(30))
+    # mostly forward relationships, with a few back to make loops
+    for _ in range(60):
+        u, v = rnd.sample(range(30), 2)
+        g.add_edge(*sorted((u, v)) if rnd.random() < .85 else sorted((u, v), reverse=True))
+    return g
+
+
+class TestLogicLoops(unittest.TestCase):
+    def assert_loops_match_networkx(self, g):
+        loops = logic_loops(g)
+        expected = [c for c in nx.strongly_connected_components(g)
+                    if len(c) > 1 or g.has_edge(next(iter(c)), next(iter(c)))]
+        self.assertEqual(sorted(map(frozenset, loops), key=sorted), sorted(map(frozenset, expected), key=sorted))
+        # every node of every elementary cycle lies on one of the loops
+        on_loops = set().union(*map(set, loops)) if loops else set()
+        for cycle in nx.simple_cycles(g):
+            self.assertTrue(set(cycle) <= on_loops)
+            self.assertEqual(sum(set(cycle) <= set(loop) for loop in loops), 1)
+        position = list(g)
+        for loop in loops:
+            self.assertEqual(loop, sorted(loop, key=position.index))
+        self.assertEqual(loops, sorted(loops, key=lambda loop: position.index(loop[0])))
+
+    def test_nested_loops(self):
+        self.assertEqual(logic_loops(NESTED), [["a", "b", "c"]])
+        self.assert_loops_match_networkx(NESTED)
+
+    def test_overlapping_loops(self):
+        self.assertEqual(logic_loops(OVERLAPPING), [["d", "e", "f", "g"], ["h"]])
+        self.assert_loops_match_networkx(OVERLAPPING)
+
+    def test_no_loops(self):
+        self.assertEqual(logic_loops(graph(("a", "b"), ("b", "c"), ("a", "c"), nodes=["z"])), [])
+
+    def test_random_graphs(self):
+        for seed in range(20):
+            with self.subTest(seed=seed):
+                self.assert_loops_match_networkx(random_graph(seed))
+
+
+class TestFeedbackEdges(unittest.TestCase):
+    def assert_breaks_loops(self, g, removed):
+        broken = g.copy()
+        broken.remove_edges_from(removed)
+        self.assertTrue(nx.is_directed_acyclic_graph(broken))
+        self.assertEqual(g.number_of_edges(), broken.number_of_edges() + len(removed))
+        # minimal: putting any one of them back makes a loop
+        for edge in removed:
+            with self.subTest(edge=edge):
+                broken.add_edge(*edge)
+                self.assertFalse(nx.is_directed_acyclic_graph(broken))
+                broken.remove_edge(*edge)
+
+    def test_nested_loops(self):
+        removed = feedback_edges(NESTED)
+        self.assertEqual(removed, [("c", "a"), ("c", "b")])
+        self.assert_breaks_loops(NESTED, removed)
+
+    def test_overlapping_loops(self):
+        removed = feedback_edges(OVERLAPPING)
+        self.assertEqual(removed, [("f", "d"), ("g", "e"), ("h", "h")])
+        self.assert_breaks_loops(OVERLAPPING, removed)
+
+    def test_preference(self):
+        # b -> c -> b is closed by whichever of the two the search from a reaches last
+        g = graph(("a", "b"), ("a", "c"), ("b", "c"), ("c", "b"), ("c", "a"))
+        removed = feedback_edges(g)
+        self.assertEqual(removed, [("c", "a"), ("c", "b")])
+        self.assert_breaks_loops(g, removed)
+        # following a -> c first leaves b -> c as the back edge
+        weights = {("a", "b"): 1.0}
+        removed = feedback_edges(g, preference=lambda u, v: weights.get((u, v), 0.0))
+        self.assertEqual(removed, [("b", "c"), ("c", "a")])
+        self.assert_breaks_loops(g, removed)
+
+    def test_random_graphs(self):
+        for seed in range(20):
+            g = random_graph(seed)
+            edges = list(g.edges)
+            with self.subTest(seed=seed):
+                removed = feedback_edges(g, logic_loops(g))
+                self.assertEqual(list(g.edges), edges)
+                self.assertEqual(removed, feedback_edges(g))
+                self.assert_breaks_loops(g, removed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+"""
+Unittests for the memory report of an Xer.
+"""
+
+import os
+import sys
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.generated_xer import generated_xer
+from xerparser import Xer
+
+
+class TestMemoryReport(unittest.TestCase):
+    def setUp(self):
+        self.xer = Xer(generated_xer(500, 0))
+
+    def test_tables_match_memory_usage(self):
+        by_table = self.xer.memory_report(exact=True).groupby("table")["bytes"].sum()
+        for name, df in self.xer.tables.items():
+            if not isinstance(df, pd.DataFrame) or df.columns.empty:
+                continue
+            with self.subTest(table=name):
+                self.assertEqual(by_table[name], df.memory_usage(index=False, deep=True).sum())
+        for name in ("workday_df", "exception_df"):
+            with self.subTest(frame=name):
+                df = getattr(self.xer, name)
+                self.assertEqual(by_table[name], df.memory_usage(index=True, deep=True).sum())
+
+    def test_network_counts_only_its_arrays(self):
+        before = self.xer.memory_report(exact=True)
+        network = self.xer.network
+        after = self.xer.memory_report(exact=True)
+        self.assertNotIn("_network_source", set(after["table"]))
+        arrays = sum(getattr(network, name).nbytes for name in vars(network)
+                     if hasattr(getattr(network, name), "nbytes"))
+        added = after["bytes"].sum() - before["bytes"].sum()
+        self.assertEqual(added, after.loc[after["table"] == "_network", "bytes"].sum())
+        # the arrays, plus the strings of the id arrays
+        self.assertGreaterEqual(added, arrays)
+        self.assertLess(added, arrays + 100 * (len(network.task_ids) + len(network.task_pred_ids)))
+
+    def test_frames_are_counted_once(self):
+        total = self.xer.memory_report(exact=True)["bytes"].sum()
+        self.xer.cached_frames = {"tasks": self.xer.task_df, "workdays": self.xer.workday_df}
+        report = self.xer.memory_report(exact=True)
+        self.assertNotIn("cached_frames", set(report["table"]))
+        self.assertEqual(report["bytes"].sum(), total)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+"""
+Unittests for the CSR relationship network.
+"""
+
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.generated_xer import generated_xer
+from xerparser import Xer
+from xerparser.src.network import LAG_CALENDAR_OPTIONS, NO_CALENDAR, RelationshipNetwork
+
+
+def task_frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        "task_id": ["1", "2", "3", "4", "5"],
+        "clndr_id": ["10", "20", "10", "", "30"],
+    })
+
+
+def taskpred_frame(*rows) -> pd.DataFrame:
+    return pd.DataFrame(
+        [(str(k), succ, pred, pred_type, lag) for k, (pred, succ, pred_type, lag) in enumerate(rows)],
+        columns=["task_pred_id", "task_id", "pred_task_id", "pred_type", "lag_hr_cnt"],
+    )
+
+
+def diamond() -> RelationshipNetwork:
+    # 1 -> 2 -> 4, 1 -> 3 -> 4, 1 -> 4 and 5 on its own
+    return RelationshipNetwork.from_frames(task_frame(), taskpred_frame(
+        ("1", "2", "PR_FS", "0"), ("2", "4", "PR_SS", "8"), ("1", "3", "PR_FF", "0"),
+        ("3", "4", "PR_FS", "-16"), ("1", "4", "PR_SF", "0")))
+
+
+class TestFromFrames(unittest.TestCase):
+    def assert_consistent(self, network, pairs):
+        """CSR and CSC views list exactly the relationship pairs, in sorted order."""
+        edges = sorted(pairs)
+        self.assertEqual(list(zip(network.edge_pred.tolist(), network.edge_succ.tolist())), edges)
+        for node in range(network.node_count):
+            with self.subTest(node=node):
+                self.assertEqual(network.successors(node).tolist(), sorted(s for p, s in edges if p == node))
+                self.assertEqual(sorted(network.predecessors(node).tolist()), sorted(p for p, s in edges if s == node))
+                for edge in network.successor_edges(node):
+                    self.assertEqual(network.edge_pred[edge], node)
+                for edge in network.predecessor_edges(node):
+                    self.assertEqual(network.edge_succ[edge], node)
+        self.assertEqual(network.succ_indptr[-1], len(edges))
+        self.assertEqual(network.pred_indptr[-1], len(edges))
+        self.assertEqual(sorted(network.pred_edges.tolist()), list(range(len(edges))))
+        np.testing.assert_array_equal(network.out_degree(), np.bincount(network.edge_pred, minlength=network.node_count))
+        np.testing.assert_array_equal(network.in_degree(), np.bincount(network.edge_succ, minlength=network.node_count))
+
+    def test_csr_and_csc_agree(self):
+        network = diamond()
+        self.assert_consistent(network, [(0, 1), (1, 3), (0, 2), (2, 3), (0, 3)])
+        edge = network.edge_index(1, 3)
+        self.assertEqual((network.pred_type[edge], network.lag_hr[edge]), (1, 8.0))
+        self.assertEqual(network.lag_hr[network.edge_index(2, 3)], -16.0)
+        self.assertEqual(network.edge_index(3, 1), -1)
+
+    def test_edits_keep_csr_and_csc_consistent(self):
+        network, _ = diamond().insert_edge(4, 0)
+        network, _ = network.insert_edge(2, 4, 1, 4.0)
+        network = network.delete_edge(network.edge_index(0, 3))
+        self.assert_consistent(network, [(0, 1), (1, 3), (0, 2), (2, 3), (4, 0), (2, 4)])
+
+    def test_unknown_task_ids_are_dropped(self):
+        network = RelationshipNetwork.from_frames(task_frame(), taskpred_frame(
+            ("1", "2", "PR_FS", "0"), ("9", "2", "PR_FS", "0"), ("3", "8", "PR_FS", "0"), ("2", "3", "PR_XX", "x")))
+        self.assertEqual(network.dropped_edges, 2)
+        self.assert_consistent(network, [(0, 1), (1, 2)])
+        # unknown types are finish to start and unreadable lags are 0
+        edge = network.edge_index(1, 2)
+        self.assertEqual((network.pred_type[edge], network.lag_hr[edge], network.task_pred_ids[edge]), (0, 0.0, "3"))
+        np.testing.assert_array_equal(network.index_of(["3", "9"]), [2, -1])
+
+    def test_levels_of_a_known_dag(self):
+        network = diamond()
+        np.testing.assert_array_equal(network.topological_levels(), [0, 1, 1, 2, 0])
+        looped, _ = network.insert_edge(3, 1)
+        # 2 and 4 form a loop and are never released
+        np.testing.assert_array_equal(looped.topological_levels(), [0, -1, 1, -1, 0])
+
+    def test_reachable(self):
+        network = diamond()
+        np.testing.assert_array_equal(network.reachable([1]), [False, True, False, True, False])
+        np.testing.assert_array_equal(network.reachable([3], downstream=False), [True, True, True, True, False])
+
+    def test_lag_calendar_options(self):
+        relationships = taskpred_frame(("1", "2", "PR_FS", "8"), ("2", "4", "PR_FS", "8"), ("3", "5", "PR_FS", "8"))
+        expected = {"predecessor": ["10", "20", "10"], "successor": ["20", None, "30"], "24hour": [None] * 3}
+        for option, clndr_ids in expected.items():
+            with self.subTest(lag_calendar=option):
+                network = RelationshipNetwork.from_frames(task_frame(), relationships, option)
+                codes = network.lag_clndr.tolist()
+                self.assertEqual([None if code == NO_CALENDAR else network.clndr_ids[code] for code in codes], clndr_ids)
+        # the task without a calendar has none
+        self.assertEqual(RelationshipNetwork.from_frames(task_frame(), relationships).task_clndr[3], NO_CALENDAR)
+        with self.assertRaises(ValueError):
+            RelationshipNetwork.from_frames(task_frame(), relationships, "project")
+
+    def test_xer_reads_the_lag_calendar_option(self):
+        xer = Xer(generated_xer(50, 0))
+        self.assertEqual(xer.network.lag_calendar, "predecessor")
+        for option, lag_calendar in LAG_CALENDAR_OPTIONS.items():
+            with self.subTest(option=option):
+                xer.tables["SCHEDOPTIONS"] = pd.DataFrame({"sched_calendar_on_relationship_lag": [option]})
+                xer.invalidate_network()
+                self.assertEqual(xer.network.lag_calendar, lag_calendar)
+
+
+class TestEdgeEdits(unittest.TestCase):
+    def test_inserted_lag_calendar_follows_the_option(self):
+        # node 1 has no relationship yet, so there is no neighbouring edge to copy from
+        relationships = taskpred_frame(("1", "3", "PR_FS", "0"))
+        for option in ("predecessor", "successor", "24hour"):
+            with self.subTest(lag_calendar=option):
+                network = RelationshipNetwork.from_frames(task_frame(), relationships, lag_calendar=option)
+                network, edge = network.insert_edge(1, 4, 0, 8.0, "new")
+                rebuilt = RelationshipNetwork.from_frames(
+                    task_frame(), taskpred_frame(("1", "3", "PR_FS", "0"), ("2", "5", "PR_FS", "8")), option)
+                np.testing.assert_array_equal(network.lag_clndr, rebuilt.lag_clndr)
+                expected = {"predecessor": network.task_clndr[1], "successor": network.task_clndr[4],
+                            "24hour": NO_CALENDAR}[option]
+                self.assertEqual(network.lag_clndr[edge], expected)
+
+    def test_update_edge_replaces_type_and_lag(self):
+        network = RelationshipNetwork.from_frames(
+            task_frame(), taskpred_frame(("1", "2", "PR_FS", "0"), ("1", "3", "PR_SS", "4")))
+        edge = network.edge_index(0, 2)
+        updated = network.update_edge(edge, 2, 16.0, "99")
+        self.assertEqual((updated.pred_type[edge], updated.lag_hr[edge], updated.task_pred_ids[edge]), (2, 16.0, "99"))
+        # the original network is left as it was
+        self.assertEqual((network.pred_type[edge], network.lag_hr[edge]), (1, 4.0))
+        self.assertEqual(updated.edge_index(0, 2), edge)
+        self.assertEqual(updated.update_edge(edge, 0, 0.0).task_pred_ids[edge], "99")
+
+
+if __name__ == "__main__":
+    unittest.main()
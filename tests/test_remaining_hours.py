@@ -0,0 +1,104 @@
+"""
+Unittests for spreading remaining hours over the working days of a calendar.
+"""
+
+import os
+import sys
+import unittest
+from datetime import date, datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from local.libs.compiled_calendar import CalendarSet, CompiledCalendar
+from local.libs.remaining_hours import remaining_hours_per_day
+from xerparser.schemas.old_task import TASK
+
+# Monday to Friday, 08:00-12:00 and 13:00-17:00; 2024-01-05 (a Friday) is a holiday
+DAY_SHIFTS = [(8 * 60, 12 * 60), (13 * 60, 17 * 60)]
+CALENDARS = CalendarSet({
+    "1": CompiledCalendar(
+        "1", [True] * 5 + [False] * 2, [date(2024, 1, 5).toordinal()],
+        week_shifts=[DAY_SHIFTS] * 5 + [[], []],
+    ),
+})
+
+
+def task_frame(**columns) -> pd.DataFrame:
+    row = {
+        "task_id": "1", "clndr_id": "1", "status_code": "TK_NotStart", "task_type": "TT_Task",
+        "remain_drtn_hr_cnt": 24.0,
+        "restart_date": "2024-01-03 08:00", "reend_date": "2024-01-09 17:00",
+        "rem_late_start_date": "2024-01-08 08:00", "rem_late_end_date": "2024-01-10 17:00",
+    }
+    row.update(columns)
+    return pd.DataFrame([row])
+
+
+def old_task(**columns) -> TASK:
+    # TASK.__init__ needs enum members the schema does not define, and
+    # rem_hours_per_day only reads the task row
+    task = TASK.__new__(TASK)
+    task.task_df = task_frame(**columns)
+    return task
+
+
+class TestRemainingHours(unittest.TestCase):
+    def test_hours_follow_working_days(self):
+        per_day = remaining_hours_per_day(task_frame(), CALENDARS)
+        self.assertEqual(
+            list(per_day["date"].dt.date),
+            [date(2024, 1, 3), date(2024, 1, 4), date(2024, 1, 8), date(2024, 1, 9)],
+        )
+        self.assertAlmostEqual(per_day["hours"].sum(), 24.0)
+        self.assertTrue((per_day["hours"] == 6.0).all())
+
+    def test_late_dates(self):
+        per_day = remaining_hours_per_day(task_frame(), CALENDARS, late_dates=True)
+        self.assertEqual(list(per_day["date"].dt.date), [date(2024, 1, 8), date(2024, 1, 9), date(2024, 1, 10)])
+        self.assertAlmostEqual(per_day["hours"].sum(), 24.0)
+
+    def test_completed_and_milestones_are_skipped(self):
+        tasks = pd.concat([
+            task_frame(task_id="1", status_code="TK_Complete"),
+            task_frame(task_id="2", task_type="TT_Mile"),
+            task_frame(task_id="3", remain_drtn_hr_cnt=0.0),
+            task_frame(task_id="4", restart_date=None),
+        ], ignore_index=True)
+        self.assertTrue(remaining_hours_per_day(tasks, CALENDARS).empty)
+
+    def test_no_working_time_puts_hours_on_start(self):
+        weekend = task_frame(restart_date="2024-01-06 08:00", reend_date="2024-01-07 17:00")
+        per_day = remaining_hours_per_day(weekend, CALENDARS)
+        self.assertEqual(list(per_day["date"].dt.date), [date(2024, 1, 6)])
+        self.assertAlmostEqual(per_day["hours"].sum(), 24.0)
+
+    def test_long_spans_are_capped(self):
+        tasks = pd.concat([
+            task_frame(task_id="1"),
+            task_frame(task_id="2", reend_date="9999-12-31 17:00"),
+        ], ignore_index=True)
+        with self.assertLogs(level="WARNING"):
+            per_day = remaining_hours_per_day(tasks, CALENDARS, max_days=366)
+        self.assertEqual(set(per_day["task_id"]), {"1"})
+
+
+class TestTaskRemHours(unittest.TestCase):
+    def test_rem_hour_calc(self):
+        rem_hours = old_task().rem_hours_per_day(calendars=CALENDARS)
+        self.assertEqual(
+            list(rem_hours),
+            [datetime(2024, 1, 3), datetime(2024, 1, 4), datetime(2024, 1, 8), datetime(2024, 1, 9)],
+        )
+        self.assertAlmostEqual(sum(rem_hours.values()), 24.0)
+
+    def test_calendar_is_required(self):
+        with self.assertRaises(ValueError):
+            old_task().rem_hours_per_day()
+        with self.assertRaises(ValueError):
+            old_task(clndr_id="2").rem_hours_per_day(calendars=CALENDARS)
+
+
+if __name__ == "__main__":
+    unittest.main()
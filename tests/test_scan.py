@@ -0,0 +1,120 @@
+"""
+Unittests for the header-only scan of .xer files.
+"""
+
+import io
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from xerparser.src.scan import scan_header, scan_many
+
+ERMHDR = "ERMHDR\t19.12\t2024-03-05\tProject\tjdoe\tJohn Doe\tdbxDatabaseNoName\tProject Management\tUSD"
+PROJECT = (
+    "%T\tPROJECT",
+    "%F\tproj_id\tfy_start_month_num\tproj_short_name\tplan_start_date\tlast_recalc_date",
+    "%R\t101\t1\tALPHA\t2024-01-08 08:00\t2024-03-01 17:00",
+    "%R\t102\t1\tBETA\t2024-02-01\t",
+)
+CALENDAR = (
+    "%T\tCALENDAR",
+    "%F\tclndr_id\tclndr_name",
+    "%R\t1\tStandard",
+)
+TASK = (
+    "%T\tTASK",
+    "%F\ttask_id\tproj_id\ttask_code",
+    "%R\t1\t101\tA1000",
+)
+
+
+def xer_bytes(*tables: tuple[str, ...], header: str = ERMHDR, newline: str = "\n") -> bytes:
+    lines = [header, *(line for table in tables for line in table), "%E"]
+    return newline.join(lines).encode("cp1252")
+
+
+class TestScanHeader(unittest.TestCase):
+    def assert_projects(self, header):
+        self.assertEqual([p.proj_id for p in header.projects], ["101", "102"])
+        self.assertEqual([p.proj_short_name for p in header.projects], ["ALPHA", "BETA"])
+        self.assertEqual(header.projects[0].plan_start_date, datetime(2024, 1, 8, 8))
+        self.assertEqual(header.projects[0].last_recalc_date, datetime(2024, 3, 1, 17))
+        self.assertEqual(header.projects[1].plan_start_date, datetime(2024, 2, 1))
+        self.assertIsNone(header.projects[1].last_recalc_date)
+
+    def test_ermhdr_layout(self):
+        header = scan_header(io.BytesIO(xer_bytes(PROJECT)))
+        self.assertEqual(header.version, "19.12")
+        self.assertEqual(header.date, datetime(2024, 3, 5))
+        self.assertEqual(header.user, "John Doe")
+        self.assertIsNone(header.error)
+
+    def test_project_first_table(self):
+        self.assert_projects(scan_header(io.BytesIO(xer_bytes(PROJECT, TASK))))
+
+    def test_project_after_other_tables(self):
+        self.assert_projects(scan_header(io.BytesIO(xer_bytes(CALENDAR, PROJECT, TASK))))
+
+    def test_crlf_line_endings(self):
+        self.assert_projects(scan_header(io.BytesIO(xer_bytes(CALENDAR, PROJECT, newline="\r\n"))))
+
+    def test_project_last_table(self):
+        self.assert_projects(scan_header(io.BytesIO(xer_bytes(CALENDAR, PROJECT))))
+
+    def test_rows_after_project_are_not_read(self):
+        task = (*TASK, "%R\t2\t999\tA1010")
+        header = scan_header(io.BytesIO(xer_bytes(PROJECT, task)))
+        self.assertEqual(len(header.projects), 2)
+
+    def test_no_project_table(self):
+        header = scan_header(io.BytesIO(xer_bytes(CALENDAR)))
+        self.assertEqual(header.projects, ())
+        self.assertEqual(header.user, "John Doe")
+
+    def test_short_ermhdr(self):
+        header = scan_header(io.BytesIO(xer_bytes(PROJECT, header="ERMHDR\t8.0")))
+        self.assertEqual(header.version, "8.0")
+        self.assertIsNone(header.date)
+        self.assertEqual(header.user, "")
+
+    def test_invalid_file(self):
+        with self.assertRaises(ValueError):
+            scan_header(io.BytesIO(b"%T\tPROJECT\n"))
+
+
+class TestScanMany(unittest.TestCase):
+    def test_extension_case_insensitive(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            (root / "sub").mkdir()
+            (root / "a.xer").write_bytes(xer_bytes(PROJECT))
+            (root / "B.XER").write_bytes(xer_bytes(PROJECT))
+            (root / "sub" / "c.Xer").write_bytes(xer_bytes(PROJECT))
+            (root / "notes.txt").write_text("not an export")
+
+            headers = scan_many(root, workers=1)
+            self.assertEqual(sorted(Path(h.path).name for h in headers), ["B.XER", "a.xer", "c.Xer"])
+            self.assertTrue(all(h.error is None for h in headers))
+
+            top_level = scan_many(root, recursive=False, workers=1)
+            self.assertEqual(sorted(Path(h.path).name for h in top_level), ["B.XER", "a.xer"])
+
+    def test_unreadable_file_reports_error(self):
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            (root / "good.xer").write_bytes(xer_bytes(PROJECT))
+            (root / "bad.xer").write_bytes(b"not an export\n")
+
+            headers = {Path(h.path).name: h for h in scan_many(root, workers=1)}
+            self.assertIsNone(headers["good.xer"].error)
+            self.assertEqual(len(headers["good.xer"].projects), 2)
+            self.assertIsNotNone(headers["bad.xer"].error)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+Unittests for evaluating what-if scenarios of a CPMEngine.
+"""
+
+import logging
+import os
+import random
+import sys
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from local.libs import scenarios
+from local.libs.cpm_engine import _COPY_ON_WRITE
+from local.libs.scenarios import Scenario
+from tests.test_cpm_engine import RESULTS, EditedSchedule
+
+
+def random_scenarios(schedule: EditedSchedule, count: int, seed: int) -> list[Scenario]:
+    rnd = random.Random(seed)
+    rows = schedule.taskpred_df[['pred_task_id', 'task_id']].astype(str).to_numpy().tolist()
+    made = []
+    for _ in range(count):
+        durations = {task_id: rnd.choice([0, 24, 240, 960]) for task_id in rnd.sample(schedule.task_ids, 3)}
+        removed = tuple(tuple(row) for row in rnd.sample(rows, 2))
+        added = (tuple(rnd.sample(schedule.task_ids, 2)) + (rnd.choice(['PR_FS', 'PR_SS']), 8),)
+        made.append(Scenario(durations, added, removed))
+    return made
+
+
+class TestScenarios(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        logging.disable(logging.WARNING)
+        cls.schedule = EditedSchedule(400, 5)
+        cls.scenarios = random_scenarios(cls.schedule, 12, 5)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+
+    def assert_same_results(self, results, expected):
+        self.assertEqual(len(results), len(expected))
+        for k, (result, other) in enumerate(zip(results, expected)):
+            with self.subTest(scenario=k):
+                self.assertEqual(result.error, other.error)
+                self.assertEqual(result.project_finish, other.project_finish)
+                self.assertEqual(result.critical, other.critical)
+                if result.error is None:
+                    np.testing.assert_array_equal(result.early_finish, other.early_finish)
+                    np.testing.assert_array_equal(result.total_float, other.total_float)
+
+    def test_pooled_results_match_in_process(self):
+        engine = self.schedule.engine
+        in_process = engine.evaluate_scenarios(self.scenarios, workers=1)
+        with mock.patch.object(scenarios, 'IN_PROCESS_WORK', 0):
+            pooled = engine.evaluate_scenarios(self.scenarios, workers=2)
+        self.assert_same_results(pooled, in_process)
+
+    def test_scenarios_match_an_edited_engine(self):
+        base = self.schedule.engine
+        before = {name: getattr(base, name).copy() for name in RESULTS}
+        results = base.evaluate_scenarios(self.scenarios, workers=1)
+        for k, scenario in enumerate(self.scenarios):
+            edited = self.schedule.fresh()
+            try:
+                scenario.apply(edited)
+            except ValueError as e:
+                self.assertEqual(results[k].error, str(e))
+                continue
+            expected = scenarios.ScenarioResult.from_engine(edited.recompute())
+            self.assert_same_results([results[k]], [expected])
+        # the base engine is left as it was
+        for name, values in before.items():
+            np.testing.assert_array_equal(getattr(base, name), values, err_msg=name)
+
+    def test_copies_share_arrays_until_written(self):
+        base = self.schedule.fresh()
+        clone = base.copy()
+        for name in _COPY_ON_WRITE:
+            self.assertIs(getattr(clone, name), getattr(base, name), name)
+            self.assertFalse(getattr(base, name).flags.writeable, name)
+        clone.update_duration(self.schedule.task_ids[1], 480)
+        clone.recompute()
+        self.assertIsNot(clone.duration, base.duration)
+        self.assertIs(clone.level, base.level)
+        self.assertIs(clone.edge_lag, base.edge_lag)
+        # the base copies before its own edits and leaves the clone alone
+        finish = clone.early_finish.copy()
+        base.update_duration(self.schedule.task_ids[1], 0)
+        base.recompute()
+        np.testing.assert_array_equal(clone.early_finish, finish)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+"""
+Unittests for the Monte Carlo schedule risk analysis.
+"""
+
+import logging
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from local.libs.cpm_engine import NAT, CPMEngine
+from local.libs.schedule_risk import DISTRIBUTION_COLUMNS, ScheduleRisk, _FinishHistogram
+from local.libs.working_day_calculator import WorkingDayCalculator
+from tests.generated_xer import generated_xer
+from xerparser import Xer
+
+
+def scheduled_engine(n_tasks: int = 300, seed: int = 0) -> CPMEngine:
+    xer = Xer(generated_xer(n_tasks, seed))
+    calendars = WorkingDayCalculator(xer.workday_df, xer.exception_df, xer.calendar_df).calendars
+    return CPMEngine.from_xer(xer, calendars).schedule()
+
+
+def distributions(engine: CPMEngine, kinds=('triangular', 'pert', 'uniform')) -> pd.DataFrame:
+    """A distribution of 50% to 200% of the duration for every activity with one."""
+    nodes = np.flatnonzero(engine.has_duration & (engine.duration > 0))
+    hours = engine.duration[nodes] * 24.0
+    return pd.DataFrame({
+        'task_id': engine.task_ids[nodes],
+        'distribution': [kinds[i % len(kinds)] for i in range(nodes.size)],
+        'min_hr_cnt': hours * .5, 'most_likely_hr_cnt': hours, 'max_hr_cnt': hours * 2,
+    })[DISTRIBUTION_COLUMNS]
+
+
+class TestFinishHistogram(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        spread = rng.integers(1, 3000, size=(40, 1))
+        self.days = 19000 + rng.integers(0, spread, size=(40, 300))
+        self.known = rng.random((40, 300)) < .9
+        self.known[3] = False
+
+    def test_exact_percentiles(self):
+        histogram = _FinishHistogram(40)
+        histogram.add(self.days[:, :120], self.known[:, :120])
+        histogram.add(self.days[:, 120:], self.known[:, 120:])
+        percentiles = (0, 10, 50, 90, 100)
+        result = histogram.percentiles(percentiles)
+        self.assertTrue(np.isnan(result[3]).all())
+        for row in set(range(40)) - {3}:
+            expected = np.percentile(self.days[row][self.known[row]], percentiles, method='inverted_cdf')
+            np.testing.assert_array_equal(result[row], expected)
+
+    def test_bins_are_bounded(self):
+        exact, binned = _FinishHistogram(40), _FinishHistogram(40, max_bins=1000)
+        exact.add(self.days, self.known)
+        binned.add(self.days, self.known)
+        self.assertLessEqual(binned.keys.size, 1000)
+        self.assertGreater(binned.width, 1)
+        # percentiles round up to the end of their bin
+        difference = binned.percentiles((10, 50, 90)) - exact.percentiles((10, 50, 90))
+        self.assertTrue((difference[~np.isnan(difference)] >= 0).all())
+        self.assertTrue((difference[~np.isnan(difference)] < binned.width).all())
+
+    def test_merge_matches_one_histogram(self):
+        whole = _FinishHistogram(40, max_bins=1000)
+        whole.add(self.days, self.known)
+        first, second = _FinishHistogram(40, max_bins=1000), _FinishHistogram(40, max_bins=1000)
+        first.add(self.days[:, :50], self.known[:, :50])
+        second.add(self.days[:, 50:], self.known[:, 50:])
+        first.merge(second)
+        self.assertEqual(first.width, whole.width)
+        np.testing.assert_array_equal(first.keys, whole.keys)
+        np.testing.assert_array_equal(first.counts, whole.counts)
+
+
+class TestScheduleRisk(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        logging.disable(logging.WARNING)
+        cls.engine = scheduled_engine()
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+
+    def test_sampled_distributions(self):
+        for kind in ('triangular', 'pert', 'uniform'):
+            with self.subTest(distribution=kind):
+                table = distributions(self.engine, (kind,))
+                risk = ScheduleRisk(self.engine, table, seed=1)
+                duration = risk.sample(4000)
+                nodes = risk.nodes
+                low, high = np.floor_divide(risk.low, 24), np.floor_divide(risk.high, 24)
+                self.assertTrue((duration[nodes] >= low[:, None]).all())
+                self.assertTrue((duration[nodes] <= high[:, None]).all())
+                # activities without a distribution keep their duration
+                others = np.setdiff1d(np.arange(self.engine.node_count), nodes)
+                np.testing.assert_array_equal(duration[others], np.repeat(self.engine.duration[others, None], 4000, 1))
+                hours = risk.sample(4000, np.random.default_rng(2))[nodes].mean(axis=1) * 24
+                mean = {'triangular': (risk.low + risk.mode + risk.high) / 3,
+                        'pert': (risk.low + 4 * risk.mode + risk.high) / 6,
+                        'uniform': (risk.low + risk.high) / 2}[kind]
+                # whole days round the hours down by half a day on average
+                np.testing.assert_allclose(hours + 12, mean, rtol=.1, atol=12)
+
+    def test_one_iteration_matches_engine(self):
+        risk = ScheduleRisk(self.engine, pd.DataFrame(columns=DISTRIBUTION_COLUMNS))
+        duration = risk.sample(1)
+        es, ef = risk.forward_pass(duration)
+        project_end = np.array([ef[ef != NAT].max()])
+        ls, lf = risk.backward_pass(duration, project_end)
+        tf = risk.total_float(es, ls)
+        # LOE activities are left out of the risk passes
+        nodes = ~self.engine.is_loe
+        for name, values in (('early_start', es), ('early_finish', ef), ('late_start', ls), ('late_finish', lf)):
+            with self.subTest(result=name):
+                np.testing.assert_array_equal(values[nodes, 0], getattr(self.engine, name)[nodes])
+        np.testing.assert_array_equal(tf[nodes, 0], self.engine.total_float[nodes])
+        result = risk.run(1, percentiles=(50,), workers=1)
+        self.assertEqual(result.project_finish[0], np.datetime64(self.engine.project_end, 'm'))
+
+    def test_run_does_not_depend_on_workers(self):
+        table = distributions(self.engine)
+        results = [ScheduleRisk(self.engine, table, seed=3).run(60, batch_size=10, workers=workers)
+                   for workers in (1, 2, 3)]
+        for result in results[1:]:
+            np.testing.assert_array_equal(result.project_finish, results[0].project_finish)
+            pd.testing.assert_frame_equal(result.activities, results[0].activities)
+
+
+if __name__ == "__main__":
+    unittest.main()
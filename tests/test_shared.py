@@ -0,0 +1,130 @@
+"""
+Unittests for sharing the tables of an Xer through shared memory.
+"""
+
+import os
+import pickle
+import sys
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from tests.generated_xer import generated_xer
+from xerparser import Xer
+from xerparser.src.shared import attach_tables, open_shared, share_tables
+
+SHORTCUTS = ("PROJECT", "TASK", "TASKPRED", "PROJWBS", "CALENDAR", "ACCOUNT")
+
+
+def mixed_frame() -> pd.DataFrame:
+    """Every kind of column, under an index that is not a plain range."""
+    return pd.DataFrame({
+        "text": ["Gründung", None, "Décapage ✓", "", "Gründung"],
+        "number": [1.5, np.nan, 3.0, 4.0, 5.0],
+        "count": np.arange(5, dtype=np.int32),
+        "date": pd.to_datetime(["2024-01-01 00:00", None, "2024-03-01 08:00", "2024-04-01 00:00", "2024-05-01 00:00"]),
+        "status": pd.Categorical(["TK_Active", "TK_Complete", None, "TK_Active", "TK_NotStart"],
+                                 categories=["TK_NotStart", "TK_Active", "TK_Complete"], ordered=True),
+        "size": pd.Categorical([3, 1, 2, 3, 1]),
+    }, index=pd.Index([10, 30, 20, 50, 40], name="row"))
+
+
+def task_summary(handle) -> tuple:
+    """Run in a worker: a few values read from an attached Xer."""
+    xer = Xer.attach(handle)
+    tasks = xer.task_df
+    return (len(tasks), tasks["task_code"].tolist(), tasks.index.tolist(),
+            float(pd.to_numeric(tasks["target_drtn_hr_cnt"]).sum()), sorted(xer.tables))
+
+
+class TestShareTables(unittest.TestCase):
+    def setUp(self):
+        self.shm = None
+
+    def tearDown(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+
+    def round_trip(self, tables):
+        self.shm, handle = share_tables(tables)
+        return attach_tables(open_shared(handle.shm_name), handle), handle
+
+    def test_round_trip_keeps_dtypes_and_index(self):
+        df = mixed_frame()
+        attached, _ = self.round_trip({"MIXED": df, "EMPTY": pd.DataFrame()})
+        pd.testing.assert_frame_equal(attached["MIXED"], df)
+        self.assertTrue(attached["MIXED"]["status"].cat.ordered)
+        pd.testing.assert_frame_equal(attached["EMPTY"], pd.DataFrame(), check_column_type=False)
+
+    def test_strings_are_not_pickled_with_the_handle(self):
+        words = [f"activity name {k}" for k in range(2000)]
+        _, handle = self.round_trip({"TASK": pd.DataFrame({"task_name": words})})
+        column = handle.tables["TASK"].columns[0]
+        self.assertIsNone(column.categories)
+        self.assertEqual(column.strings.count, len(words))
+        self.assertLess(len(pickle.dumps(handle)), 2000)
+
+    def test_tables_are_decoded_when_read(self):
+        attached, _ = self.round_trip({"A": mixed_frame(), "B": mixed_frame()})
+        self.assertEqual(list(attached), ["A", "B"])
+        self.assertEqual(attached.decoded(), [])
+        attached["B"]
+        self.assertEqual(attached.decoded(), ["B"])
+        attached["C"] = pd.DataFrame()
+        del attached["A"]
+        self.assertEqual(list(attached), ["B", "C"])
+        with self.assertRaises(KeyError):
+            attached["A"]
+
+    def test_text_is_writable_and_numbers_are_read_only(self):
+        attached, _ = self.round_trip({"MIXED": mixed_frame()})
+        df = attached["MIXED"]
+        df.loc[10, "text"] = "edited"
+        self.assertEqual(df.loc[10, "text"], "edited")
+        self.assertFalse(df["count"].to_numpy().flags.writeable)
+
+
+class TestXerShare(unittest.TestCase):
+    def setUp(self):
+        self.xer = Xer(generated_xer(300, 0))
+        self.xer.task_df.index = self.xer.task_df.index + 100
+        self.handle = self.xer.share()
+
+    def tearDown(self):
+        self.xer.release_shared()
+
+    def test_attach_matches_the_original(self):
+        attached = Xer.attach(self.handle)
+        self.assertEqual(attached.tables.decoded(), [name for name in attached.tables if name in SHORTCUTS])
+        for name, df in self.xer.tables.items():
+            with self.subTest(table=name):
+                pd.testing.assert_frame_equal(attached.tables[name], df, check_column_type=not df.columns.empty)
+        pd.testing.assert_frame_equal(attached.task_df, self.xer.task_df)
+        pd.testing.assert_frame_equal(attached.workday_df, self.xer.workday_df)
+
+    def test_pooled_worker_reads_the_shared_tables(self):
+        expected = task_summary(self.handle)
+        with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as pool:
+            self.assertEqual(pool.submit(task_summary, self.handle).result(), expected)
+        self.assertEqual(expected[2][0], 100)
+
+    def test_release_unlinks_the_block(self):
+        attached = Xer.attach(self.handle)
+        attached.release_shared()
+        # an attached copy does not own the block
+        open_shared(self.handle.shm_name).close()
+        self.xer.release_shared()
+        self.assertIsNone(self.xer._shared_memory)
+        with self.assertRaises(FileNotFoundError):
+            open_shared(self.handle.shm_name)
+        self.xer.release_shared()
+
+
+if __name__ == "__main__":
+    unittest.main()
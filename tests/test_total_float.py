@@ -0,0 +1,235 @@
+"""
+Unittests for the critical path calculation of TotalFloatCPMCalculator.
+
+The array engine behind `calculate_critical_path` must give the same dates and
+floats as the reference `forward_pass`, `backward_pass` and
+`calculate_total_float` over the networkx graph.
+"""
+
+import logging
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from local.libs.cpm_engine import NAT
+from local.libs.total_float_method import TotalFloatCPMCalculator
+from tests.generated_xer import generated_xer
+from xerparser import Xer
+
+RESULTS = ("early_start", "early_finish", "late_start", "late_finish", "total_float")
+
+
+def calculator(xer: Xer) -> TotalFloatCPMCalculator:
+    calc = TotalFloatCPMCalculator(xer)
+    calc.set_workdays_df(xer.workday_df)
+    calc.set_exceptions_df(xer.exception_df)
+    return calc
+
+
+def reference(xer: Xer, engine_calc: TotalFloatCPMCalculator) -> TotalFloatCPMCalculator:
+    """Schedule with the networkx passes, on the calendars of an engine run."""
+    calc = calculator(xer)
+    calc.working_day_calculator = engine_calc.working_day_calculator
+    calc.build_graph()
+    cycles = calc.detect_cycles()
+    if cycles:
+        calc.break_cycles(cycles)
+    calc.forward_pass()
+    calc.backward_pass()
+    calc.calculate_total_float()
+    return calc
+
+
+class TestEngineMatchesReference(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        logging.disable(logging.WARNING)
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+
+    def assert_same_schedule(self, engine_calc, reference_calc):
+        for name in RESULTS:
+            expected, actual = getattr(reference_calc, name), getattr(engine_calc, name)
+            self.assertEqual(set(expected), set(actual), name)
+            for task_id, value in expected.items():
+                if pd.isna(value):
+                    self.assertTrue(pd.isna(actual[task_id]), f"{name} of {task_id}")
+                else:
+                    self.assertEqual(value, actual[task_id], f"{name} of {task_id}")
+
+    def test_generated_schedules(self):
+        for seed in range(6):
+            with self.subTest(seed=seed):
+                xer = Xer(generated_xer(300, seed))
+                engine_calc = calculator(xer)
+                engine_calc.calculate_critical_path()
+                self.assert_same_schedule(engine_calc, reference(xer, engine_calc))
+
+    def test_no_graph_without_loops(self):
+        xer = Xer(generated_xer(300, 0))
+        calc = calculator(xer)
+        calc.calculate_critical_path()
+        self.assertIsNone(calc.loop_graph)
+        self.assertIsNone(calc._graph)
+        self.assertEqual(calc.removed_cycle_tasks, [])
+        # the full graph is still there when asked for
+        self.assertEqual(calc.graph.number_of_nodes(), len(xer.task_df))
+        pairs = xer.taskpred_df[['pred_task_id', 'task_id']].drop_duplicates()
+        self.assertEqual(calc.graph.number_of_edges(), len(pairs))
+
+    def test_logic_loops(self):
+        for seed in range(3):
+            with self.subTest(seed=seed):
+                xer = Xer(generated_xer(300, seed, loops=3))
+                engine_calc = calculator(xer)
+                engine_calc.calculate_critical_path()
+                reference_calc = reference(xer, engine_calc)
+                self.assertTrue(engine_calc.removed_cycle_tasks)
+                self.assertEqual(engine_calc.removed_cycle_tasks, reference_calc.removed_cycle_tasks)
+                self.assertLess(engine_calc.loop_graph.number_of_nodes(), len(xer.task_df))
+                self.assertEqual(engine_calc.graph.number_of_nodes(), len(xer.task_df))
+                self.assert_same_schedule(engine_calc, reference_calc)
+
+    def test_update_task_df(self):
+        xer = Xer(generated_xer(300, 1, loops=2))
+        calc = calculator(xer)
+        calc.calculate_critical_path()
+        calc.update_task_df()
+        tasks = xer.task_df
+        for name in RESULTS:
+            expected = tasks['task_id'].map(getattr(calc, name))
+            if name == 'total_float':
+                expected = expected.fillna(np.inf)
+            with self.subTest(result=name):
+                self.assertTrue(((tasks[name] == expected) | (tasks[name].isna() & expected.isna())).all())
+        for _, task in tasks.iterrows():
+            start = calc.calculate_forecast_start(task)
+            self.assertTrue(task['target_start_date'] == start or pd.isna(start) and pd.isna(task['target_start_date']))
+        self.assertEqual(set(tasks.loc[tasks['is_critical'], 'task_id']), set(calc.critical_path))
+
+    def test_critical_path(self):
+        xer = Xer(generated_xer(300, 1))
+        calc = calculator(xer)
+        critical_path = calc.calculate_critical_path()
+        self.assertEqual(critical_path, calc.engine.critical_path())
+        self.assertTrue(critical_path)
+        self.assertTrue(all(calc.total_float[task_id] <= 0 for task_id in critical_path))
+
+
+class TestDrivingPaths(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        logging.disable(logging.WARNING)
+        # seed 2 drives the project finish through WBS summaries
+        cls.calc = calculator(Xer(generated_xer(300, 2)))
+        cls.calc.calculate_critical_path()
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+
+    def test_driving_path(self):
+        calc, engine = self.calc, self.calc.engine
+        self.assertEqual(calc.driving_path, engine.longest_path())
+        nodes = [engine._node(task_id) for task_id in calc.driving_path]
+        self.assertTrue(engine.is_wbs[nodes].any())
+        for pred, succ in zip(nodes[:-1], nodes[1:]):
+            if engine.driving_edge[succ] >= 0 and engine.network.edge_pred[engine.driving_edge[succ]] == pred:
+                continue
+            # a summary driving through its finish hands on to the subtask that finishes last
+            self.assertTrue(engine.is_wbs[succ])
+            self.assertEqual(engine._finishing_subtask(succ), pred)
+        self.assertEqual(engine.early_finish[nodes[-1]], engine.project_end)
+
+    def test_float_paths_pass_wbs_summaries(self):
+        engine = self.calc.engine
+        float_path, float_path_order = engine.float_paths(10)
+        nodes = np.array([engine._node(task_id) for task_id in engine.longest_path()])
+        activities = nodes[~engine.is_wbs[nodes] & ~engine.is_loe[nodes]]
+        first = np.flatnonzero(float_path == 1)
+        np.testing.assert_array_equal(first[np.argsort(float_path_order[first])], activities)
+        self.assertFalse(float_path[engine.is_wbs | engine.is_loe].any())
+        for path in range(1, 11):
+            with self.subTest(path=path):
+                order = np.sort(float_path_order[float_path == path])
+                np.testing.assert_array_equal(order, np.arange(1, order.size + 1))
+
+
+
+class TestSummaryRollup(unittest.TestCase):
+    """LOE and WBS summary dates against a brute force walk over their relationships and WBS subtrees."""
+
+    @classmethod
+    def setUpClass(cls):
+        logging.disable(logging.WARNING)
+        cls.xer = Xer(generated_xer(300, 2))
+        cls.calc = calculator(cls.xer)
+        cls.calc.calculate_critical_path()
+        cls.engine = cls.calc.engine
+
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+
+    def subtasks(self, node):
+        """Activities under the WBS of a summary, walking up parent_wbs_id from each of them."""
+        parents = dict(zip(self.xer.projwbs_df['wbs_id'], self.xer.projwbs_df['parent_wbs_id']))
+        wbs_ids = self.xer.task_df['wbs_id'].tolist()
+        under = []
+        for other, wbs_id in enumerate(wbs_ids):
+            while wbs_id in parents and wbs_id != wbs_ids[node]:
+                wbs_id = parents[wbs_id]
+            if other != node and wbs_id == wbs_ids[node]:
+                under.append(other)
+        return np.array(under, dtype=np.int64)
+
+    def test_loe_dates(self):
+        engine, network = self.engine, self.engine.network
+        others = ~engine.is_loe & (engine.early_finish != NAT)
+        fallbacks = {'early_start': engine.data_date, 'early_finish': engine.early_finish[others].max(),
+                     'late_start': engine.project_end, 'late_finish': engine.project_end}
+        loes = np.flatnonzero(engine.is_loe)
+        self.assertTrue(loes.size)
+        for name, reduce, upstream in (('early_start', min, True), ('early_finish', max, False),
+                                       ('late_start', min, False), ('late_finish', max, True)):
+            dates = getattr(engine, name)
+            for node in loes:
+                neighbours = network.predecessors(node) if upstream else network.successors(node)
+                # a linked LOE activity counts once it is set, when it comes earlier in the table
+                values = [dates[other] for other in neighbours
+                          if dates[other] != NAT and (not engine.is_loe[other] or other < node)]
+                with self.subTest(result=name, node=node):
+                    self.assertEqual(dates[node], reduce(values) if values else fallbacks[name])
+            self.assertTrue(np.isinf(engine.total_float[loes]).all())
+
+    def test_wbs_summaries(self):
+        engine = self.engine
+        summaries = np.flatnonzero(engine.is_wbs)
+        self.assertTrue(summaries.size)
+        for node in summaries:
+            subtasks = self.subtasks(node)
+            np.testing.assert_array_equal(np.sort(engine.subtasks(node)), subtasks)
+            # floats roll up from the subtasks listed before the summary in the table
+            floats = engine.total_float[subtasks[subtasks < node]]
+            floats = floats[~np.isnan(floats)]
+            with self.subTest(node=node, result='total_float'):
+                self.assertEqual(engine.total_float[node], floats.min() if floats.size else 0)
+            if engine.act_start[node] != NAT:
+                # started summaries keep their actual dates
+                continue
+            # finishes from the subtasks scheduled before it
+            before = subtasks[~engine.is_loe[subtasks] & (engine.rank[subtasks] < engine.rank[node])]
+            finishes = engine.early_finish[before][engine.early_finish[before] != NAT]
+            with self.subTest(node=node, result='early_finish'):
+                self.assertEqual(engine.early_finish[node], finishes.max() if finishes.size else engine.early_start[node])
+
+
+if __name__ == "__main__":
+    unittest.main()
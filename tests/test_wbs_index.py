@@ -0,0 +1,106 @@
+"""
+Unittests for the Euler tour index of the PROJWBS tree.
+
+Subtrees of the index are checked against a brute force walk up the
+`parent_wbs_id` links.
+"""
+
+import os
+import random
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from local.libs.wbs_index import WBSIndex
+
+
+def projwbs(parents: dict) -> pd.DataFrame:
+    return pd.DataFrame({"wbs_id": list(parents), "parent_wbs_id": list(parents.values())})
+
+
+def ancestors(parents: dict, wbs_id) -> set:
+    """The WBS element and every element above it, stopping on unknown parents and parent loops."""
+    found = set()
+    while wbs_id in parents and wbs_id not in found:
+        found.add(wbs_id)
+        wbs_id = parents[wbs_id]
+    return found
+
+
+def random_tree(seed: int, size: int = 200) -> dict:
+    rnd = random.Random(seed)
+    ids = [f"w{i}" for i in range(size)]
+    rnd.shuffle(ids)
+    parents = {}
+    for i, wbs_id in enumerate(ids):
+        # a few orphans point at WBS elements that are not in PROJWBS
+        parents[wbs_id] = "missing" if i == 0 or rnd.random() < .03 else ids[rnd.randrange(i)]
+    return dict(rnd.sample(sorted(parents.items()), size))
+
+
+class TestWBSIndex(unittest.TestCase):
+    def assert_subtrees(self, parents: dict, activity_wbs: list):
+        index = WBSIndex(projwbs(parents))
+        order, entries = index.sort_activities(activity_wbs)
+        self.assertTrue((np.diff(entries) >= 0).all())
+        # activities with an unknown WBS are left out
+        self.assertEqual(sorted(order.tolist()), [i for i, wbs_id in enumerate(activity_wbs) if wbs_id in parents])
+        wbs_ids = list(parents) + ["unknown"]
+        slices = index.subtree_slices(entries, wbs_ids)
+        for wbs_id, (first, last) in zip(wbs_ids, slices):
+            with self.subTest(wbs_id=wbs_id):
+                expected = [i for i, activity in enumerate(activity_wbs) if wbs_id in ancestors(parents, activity)]
+                self.assertEqual(sorted(order[first:last].tolist()), expected)
+
+    def test_small_tree(self):
+        parents = {"p": "", "a": "p", "b": "p", "a1": "a", "a2": "a", "b1": "b"}
+        index = WBSIndex(projwbs(parents))
+        np.testing.assert_array_equal(index.entry, [0, 1, 4, 2, 3, 5])
+        np.testing.assert_array_equal(index.exit, [6, 4, 6, 3, 4, 6])
+        self.assert_subtrees(parents, ["a1", "b1", "p", "a2", "a", "b1", "x"])
+
+    def test_random_trees_with_orphans(self):
+        for seed in range(5):
+            parents = random_tree(seed)
+            rnd = random.Random(seed)
+            activities = [rnd.choice(list(parents) + ["gone"]) for _ in range(400)]
+            with self.subTest(seed=seed):
+                self.assert_subtrees(parents, activities)
+
+    def test_deep_tree(self):
+        # deeper than the recursion limit
+        depth = 5000
+        parents = {f"w{i}": f"w{i - 1}" if i else "" for i in range(depth)}
+        index = WBSIndex(projwbs(parents))
+        np.testing.assert_array_equal(index.entry, np.arange(depth))
+        np.testing.assert_array_equal(index.exit, np.full(depth, depth))
+        order, entries = index.sort_activities([f"w{i}" for i in range(depth - 1, -1, -1)])
+        first, last = index.subtree_slices(entries, ["w4990"])[0]
+        self.assertEqual(sorted(order[first:last].tolist()), list(range(10)))
+
+    def test_parent_loops(self):
+        # x and y are each other's parents and z hangs under y
+        parents = {"root": "", "a": "root", "x": "y", "y": "x", "z": "y"}
+        with self.assertLogs("WBSIndex", level="WARNING"):
+            index = WBSIndex(projwbs(parents))
+        self.assertTrue((index.entry >= 0).all())
+        self.assertEqual(sorted(index.entry.tolist()), list(range(len(parents))))
+        order, entries = index.sort_activities(["z", "a", "y"])
+        first, last = index.subtree_slices(entries, ["root"])[0]
+        self.assertEqual(order[first:last].tolist(), [1])
+        first, last = index.subtree_slices(entries, ["z"])[0]
+        self.assertEqual(order[first:last].tolist(), [0])
+
+    def test_without_projwbs(self):
+        index = WBSIndex(None)
+        order, entries = index.sort_activities(["a", "b"])
+        self.assertEqual(order.size, 0)
+        np.testing.assert_array_equal(index.subtree_slices(entries, ["a"]), [[0, 0]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,30 @@
 __version__ = "0.12.0"
 
+# Public names are imported on first access (PEP 562) so that `import xerparser`
+# does not pull in pandas, numpy or the calendar engine.
+_LAZY_ATTRIBUTES = {
+    "CODEC": "xerparser.src.parser",
+    "file_reader": "xerparser.src.parser",
+    "parser": "xerparser.src.parser",
+    "Xer": "xerparser.src.xer",
+    "XerHeader": "xerparser.src.scan",
+    "scan_header": "xerparser.src.scan",
+    "scan_many": "xerparser.src.scan",
+}
 
-from xerparser.src.parser import file_reader, parser, CODEC # noqa: F401
-from xerparser.src.xer import Xer  # noqa: F401
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module 'xerparser' has no attribute '{name}'")
+    from importlib import import_module
+
+    value = getattr(import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(list(globals()) + __all__)
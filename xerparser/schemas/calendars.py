@@ -1,11 +1,13 @@
 # calendars.py
+import logging
 import pandas as pd
 import re
 from dataclasses import dataclass, field
-from datetime import datetime, time, timedelta
+from datetime import date, datetime, time, timedelta
 from enum import Enum
-from functools import cached_property
-from typing import Iterator, Optional
+from functools import cached_property, lru_cache
+from types import MappingProxyType
+from typing import Iterator, Mapping, Optional
 
 from xerparser.scripts.dates import (
     calc_time_var_hrs,
@@ -29,13 +31,16 @@ WEEKDAYS = (
 class ClndrRegEx(Enum):
     """Regular Expressions used to parse the Calendar Data"""
 
-    weekdays = re.compile(
-        r"(?<=0\|\|)[1-7]\(\).+?(?=\(0\|\|[1-7]\(\)|\(0\|\|VIEW|\(0\|\|Exceptions|\)$)"
+    # tokens of a DaysOfWeek or Exceptions section, read in order: a weekday
+    # number, an exception date, or a shift belonging to the last day / date read
+    tokens = re.compile(
+        r"\(0\|\|(?P<day>[1-7])\(\)"
+        r"|\(d\|(?P<date>\d+)\)"
+        r"|(?P<k1>[sf])\|(?P<t1>[0-2]?\d:[0-5]\d)\|(?P<k2>[sf])\|(?P<t2>[0-2]?\d:[0-5]\d)"
     )
-    shifts = re.compile(r"[sf]\|[0-2]?\d:[0-5]\d\|[sf]\|[0-2]?\d:[0-5]\d")
-    shift_hours = re.compile(r"[0-2]?\d:[0-5]\d")
-    holidays = re.compile(r"(?<=d\|)\d{5}(?=\)\(\))")
-    exceptions = re.compile(r"(?<=d\|)\d{5}\)\([^\)]{1}.+?\(\)\)\)")
+
+
+_EXCEL_EPOCH = date(1899, 12, 30)
 
 
 @dataclass(frozen=True)
@@ -88,6 +93,154 @@ class WeekDay:
         return self.hours != 0
 
 
+@dataclass(frozen=True, eq=False)
+class ClndrData:
+    """
+    Parsed clndr_data field of a CALENDAR row.
+
+    Instances are shared through the caches of `parse_clndr_data` and
+    `resolve_clndr_data`, so both mappings are read-only views.
+
+    Attributes
+    ----------
+    work_week: Mapping[int, tuple]
+        Shifts of each weekday defined by the calendar, keyed by the P6 day
+        number (1 = Sunday ... 7 = Saturday). Non-work days have no shifts.
+    exceptions: Mapping[date, tuple]
+        Shifts of each exception date. Holidays have no shifts.
+    """
+
+    work_week: Mapping[int, tuple[tuple[time, time], ...]]
+    exceptions: Mapping[date, tuple[tuple[time, time], ...]]
+
+    def __post_init__(self):
+        object.__setattr__(self, "work_week", MappingProxyType(dict(self.work_week)))
+        object.__setattr__(self, "exceptions", MappingProxyType(dict(self.exceptions)))
+
+    def __reduce__(self):
+        # mapping proxies cannot be pickled
+        return ClndrData, (dict(self.work_week), dict(self.exceptions))
+
+
+@lru_cache(maxsize=1024)
+def parse_clndr_data(clndr_data: str) -> ClndrData:
+    """
+    Parse a clndr_data string into its work week and exceptions.
+
+    The result is cached per unique string, so calendars sharing the same
+    data (and the CALENDAR objects and calendar frames built from one xer)
+    are parsed once.
+
+    Args:
+        clndr_data (str): value of the CALENDAR clndr_data column
+
+    Returns:
+        ClndrData: work week and exceptions
+    """
+    exceptions_at = clndr_data.find("Exceptions")
+    week_data = clndr_data if exceptions_at < 0 else clndr_data[:exceptions_at]
+    exception_data = "" if exceptions_at < 0 else clndr_data[exceptions_at:]
+
+    work_week: dict[int, list[tuple[time, time]]] = {}
+    current: Optional[list] = None
+    for token in ClndrRegEx.tokens.value.finditer(week_data):
+        if token["day"]:
+            current = work_week.setdefault(int(token["day"]), [])
+        elif token["k1"] and current is not None:
+            current.append(_token_shift(token))
+
+    exceptions: dict[date, list[tuple[time, time]]] = {}
+    current = None
+    for token in ClndrRegEx.tokens.value.finditer(exception_data):
+        if token["date"]:
+            _date = _EXCEL_EPOCH + timedelta(days=int(token["date"]))
+            current = exceptions.setdefault(_date, [])
+        elif token["k1"] and current is not None:
+            current.append(_token_shift(token))
+
+    return ClndrData(
+        work_week={day: tuple(sorted(shifts)) for day, shifts in work_week.items()},
+        exceptions={_date: tuple(sorted(shifts)) for _date, shifts in exceptions.items()},
+    )
+
+
+@lru_cache(maxsize=1024)
+def resolve_clndr_data(chain: tuple[str, ...]) -> ClndrData:
+    """
+    Parse a calendar and apply its base calendars.
+
+    A calendar without a work week of its own uses the work week of its base.
+    Exceptions of the base apply first and the calendar's own exceptions
+    replace them on the same date. Results are cached per chain, so a base
+    shared by many calendars is resolved once.
+
+    Args:
+        chain (tuple[str, ...]): clndr_data of the calendar followed by the
+            clndr_data of its base, the base of its base, and so on
+
+    Returns:
+        ClndrData: work week and exceptions with inheritance applied
+    """
+    calendar = parse_clndr_data(chain[0])
+    if len(chain) == 1:
+        return calendar
+    base = resolve_clndr_data(chain[1:])
+    return ClndrData(
+        work_week=calendar.work_week or base.work_week,
+        exceptions={**base.exceptions, **calendar.exceptions},
+    )
+
+
+def base_chains(calendar_df: pd.DataFrame) -> dict[str, tuple[str, ...]]:
+    """
+    clndr_data of every calendar followed by the clndr_data of its base
+    calendars, as taken by `resolve_clndr_data`.
+
+    Missing bases and base loops are logged and end the chain.
+
+    Args:
+        calendar_df (pd.DataFrame): CALENDAR table with clndr_id, clndr_data
+            and optionally base_clndr_id
+
+    Returns:
+        dict[str, tuple[str, ...]]: chain per clndr_id
+    """
+    data: dict[str, str] = {}
+    bases: dict[str, str] = {}
+    base_ids = calendar_df['base_clndr_id'] if 'base_clndr_id' in calendar_df.columns else [None] * len(calendar_df)
+    for clndr_id, clndr_data, base_id in zip(calendar_df['clndr_id'], calendar_df['clndr_data'], base_ids):
+        if not isinstance(clndr_data, str):
+            continue
+        data[str(clndr_id)] = clndr_data
+        if isinstance(base_id, str) and base_id.strip():
+            bases[str(clndr_id)] = base_id.strip()
+
+    chains: dict[str, tuple[str, ...]] = {}
+    for clndr_id in data:
+        chain, seen, current = [], set(), clndr_id
+        while current is not None:
+            if current in chains:
+                chain.extend(chains[current])
+                break
+            if current in seen:
+                logging.warning(f"Base calendar loop at calendar {current}")
+                break
+            seen.add(current)
+            chain.append(data[current])
+            base_id = bases.get(current)
+            if base_id is not None and base_id not in data:
+                logging.warning(f"Base calendar {base_id} of calendar {current} not found")
+                base_id = None
+            current = base_id
+        chains[clndr_id] = tuple(chain)
+    return chains
+
+
+def _token_shift(token: re.Match) -> tuple[time, time]:
+    times = {token["k1"]: conv_time(token["t1"]), token["k2"]: conv_time(token["t2"])}
+    return times.get("s", time(0, 0)), times.get("f", time(0, 0))
+
+
 class CALENDAR:
     """
     A class to represent a schedule Calendar.
@@ -98,10 +251,12 @@ class CALENDAR:
         CA_Rsrc = "Resource"
         CA_Project = "Project"
 
-    def __init__(self, row: pd.Series) -> None:
+    def __init__(self, row: pd.Series, bases: tuple[str, ...] = ()) -> None:
         self.uid: str = row['clndr_id']
         self.base_clndr_id: Optional[str] = optional_str(row['base_clndr_id'])
         self.data: str = row['clndr_data']
+        # clndr_data of the base calendar, its own base, and so on; see base_chains
+        self.bases: tuple[str, ...] = tuple(bases)
         self.is_default: bool = row['default_flag'] == 'Y'
         self.last_chng_date: Optional[datetime] = optional_date(row['last_chng_date'])
         self.name: str = row['clndr_name']
@@ -149,12 +304,32 @@ class CALENDAR:
             microsecond=0, second=0, minute=0, hour=0
         )
 
+    @cached_property
+    def clndr_data(self) -> ClndrData:
+        """
+        Parsed Calendar data field with the base calendars applied (shared by
+        all calendars with the same data and bases).
+        """
+        return resolve_clndr_data((self.data, *self.bases))
+
+    @cached_property
+    def compiled(self):
+        """
+        Compiled working-day bitmap and working-minute timeline of this
+        calendar and its base calendars, for fast date arithmetic.
+        """
+        from local.libs.compiled_calendar import calendar_cache
+
+        return calendar_cache.get(self.data, self.uid, bases=self.bases)
+
     @cached_property
     def holidays(self) -> list[datetime]:
         """Parse non-workday exceptions from Calendar data field."""
         nonwork_days = []
-        for e in _parse_clndr_data(self.data, ClndrRegEx.holidays.value):
-            _date = self.conv_excel_date(int(e))
+        for _date, shifts in self.clndr_data.exceptions.items():
+            if shifts:
+                continue
+            _date = datetime.combine(_date, time(0, 0))
 
             # Verify exception is not already a non-work day on the standard calendar
             if self.work_week.get(f"{_date:%A}"):
@@ -162,6 +337,10 @@ class CALENDAR:
 
         return nonwork_days
 
+    @cached_property
+    def _holiday_set(self) -> frozenset[datetime]:
+        return frozenset(self.holidays)
+
     def is_workday(self, date_to_check: datetime) -> bool:
         """Checks if a date is a workday in a Calendar object"""
 
@@ -170,11 +349,11 @@ class CALENDAR:
 
         # _date = date_to_check.date
         _date = clean_date(date_to_check)
-        if _date in self.holidays:
+        if _date in self._holiday_set:
             return False
-        if _date in self.work_exceptions.keys():
+        if _date in self.work_exceptions:
             return True
-        return bool(self.work_week[f"{date_to_check:%A}"])
+        return bool(self.work_week.get(f"{date_to_check:%A}"))
 
     def iter_holidays(self, start: datetime, end: datetime) -> Iterator[datetime]:
         """Yields nonwork exceptions (i.e. holidays) between 2 dates."""
@@ -186,7 +365,7 @@ class CALENDAR:
 
         check_date = min(cl_dates)
         while check_date <= max(cl_dates):
-            if self.holidays and check_date in self.holidays:
+            if check_date in self._holiday_set:
                 yield check_date
             check_date += timedelta(days=1)
 
@@ -209,9 +388,11 @@ class CALENDAR:
     def work_exceptions(self) -> dict[datetime, WeekDay]:
         """Parse work-day exceptions from Calendar data field."""
         exception_dict = {}
-        for exception in _parse_clndr_data(self.data, ClndrRegEx.exceptions.value):
-            _date = self.conv_excel_date(int(exception[:5]))
-            _day = _parse_work_day(exception)
+        for _date, shifts in self.clndr_data.exceptions.items():
+            if not shifts:
+                continue
+            _date = datetime.combine(_date, time(0, 0))
+            _day = WeekDay(f"{_date:%A}", list(shifts))
 
             # Verify exception object is different than standard weekday object
             if _day != self.work_week.get(_day.week_day):
@@ -223,8 +404,8 @@ class CALENDAR:
     def work_week(self) -> dict[str, WeekDay]:
         """Parse work week from Calendar data field."""
         return {
-            WEEKDAYS[int(day[0]) - 1]: _parse_work_day(day)
-            for day in _parse_clndr_data(self.data, ClndrRegEx.weekdays.value)
+            WEEKDAYS[day - 1]: WeekDay(WEEKDAYS[day - 1], list(shifts))
+            for day, shifts in self.clndr_data.work_week.items()
         }
 
     def _calc_work_hours(
@@ -286,30 +467,8 @@ class CALENDAR:
 
 def _process_calendar_data(calendar_df: pd.DataFrame) -> dict[str, CALENDAR]:
     calendar_dict = {}
+    chains = base_chains(calendar_df)
     for _, row in calendar_df.iterrows():
-        calendar = CALENDAR(row)
+        calendar = CALENDAR(row, chains.get(str(row['clndr_id']), ())[1:])
         calendar_dict[calendar.uid] = calendar
     return calendar_dict
-
-def _parse_clndr_data(clndr_data: str, reg_ex) -> list:
-    """
-    Searches Calendar data property and returns strings
-    matching reg_ex argument.
-    """
-    return re.findall(reg_ex, clndr_data)
-
-
-def _parse_work_day(day: str) -> WeekDay:
-    """
-    Parse WeekDay objects from string representing a work day.
-    """
-    weekday = WEEKDAYS[int(day[0]) - 1]
-    shift_hours = sorted(
-        [conv_time(hr) for hr in re.findall(ClndrRegEx.shift_hours.value, day)]
-    )
-
-    shift_hours_tuple: list[tuple[time, time]] = []
-    for hr in range(0, len(shift_hours), 2):
-        shift_hours_tuple.append((shift_hours[hr], shift_hours[hr + 1]))
-
-    return WeekDay(weekday, shift_hours_tuple)
@@ -261,9 +261,34 @@ class TASK:
             return 0
         return int(self.task_dict[self.task_df.iloc[0]["task_id"]]["remain_drtn_hr_cnt"] / 8)
 
-    def rem_hours_per_day(self, late_dates=False) -> dict[datetime, float]:
-        # This method is not implemented since the relationships are removed
-        return {}
+    def rem_hours_per_day(self, late_dates=False, calendars=None) -> dict[datetime, float]:
+        """
+        Remaining hours of the task per day, spread over the working time of
+        its calendar. See `local.libs.remaining_hours.remaining_hours_per_day`.
+
+        Args:
+            late_dates (bool, optional): use the remaining late dates. Defaults to False.
+            calendars (CalendarSet): compiled calendars, e.g.
+                `WorkingDayCalculator.calendars`. Must hold the task's calendar.
+
+        Raises:
+            ValueError: no calendars are given, or they lack the task's calendar
+
+        Returns:
+            dict[datetime, float]: remaining hours by day
+        """
+        from local.libs.remaining_hours import remaining_hours_per_day
+
+        clndr_id = self.task_df.iloc[0]["clndr_id"]
+        if calendars is None:
+            raise ValueError(f"Calendars are needed to spread the remaining hours of task {self.task_df.iloc[0]['task_id']}")
+        if clndr_id not in calendars:
+            raise ValueError(f"Calendar {clndr_id} of task {self.task_df.iloc[0]['task_id']} is not in the given calendars")
+        per_day = remaining_hours_per_day(self.task_df.iloc[:1], calendars, late_dates)
+        return {
+            day.to_pydatetime(): float(hours)
+            for day, hours in zip(pd.to_datetime(per_day['date']), per_day['hours'])
+        }
 
     @property
     def start(self) -> datetime:
@@ -1,11 +1,17 @@
-from .parser import Parser
-from .xer_writer import XerWriter
-from .validators import SchemaValidator
-from .errors import XERMergeError, XERReportError
-from .xer_merger import XerMerger
-from .merger_utils import detect_conflicts, resolve_conflicts
-from .conflict_report import ConflictReport
-from .table_data import TableData
+# Submodules are imported on first access (PEP 562) so that importing one
+# module of this package does not import (and fail on) all of the others.
+_LAZY_ATTRIBUTES = {
+    'Parser': '.parser',
+    'XerWriter': '.xer_writer',
+    'SchemaValidator': '.validators',
+    'XERMergeError': '.errors',
+    'XERReportError': '.errors',
+    'XerMerger': '.xer_merger',
+    'detect_conflicts': '.merger_utils',
+    'resolve_conflicts': '.merger_utils',
+    'ConflictReport': '.conflict_report',
+    'TableData': '.table_data',
+}
 
 __all__ = [
     'Parser',
@@ -21,3 +27,14 @@ __all__ = [
 ]
 
 __version__ = '1.0.0'
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    from importlib import import_module
+
+    value = getattr(import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,43 @@
+# xerparser
+# _lazy.py
+
+import importlib.util
+import sys
+import threading
+from types import ModuleType
+
+_IMPORT_LOCK = threading.Lock()  # makes the sys.modules lookup and registration atomic
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Return a module that is only executed on first attribute access.
+
+    Heavy dependencies (pandas, numpy, networkx, ...) are bound at module level
+    with this function so that importing xerparser stays fast; the real import
+    happens the first time a feature that needs the dependency is used.
+
+    Binding is safe from any thread, but `importlib.util.LazyLoader` itself
+    is not thread-safe before Python 3.12: if two
+    threads touch a module that has not been loaded yet, both may run it or one
+    may see it half initialised. Code that uses these modules from worker
+    threads should access them once (e.g. `np.ndarray`) before starting the threads.
+
+    Args:
+        name (str): absolute module name
+
+    Returns:
+        ModuleType: the (possibly not yet executed) module
+    """
+    with _IMPORT_LOCK:
+        if name in sys.modules:
+            return sys.modules[name]
+        spec = importlib.util.find_spec(name)
+        if spec is None or spec.loader is None:
+            raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+        loader = importlib.util.LazyLoader(spec.loader)
+        spec.loader = loader
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        loader.exec_module(module)
+        return module
@@ -0,0 +1,185 @@
+# xerparser
+# memory.py
+# Memory footprint report for a loaded Xer.
+from __future__ import annotations
+
+import dataclasses
+import sys
+from typing import Any
+
+from xerparser.src._lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+REPORT_COLUMNS = [
+    "table", "column", "dtype", "rows", "bytes", "suggested_dtype", "estimated_bytes", "savings",
+]
+
+_SAMPLE_SIZE = 2_000
+_CATEGORY_RATIO = 0.5  # suggest a categorical when unique values / rows is below this ratio
+
+
+def _is_text(dtype) -> bool:
+    return dtype == object or pd.api.types.is_string_dtype(dtype)
+
+
+def _series_nbytes(series: pd.Series, exact: bool) -> int:
+    """
+    Deep bytes used by a Series. Unless `exact`, the size of the Python objects
+    in large text columns is extrapolated from an evenly spaced sample.
+    """
+    if exact or len(series) <= _SAMPLE_SIZE or not _is_text(series.dtype):
+        return int(series.memory_usage(index=False, deep=True))
+    sample = series.iloc[::len(series) // _SAMPLE_SIZE]
+    return int(sample.memory_usage(index=False, deep=True) / len(sample) * len(series))
+
+
+def _array_nbytes(arr: np.ndarray, exact: bool) -> int:
+    """Bytes used by an array, including the objects referenced by an object array."""
+    if arr.dtype != object or not arr.size:
+        return arr.nbytes
+    if exact or arr.size <= _SAMPLE_SIZE:
+        return arr.nbytes + sum(sys.getsizeof(v) for v in arr)
+    sample = arr[::arr.size // _SAMPLE_SIZE]
+    return arr.nbytes + int(sum(sys.getsizeof(v) for v in sample) / sample.size * arr.size)
+
+
+def _object_nbytes(obj: Any, exact: bool, seen: set) -> int:
+    """
+    Bytes used by a cached object made of arrays and frames. Frames, series
+    and arrays whose id is in `seen` were counted before and add nothing;
+    the ids of the ones counted here are added to it.
+    """
+    if isinstance(obj, (pd.DataFrame, pd.Series, np.ndarray)):
+        if id(obj) in seen:
+            return 0
+        seen.add(id(obj))
+    if isinstance(obj, pd.DataFrame):
+        return sum(_series_nbytes(obj[col], exact) for col in obj.columns) + int(obj.index.memory_usage())
+    if isinstance(obj, pd.Series):
+        return _series_nbytes(obj, exact) + int(obj.index.memory_usage())
+    if isinstance(obj, np.ndarray):
+        return _array_nbytes(obj, exact)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(_object_nbytes(v, exact, seen) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(_object_nbytes(v, exact, seen) for v in obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return sys.getsizeof(obj) + sum(
+            _object_nbytes(getattr(obj, f.name), exact, seen) for f in dataclasses.fields(obj)
+        )
+    if hasattr(obj, "nbytes"):
+        return int(obj.nbytes)
+    return sys.getsizeof(obj)
+
+
+def _references_frames(obj: Any, frame_ids: set) -> bool:
+    """Whether a tuple, list or dict holds one of the frames in `frame_ids`, e.g. a cache key."""
+    if isinstance(obj, dict):
+        obj = list(obj.values())
+    return isinstance(obj, (list, tuple)) and any(
+        id(v) in frame_ids or _references_frames(v, frame_ids) for v in obj)
+
+
+def _suggest_encoding(series: pd.Series, current_bytes: int) -> tuple[str | None, int | None]:
+    """
+    Suggest a smaller dtype for an object column from a sample of its values.
+
+    Columns whose non-empty values all parse as numbers or dates can be stored
+    as float64 / datetime64; low cardinality columns as category. The smallest
+    candidate that is smaller than the current column is returned.
+    """
+    if not _is_text(series.dtype) or series.empty:
+        return None, None
+    n_rows = len(series)
+    sample = series.iloc[::n_rows // _SAMPLE_SIZE] if n_rows > _SAMPLE_SIZE else series
+    values = sample[sample.notna() & (sample.astype(str) != "")]
+    candidates = []
+
+    if not values.empty:
+        if pd.to_numeric(values, errors="coerce").notna().all():
+            candidates.append(("float64", n_rows * 8))
+        elif values.astype(str).str.match(r"^\d{4}-\d{2}-\d{2}").all() \
+                and pd.to_datetime(values, errors="coerce", format="ISO8601").notna().all():
+            candidates.append(("datetime64[ns]", n_rows * 8))
+
+    unique_ratio = sample.nunique(dropna=False) / len(sample)
+    if unique_ratio < _CATEGORY_RATIO:
+        n_categories = max(1, int(unique_ratio * n_rows))
+        per_value = current_bytes / n_rows
+        code_bytes = 1 if n_categories < 127 else 2 if n_categories < 32_767 else 4
+        candidates.append(("category", int(n_rows * code_bytes + n_categories * per_value)))
+
+    candidates = [c for c in candidates if c[1] < current_bytes]
+    if not candidates:
+        return None, None
+    return min(candidates, key=lambda c: c[1])
+
+
+def memory_report(xer: Any, suggest: bool = False, exact: bool = False) -> pd.DataFrame:
+    """
+    Deep memory usage per table and per column of an Xer object.
+
+    Tables from `xer.tables` are reported per column. Derived calendar frames,
+    cached indexes and shared memory blocks are reported as one row each, with
+    the attribute name as the table name and an empty column name. Every
+    frame and array is counted once; cache keys that only reference tables
+    (e.g. the source of the cached `network`) are left out.
+
+    Args:
+        xer (Xer): loaded Xer object
+        suggest (bool): estimate the savings of categorical or typed encodings
+            from a sample of each text column; off by default as it parses the samples
+        exact (bool): measure every Python object of large text columns instead
+            of extrapolating from a sample
+
+    Returns:
+        pd.DataFrame: one row per column or cached object, largest first
+    """
+    rows = []
+    table_ids = set()
+    for table_name, df in xer.tables.items():
+        if not isinstance(df, pd.DataFrame):
+            continue
+        table_ids.add(id(df))
+        for col in df.columns:
+            col_bytes = _series_nbytes(df[col], exact)
+            suggested, estimated = _suggest_encoding(df[col], col_bytes) if suggest else (None, None)
+            rows.append({
+                "table": table_name,
+                "column": col,
+                "dtype": str(df[col].dtype),
+                "rows": len(df),
+                "bytes": col_bytes,
+                "suggested_dtype": suggested,
+                "estimated_bytes": estimated,
+                "savings": col_bytes - estimated if estimated is not None else 0,
+            })
+
+    seen = set(table_ids)
+    for name, value in vars(xer).items():
+        if name == "tables" or id(value) in seen or value is None:
+            continue
+        if _references_frames(value, seen):
+            continue
+        if name == "_shared_memory":
+            rows.append({"table": name, "column": "", "dtype": "shared_memory", "rows": None,
+                         "bytes": int(value.size), "suggested_dtype": None, "estimated_bytes": None, "savings": 0})
+            continue
+        if not isinstance(value, (pd.DataFrame, pd.Series, np.ndarray, dict, list, tuple)) \
+                and not dataclasses.is_dataclass(value):
+            continue
+        rows.append({
+            "table": name,
+            "column": "",
+            "dtype": type(value).__name__,
+            "rows": len(value) if isinstance(value, (pd.DataFrame, pd.Series, np.ndarray)) else None,
+            "bytes": _object_nbytes(value, exact, seen),
+            "suggested_dtype": None,
+            "estimated_bytes": None,
+            "savings": 0,
+        })
+
+    report = pd.DataFrame(rows, columns=REPORT_COLUMNS)
+    return report.sort_values("bytes", ascending=False, ignore_index=True)
@@ -0,0 +1,359 @@
+# xerparser
+# network.py
+# Compact array representation of the activity relationship network.
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+
+from xerparser.src._lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+PRED_TYPES = ("PR_FS", "PR_SS", "PR_FF", "PR_SF")
+"""Relationship types in the order of their integer codes."""
+
+NO_CALENDAR = -1
+"""Calendar code used for 24 hour lags and for tasks without a known calendar."""
+
+# SCHEDOPTIONS `sched_calendar_on_relationship_lag` values
+LAG_CALENDAR_OPTIONS = {
+    "rcal_Predecessor": "predecessor",
+    "rcal_Successor": "successor",
+    "rcal_24Hour": "24hour",
+}
+
+
+def _lag_calendars(lag_calendar: str, task_clndr: np.ndarray, pred: np.ndarray, succ: np.ndarray) -> np.ndarray:
+    """Calendar code each lag is scheduled on, for edges pred -> succ."""
+    if lag_calendar == "predecessor":
+        return task_clndr[pred]
+    if lag_calendar == "successor":
+        return task_clndr[succ]
+    return np.full(len(pred), NO_CALENDAR, dtype=np.int32)
+
+
+def _widened(strings: np.ndarray, value: str) -> np.ndarray:
+    """Fixed width string array wide enough to hold `value` as well."""
+    return strings.astype(np.promote_types(strings.dtype, np.array(value).dtype), copy=False)
+
+
+def gather_ranges(indptr: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+    """
+    Concatenate the CSR ranges `indptr[n]:indptr[n + 1]` of several nodes.
+
+    Args:
+        indptr (np.ndarray): CSR row pointer
+        nodes (np.ndarray): node indexes
+
+    Returns:
+        np.ndarray: positions into the CSR index arrays
+    """
+    if len(nodes) == 1:
+        # a single range is a plain arange, without the bookkeeping below
+        node = int(nodes[0])
+        return np.arange(indptr[node], indptr[node + 1], dtype=np.int64)
+    starts = indptr[nodes]
+    lengths = indptr[nodes + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(total)
+
+
+@dataclass(frozen=True, eq=False)
+class RelationshipNetwork:
+    """
+    The relationship network of an xer as CSR / CSC integer arrays.
+
+    Nodes are numbered by their row position in the TASK table. Edges are
+    numbered in CSR order (sorted by predecessor, then successor) and every
+    edge attribute is a parallel array indexed by edge number.
+
+    Successors of node `i` are `edge_succ[succ_indptr[i]:succ_indptr[i + 1]]`.
+    Predecessors of node `i` are `edge_pred[pred_edges[pred_indptr[i]:pred_indptr[i + 1]]]`.
+    """
+
+    task_ids: np.ndarray
+    """task_id of each node"""
+    task_clndr: np.ndarray
+    """Calendar code of each node"""
+    clndr_ids: np.ndarray
+    """clndr_id of each calendar code"""
+    edge_pred: np.ndarray
+    """Predecessor node of each edge (CSR order)"""
+    edge_succ: np.ndarray
+    """Successor node of each edge (CSR indices)"""
+    pred_type: np.ndarray
+    """Relationship type code of each edge, see `PRED_TYPES`"""
+    lag_hr: np.ndarray
+    """Lag hours of each edge"""
+    lag_clndr: np.ndarray
+    """Calendar code used to schedule the lag of each edge"""
+    task_pred_ids: np.ndarray
+    """task_pred_id of each edge"""
+    succ_indptr: np.ndarray
+    """CSR row pointer over `edge_succ`"""
+    pred_indptr: np.ndarray
+    """CSC row pointer over `pred_edges`"""
+    pred_edges: np.ndarray
+    """Edge numbers sorted by successor"""
+    dropped_edges: int = 0
+    """Relationships that reference tasks missing from the TASK table"""
+    lag_calendar: str = "predecessor"
+    """Calendar option the lags are scheduled on, see `from_frames`"""
+
+    @classmethod
+    def from_frames(cls, task_df: pd.DataFrame, taskpred_df: pd.DataFrame | None,
+                    lag_calendar: str = "predecessor") -> "RelationshipNetwork":
+        """
+        Build the network from the TASK and TASKPRED tables.
+
+        Args:
+            task_df (pd.DataFrame): TASK table
+            taskpred_df (pd.DataFrame | None): TASKPRED table
+            lag_calendar (str): calendar used for lags; one of `predecessor`,
+                `successor` or `24hour`
+
+        Returns:
+            RelationshipNetwork: network arrays
+        """
+        if lag_calendar not in ("predecessor", "successor", "24hour"):
+            raise ValueError(f"Invalid lag calendar option: {lag_calendar}")
+
+        task_ids = task_df["task_id"].astype(str).to_numpy(dtype=object)
+        n_tasks = len(task_ids)
+        # activities without a calendar get NO_CALENDAR
+        task_clndr, clndr_ids = pd.factorize(task_df["clndr_id"].replace("", np.nan), use_na_sentinel=True)
+        task_clndr = task_clndr.astype(np.int32)
+        clndr_ids = np.asarray([str(clndr_id) for clndr_id in clndr_ids], dtype=object)
+
+        if taskpred_df is None or taskpred_df.empty:
+            taskpred_df = pd.DataFrame(columns=["task_pred_id", "task_id", "pred_task_id", "pred_type", "lag_hr_cnt"])
+
+        node_index = pd.Index(task_ids)
+        pred = node_index.get_indexer(taskpred_df["pred_task_id"].astype(str))
+        succ = node_index.get_indexer(taskpred_df["task_id"].astype(str))
+        valid = (pred >= 0) & (succ >= 0)
+        dropped = int((~valid).sum())
+
+        pred = pred[valid].astype(np.int32)
+        succ = succ[valid].astype(np.int32)
+        pred_type = pd.Index(PRED_TYPES).get_indexer(taskpred_df["pred_type"].to_numpy()[valid])
+        # unknown relationship types are scheduled as finish to start
+        pred_type = np.where(pred_type < 0, 0, pred_type).astype(np.int8)
+        lag_hr = pd.to_numeric(taskpred_df["lag_hr_cnt"], errors="coerce").to_numpy(dtype=np.float64)[valid]
+        lag_hr = np.nan_to_num(lag_hr, nan=0.0)
+        # fixed width strings copy much faster than objects when edges are inserted or deleted
+        task_pred_ids = taskpred_df["task_pred_id"].astype(str).to_numpy(dtype=str)[valid]
+
+        order = np.lexsort((succ, pred))
+        pred, succ = pred[order], succ[order]
+        pred_type, lag_hr, task_pred_ids = pred_type[order], lag_hr[order], task_pred_ids[order]
+
+        lag_clndr = _lag_calendars(lag_calendar, task_clndr, pred, succ)
+
+        succ_indptr = np.zeros(n_tasks + 1, dtype=np.int32)
+        np.cumsum(np.bincount(pred, minlength=n_tasks), out=succ_indptr[1:])
+        pred_indptr = np.zeros(n_tasks + 1, dtype=np.int32)
+        np.cumsum(np.bincount(succ, minlength=n_tasks), out=pred_indptr[1:])
+        pred_edges = np.argsort(succ, kind="stable").astype(np.int32)
+
+        return cls(
+            task_ids=task_ids,
+            task_clndr=task_clndr,
+            clndr_ids=clndr_ids,
+            edge_pred=pred,
+            edge_succ=succ,
+            pred_type=pred_type,
+            lag_hr=lag_hr,
+            lag_clndr=lag_clndr.astype(np.int32),
+            task_pred_ids=task_pred_ids,
+            succ_indptr=succ_indptr,
+            pred_indptr=pred_indptr,
+            pred_edges=pred_edges,
+            dropped_edges=dropped,
+            lag_calendar=lag_calendar,
+        )
+
+    @property
+    def node_count(self) -> int:
+        return len(self.task_ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.edge_succ)
+
+    def index_of(self, task_ids) -> np.ndarray:
+        """Node indexes of task ids; -1 for task ids not in the network."""
+        return pd.Index(self.task_ids).get_indexer(np.atleast_1d(np.asarray(task_ids, dtype=object)))
+
+    def successor_edges(self, node: int) -> np.ndarray:
+        """Edge numbers leaving a node."""
+        return np.arange(self.succ_indptr[node], self.succ_indptr[node + 1])
+
+    def predecessor_edges(self, node: int) -> np.ndarray:
+        """Edge numbers entering a node."""
+        return self.pred_edges[self.pred_indptr[node]:self.pred_indptr[node + 1]]
+
+    def successors(self, node: int) -> np.ndarray:
+        """Successor node indexes of a node."""
+        return self.edge_succ[self.succ_indptr[node]:self.succ_indptr[node + 1]]
+
+    def predecessors(self, node: int) -> np.ndarray:
+        """Predecessor node indexes of a node."""
+        return self.edge_pred[self.predecessor_edges(node)]
+
+    def edge_index(self, pred: int, succ: int) -> int:
+        """Edge number of the relationship pred -> succ; -1 if there is none."""
+        first = int(self.succ_indptr[pred])
+        position = first + int(np.searchsorted(self.edge_succ[first:self.succ_indptr[pred + 1]], succ))
+        if position < self.succ_indptr[pred + 1] and self.edge_succ[position] == succ:
+            return position
+        return -1
+
+    def insert_edge(self, pred: int, succ: int, pred_type: int = 0, lag_hr: float = 0.0,
+                    task_pred_id: str = "") -> tuple["RelationshipNetwork", int]:
+        """
+        Network with one more relationship, in linear time and without re-sorting.
+
+        The lag calendar follows the `lag_calendar` option of the network, as
+        in `from_frames`.
+
+        Args:
+            pred (int): predecessor node
+            succ (int): successor node
+            pred_type (int): relationship type code, see `PRED_TYPES`
+            lag_hr (float): lag hours
+            task_pred_id (str): task_pred_id of the relationship
+
+        Returns:
+            tuple: the new network and the edge number of the relationship; edge
+                numbers from there on move up by one
+        """
+        first, last = int(self.succ_indptr[pred]), int(self.succ_indptr[pred + 1])
+        edge = first + int(np.searchsorted(self.edge_succ[first:last], succ))
+        lag_clndr = _lag_calendars(self.lag_calendar, self.task_clndr, np.array([pred]), np.array([succ]))[0]
+
+        column = self.pred_edges[self.pred_indptr[succ]:self.pred_indptr[succ + 1]]
+        position = int(self.pred_indptr[succ]) + int(np.searchsorted(column, edge))
+        pred_edges = np.insert(self.pred_edges, position, -1)
+        pred_edges += pred_edges >= edge
+        pred_edges[position] = edge
+        succ_indptr = self.succ_indptr.copy()
+        succ_indptr[pred + 1:] += 1
+        pred_indptr = self.pred_indptr.copy()
+        pred_indptr[succ + 1:] += 1
+        network = replace(
+            self,
+            edge_pred=np.insert(self.edge_pred, edge, pred),
+            edge_succ=np.insert(self.edge_succ, edge, succ),
+            pred_type=np.insert(self.pred_type, edge, pred_type),
+            lag_hr=np.insert(self.lag_hr, edge, lag_hr),
+            lag_clndr=np.insert(self.lag_clndr, edge, lag_clndr),
+            task_pred_ids=np.insert(_widened(self.task_pred_ids, task_pred_id), edge, task_pred_id),
+            succ_indptr=succ_indptr,
+            pred_indptr=pred_indptr,
+            pred_edges=pred_edges,
+        )
+        return network, edge
+
+    def update_edge(self, edge: int, pred_type: int, lag_hr: float,
+                    task_pred_id: str | None = None) -> "RelationshipNetwork":
+        """
+        Network with the type and lag of one relationship replaced, and its
+        task_pred_id if one is given; edge numbers do not change.
+
+        The edge arrays are copied, not changed in place, as other networks
+        may share them.
+        """
+        pred_type_codes = self.pred_type.copy()
+        pred_type_codes[edge] = pred_type
+        lags = self.lag_hr.copy()
+        lags[edge] = lag_hr
+        changes = {"pred_type": pred_type_codes, "lag_hr": lags}
+        if task_pred_id:
+            changes["task_pred_ids"] = _widened(self.task_pred_ids, task_pred_id).copy()
+            changes["task_pred_ids"][edge] = task_pred_id
+        return replace(self, **changes)
+
+    def delete_edge(self, edge: int) -> "RelationshipNetwork":
+        """Network without one relationship; edge numbers after it move down by one."""
+        pred, succ = int(self.edge_pred[edge]), int(self.edge_succ[edge])
+        column = self.pred_edges[self.pred_indptr[succ]:self.pred_indptr[succ + 1]]
+        pred_edges = np.delete(self.pred_edges, int(self.pred_indptr[succ]) + int(np.searchsorted(column, edge)))
+        pred_edges -= pred_edges > edge
+        succ_indptr = self.succ_indptr.copy()
+        succ_indptr[pred + 1:] -= 1
+        pred_indptr = self.pred_indptr.copy()
+        pred_indptr[succ + 1:] -= 1
+        return replace(
+            self,
+            edge_pred=np.delete(self.edge_pred, edge),
+            edge_succ=np.delete(self.edge_succ, edge),
+            pred_type=np.delete(self.pred_type, edge),
+            lag_hr=np.delete(self.lag_hr, edge),
+            lag_clndr=np.delete(self.lag_clndr, edge),
+            task_pred_ids=np.delete(self.task_pred_ids, edge),
+            succ_indptr=succ_indptr,
+            pred_indptr=pred_indptr,
+            pred_edges=pred_edges,
+        )
+
+    def in_degree(self) -> np.ndarray:
+        return np.diff(self.pred_indptr)
+
+    def out_degree(self) -> np.ndarray:
+        return np.diff(self.succ_indptr)
+
+    def topological_levels(self) -> np.ndarray:
+        """
+        Longest-path level of every node (Kahn's algorithm, one frontier at a time).
+
+        Every predecessor of a node has a lower level, so all nodes of a level
+        can be scheduled together. Nodes on or downstream of a logic loop are
+        never released and keep level -1.
+
+        Returns:
+            np.ndarray: level of each node
+        """
+        n = self.node_count
+        levels = np.full(n, -1, dtype=np.int32)
+        remaining = self.in_degree().astype(np.int64)
+        frontier = np.flatnonzero(remaining == 0)
+        level = 0
+        while frontier.size:
+            levels[frontier] = level
+            succ = self.edge_succ[gather_ranges(self.succ_indptr, frontier)]
+            if not succ.size:
+                break
+            candidates, counts = np.unique(succ, return_counts=True)
+            remaining[candidates] -= counts
+            frontier = candidates[remaining[candidates] == 0]
+            level += 1
+        return levels
+
+    def reachable(self, nodes, downstream: bool = True) -> np.ndarray:
+        """
+        Nodes reachable from `nodes` (included) following successors or predecessors.
+
+        Args:
+            nodes: starting node indexes
+            downstream (bool): follow successors if True, otherwise predecessors
+
+        Returns:
+            np.ndarray: boolean mask over all nodes
+        """
+        seen = np.zeros(self.node_count, dtype=bool)
+        frontier = np.unique(np.asarray(nodes, dtype=np.int64))
+        seen[frontier] = True
+        while frontier.size:
+            if downstream:
+                nxt = self.edge_succ[gather_ranges(self.succ_indptr, frontier)]
+            else:
+                nxt = self.edge_pred[self.pred_edges[gather_ranges(self.pred_indptr, frontier)]]
+            nxt = np.unique(nxt)
+            frontier = nxt[~seen[nxt]]
+            seen[frontier] = True
+        return seen
@@ -1,10 +1,13 @@
 # xerparser
 # parser.py
+from __future__ import annotations
+
 from pathlib import Path
 from typing import BinaryIO
 
-import pandas as pd
+from xerparser.src._lazy import lazy_import
 
+pd = lazy_import("pandas")
 
 
 CODEC = "cp1252"
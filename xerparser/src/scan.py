@@ -0,0 +1,156 @@
+# xerparser
+# scan.py
+# Header-only scan of .xer files for cataloguing large archives.
+
+import fnmatch
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Iterable
+
+from xerparser.src.parser import CODEC
+
+PROJECT_FIELDS = ("proj_id", "proj_short_name", "last_recalc_date", "plan_start_date")
+"""PROJECT columns read by `scan_header`."""
+
+
+@dataclass(frozen=True)
+class ProjectHeader:
+    """Catalogue fields of a PROJECT row."""
+
+    proj_id: str
+    proj_short_name: str
+    last_recalc_date: datetime | None
+    plan_start_date: datetime | None
+
+
+@dataclass(frozen=True)
+class XerHeader:
+    """
+    Export information and projects of a .xer file.
+
+    `error` is set instead of raising when the file was scanned by `scan_many`
+    and could not be read.
+    """
+
+    path: str
+    version: str = ""
+    date: datetime | None = None
+    user: str = ""
+    projects: tuple[ProjectHeader, ...] = field(default_factory=tuple)
+    error: str | None = None
+
+
+def _parse_date(value: str) -> datetime | None:
+    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _decode_row(line: bytes) -> list[str]:
+    """Values of a %F or %R line without the leading marker."""
+    return line.decode(CODEC, errors="ignore").rstrip("\r\n").split("\t")[1:]
+
+
+def _scan_lines(lines: Iterable[bytes], path: str) -> XerHeader:
+    lines = iter(lines)
+    first = next(lines, b"")
+    if not first.startswith(b"ERMHDR"):
+        raise ValueError(f"ValueError: invalid XER file {path}")
+
+    # ERMHDR values follow the layout used by schemas.ermhdr.ERMHDR
+    ermhdr = _decode_row(first)
+    ermhdr += [""] * (5 - len(ermhdr))
+    version, date, user = ermhdr[0], _parse_date(ermhdr[1]), ermhdr[4]
+
+    # skip to the PROJECT table; everything after it is never read
+    for line in lines:
+        if line.startswith(b"%T") and line.rstrip(b"\r\n").endswith(b"\tPROJECT"):
+            break
+    else:
+        return XerHeader(path, version, date, user)
+
+    columns: list[str] = []
+    projects = []
+    for line in lines:
+        if line.startswith(b"%F"):
+            columns = _decode_row(line)
+        elif line.startswith(b"%R"):
+            row = dict(zip(columns, _decode_row(line)))
+            projects.append(ProjectHeader(
+                proj_id=row.get("proj_id", "").strip(),
+                proj_short_name=row.get("proj_short_name", "").strip(),
+                last_recalc_date=_parse_date(row.get("last_recalc_date", "").strip()),
+                plan_start_date=_parse_date(row.get("plan_start_date", "").strip()),
+            ))
+        elif line.startswith((b"%T", b"%E")):
+            break
+    return XerHeader(path, version, date, user, tuple(projects))
+
+
+def scan_header(file: str | Path | BinaryIO) -> XerHeader:
+    """
+    Reads the export information and PROJECT rows of a .xer file.
+
+    Only the lines up to the end of the PROJECT table are read and no
+    DataFrames are created, so this is much cheaper than a full parse.
+
+    Args:
+        file (str | Path | BinaryIO): .xer file
+
+    Raises:
+        ValueError: the file does not start with an ERMHDR line
+
+    Returns:
+        XerHeader: export information and projects
+    """
+    if isinstance(file, (str, Path)):
+        with open(file, "rb") as f:
+            return _scan_lines(f, str(file))
+    return _scan_lines(file, getattr(file, "name", ""))
+
+
+def _scan_or_error(path: str) -> XerHeader:
+    try:
+        return scan_header(path)
+    except (OSError, ValueError) as e:
+        return XerHeader(path, error=str(e))
+
+
+def scan_many(directory: str | Path, pattern: str = "*.xer", recursive: bool = True,
+              workers: int | None = None) -> list[XerHeader]:
+    """
+    Scans the headers of every .xer file in a directory in parallel.
+
+    Files that cannot be read are returned with `error` set, so one
+    corrupted export does not stop the catalogue. The pattern is matched
+    case-insensitively, as P6 exports both .xer and .XER files.
+
+    Args:
+        directory (str | Path): directory to search
+        pattern (str, optional): file name pattern. Defaults to "*.xer".
+        recursive (bool, optional): include sub directories. Defaults to True.
+        workers (int | None, optional): number of worker processes; 1 scans in
+            the calling process. Defaults to the number of CPUs.
+
+    Returns:
+        list[XerHeader]: one header per file, sorted by path
+    """
+    directory = Path(directory)
+    match = re.compile(fnmatch.translate(pattern), re.IGNORECASE).match
+    files = directory.rglob("*") if recursive else directory.glob("*")
+    paths = sorted(str(p) for p in files if match(p.name) and p.is_file())
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(paths) < 2:
+        return [_scan_or_error(p) for p in paths]
+
+    chunksize = max(1, min(256, len(paths) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_scan_or_error, paths, chunksize=chunksize))
@@ -0,0 +1,311 @@
+# xerparser
+# shared.py
+# Place the column arrays of an Xer into shared memory so worker processes
+# can map them read-only instead of unpickling a full copy of every table.
+from __future__ import annotations
+
+import threading
+from collections.abc import MutableMapping
+from dataclasses import dataclass, field
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Iterator
+
+from xerparser.src._lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+_ALIGNMENT = 64
+_NUMERIC_KINDS = "biufmM"
+_TRACKER_LOCK = threading.Lock()
+
+
+@dataclass(frozen=True)
+class SharedStrings:
+    """
+    Location of a list of strings inside a shared memory block.
+
+    The strings are stored back to back as one UTF-8 buffer. `bounds` holds
+    `count + 1` int64 positions, in characters of the decoded buffer, at which
+    each string starts and the last one ends.
+    """
+
+    data_offset: int
+    data_nbytes: int
+    bounds_offset: int
+    count: int
+
+    def decode(self, buf) -> list[str]:
+        """The strings, decoded from the shared buffer."""
+        text = bytes(buf[self.data_offset:self.data_offset + self.data_nbytes]).decode("utf-8", "surrogatepass")
+        bounds = np.ndarray((self.count + 1,), dtype=np.int64, buffer=buf, offset=self.bounds_offset).tolist()
+        return [text[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+@dataclass(frozen=True)
+class SharedColumn:
+    """
+    Location of one DataFrame column (or index) inside a shared memory block.
+
+    Numeric and datetime columns are stored as their raw values. All other
+    columns are stored as category codes. String categories are stored in the
+    block as `strings`; any other categories are carried in the handle as
+    `categories`. `text_dtype` is the dtype of a text column before it was
+    encoded; categorical columns have none and keep their `ordered` flag and
+    the dtype of their categories.
+    """
+
+    name: Any
+    dtype: str
+    offset: int
+    length: int
+    categories: tuple | None = None
+    text_dtype: str | None = None
+    strings: SharedStrings | None = None
+    ordered: bool = False
+    categories_dtype: str | None = None
+
+    @property
+    def is_categorical(self) -> bool:
+        return (self.categories is not None or self.strings is not None) and self.text_dtype is None
+
+    @property
+    def is_text(self) -> bool:
+        return self.text_dtype is not None
+
+    def values(self, buf) -> np.ndarray:
+        """Read-only view of the raw values or category codes."""
+        arr = np.ndarray((self.length,), dtype=np.dtype(self.dtype), buffer=buf, offset=self.offset)
+        arr.flags.writeable = False
+        return arr
+
+    def decode_categories(self, buf) -> list:
+        return self.strings.decode(buf) if self.strings is not None else list(self.categories)
+
+
+@dataclass(frozen=True)
+class SharedTable:
+    """Columns of one table and its index, a `range` or a shared column."""
+
+    columns: tuple[SharedColumn, ...]
+    index: range | SharedColumn
+    length: int
+
+
+@dataclass(frozen=True)
+class SharedXerHandle:
+    """
+    Picklable reference to an Xer stored in shared memory.
+
+    Pass the handle to worker processes and rebuild the Xer with `Xer.attach`.
+    """
+
+    shm_name: str
+    size: int
+    tables: dict[str, SharedTable]
+    frames: dict[str, pd.DataFrame] = field(default_factory=dict)
+
+
+class _Block:
+    """Lays arrays out in a shared memory block, aligned, in the order they are added."""
+
+    def __init__(self) -> None:
+        self.arrays: list[tuple[int, np.ndarray]] = []
+        self.size = 0
+
+    def add(self, arr: np.ndarray) -> int:
+        self.size += -self.size % _ALIGNMENT
+        offset = self.size
+        self.arrays.append((offset, arr))
+        self.size += arr.nbytes
+        return offset
+
+    def add_strings(self, strings: list[str]) -> SharedStrings:
+        data = np.frombuffer("".join(strings).encode("utf-8", "surrogatepass"), dtype=np.uint8)
+        bounds = np.zeros(len(strings) + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in strings], out=bounds[1:])
+        return SharedStrings(self.add(data), data.nbytes, self.add(bounds), len(strings))
+
+    def write(self) -> SharedMemory:
+        shm = SharedMemory(create=True, size=max(self.size, 1))
+        for offset, arr in self.arrays:
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf, offset=offset)[:] = arr
+        return shm
+
+
+def _codes_dtype(n_categories: int) -> np.dtype:
+    """Smallest signed integer type pandas uses for category codes."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def _encode_column(name, values, block: _Block) -> SharedColumn:
+    """Add a column (or index) to the block and return where it is."""
+    dtype = values.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        categories = values.categories if isinstance(values, pd.CategoricalIndex) else values.cat.categories
+        codes = np.asarray(values.codes if isinstance(values, pd.CategoricalIndex) else values.cat.codes)
+        text_dtype, ordered, categories_dtype = None, bool(dtype.ordered), str(categories.dtype)
+    elif isinstance(dtype, np.dtype) and dtype.kind in _NUMERIC_KINDS:
+        arr = np.ascontiguousarray(np.asarray(values))
+        return SharedColumn(name, arr.dtype.str, block.add(arr), len(arr))
+    else:
+        codes, categories = pd.factorize(values, use_na_sentinel=True)
+        text_dtype, ordered, categories_dtype = str(dtype), False, None
+    codes = codes.astype(_codes_dtype(len(categories)), copy=False)
+    offset = block.add(codes)
+    uniques = list(categories)
+    if all(type(value) is str for value in uniques):
+        return SharedColumn(name, codes.dtype.str, offset, len(codes), text_dtype=text_dtype,
+                            strings=block.add_strings(uniques), ordered=ordered, categories_dtype=categories_dtype)
+    return SharedColumn(name, codes.dtype.str, offset, len(codes), tuple(uniques), text_dtype,
+                        ordered=ordered, categories_dtype=categories_dtype)
+
+
+def _decode_column(col: SharedColumn, buf):
+    """Array of a shared column: a read-only view, a categorical or a decoded text column."""
+    codes = col.values(buf)
+    if not (col.is_text or col.is_categorical):
+        return codes
+    categories = col.decode_categories(buf)
+    if col.is_categorical:
+        dtype = pd.CategoricalDtype(pd.Index(categories, dtype=col.categories_dtype), ordered=col.ordered)
+        return pd.Categorical.from_codes(codes, dtype=dtype, validate=False)
+    # writable text column whose values are the decoded category strings
+    lookup = np.empty(len(categories) + 1, dtype=object)
+    lookup[:-1] = categories
+    lookup[-1] = np.nan  # code -1
+    values = lookup[codes]
+    return values if col.text_dtype == 'object' else pd.array(values, dtype=pd.api.types.pandas_dtype(col.text_dtype))
+
+
+def _decode_table(table: SharedTable, buf) -> pd.DataFrame:
+    if isinstance(table.index, range):
+        index = pd.RangeIndex(table.index.start, table.index.stop, table.index.step)
+    else:
+        index = pd.Index(_decode_column(table.index, buf), name=table.index.name, copy=False)
+    # dict keys must be unique; build positionally so duplicate column names survive
+    data = {position: _decode_column(col, buf) for position, col in enumerate(table.columns)}
+    df = pd.DataFrame(data, index=index, copy=False)
+    df.columns = pd.Index([col.name for col in table.columns])
+    return df
+
+
+def share_tables(tables: dict[str, pd.DataFrame], frames: dict[str, pd.DataFrame] | None = None
+                 ) -> tuple[SharedMemory, SharedXerHandle]:
+    """
+    Copy every column of every table into a single shared memory block.
+
+    Args:
+        tables (dict[str, pd.DataFrame]): xer tables to share
+        frames (dict[str, pd.DataFrame] | None): small derived frames that are
+            pickled with the handle instead of being placed in shared memory
+
+    Returns:
+        tuple[SharedMemory, SharedXerHandle]: the owning shared memory block and the handle
+    """
+    block = _Block()
+    layout: dict[str, SharedTable] = {}
+    for table_name, df in tables.items():
+        columns = tuple(_encode_column(col, df.iloc[:, position], block) for position, col in enumerate(df.columns))
+        if isinstance(df.index, pd.RangeIndex):
+            index = range(df.index.start, df.index.stop, df.index.step)
+        else:
+            index = _encode_column(df.index.name, df.index, block)
+        layout[table_name] = SharedTable(columns, index, len(df))
+    shm = block.write()
+    handle = SharedXerHandle(shm.name, shm.size, layout, dict(frames or {}))
+    return shm, handle
+
+
+def open_shared(shm_name: str) -> SharedMemory:
+    """
+    Attach to an existing shared memory block without handing it to a new
+    resource tracker, so that a worker exiting does not unlink memory still
+    owned by the parent.
+    """
+    try:
+        return SharedMemory(name=shm_name, track=False)
+    except TypeError:
+        # Python < 3.13 has no `track` argument and always registers the block,
+        # so registration is switched off while the block is opened. The lock
+        # keeps other threads of this process from opening blocks meanwhile.
+        with _TRACKER_LOCK:
+            register = resource_tracker.register
+            resource_tracker.register = lambda name, rtype: None
+            try:
+                return SharedMemory(name=shm_name)
+            finally:
+                resource_tracker.register = register
+
+
+class SharedTables(MutableMapping):
+    """
+    Xer tables backed by a shared memory block, each built on first access.
+
+    Tables that are never read are never decoded. Assigning or deleting a
+    table works as on a plain dict.
+    """
+
+    def __init__(self, shm: SharedMemory, handle: SharedXerHandle) -> None:
+        self._shm = shm
+        self._pending = dict(handle.tables)
+        self._tables: dict[str, pd.DataFrame] = {}
+        self._order = list(handle.tables)
+
+    def __getitem__(self, key: str) -> pd.DataFrame:
+        if key not in self._tables:
+            if key not in self._pending:
+                raise KeyError(key)
+            self._tables[key] = _decode_table(self._pending.pop(key), self._shm.buf)
+        return self._tables[key]
+
+    def __setitem__(self, key: str, value) -> None:
+        self._pending.pop(key, None)
+        if key not in self._tables:
+            self._order.append(key)
+        self._tables[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key not in self._tables and key not in self._pending:
+            raise KeyError(key)
+        self._pending.pop(key, None)
+        self._tables.pop(key, None)
+        self._order.remove(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._order))
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __contains__(self, key) -> bool:
+        return key in self._tables or key in self._pending
+
+    def decoded(self) -> list[str]:
+        """Names of the tables built so far."""
+        return [key for key in self._order if key in self._tables]
+
+
+def attach_tables(shm: SharedMemory, handle: SharedXerHandle) -> SharedTables:
+    """
+    Map DataFrames backed by the shared memory block.
+
+    Each table is built when it is first read. Numeric and datetime columns
+    are read-only views of the block and categorical columns keep their
+    categories and ordered flag, with codes viewing the block. Text columns
+    are decoded into ordinary, writable columns of their original dtype whose
+    values are the category strings decoded from the block, so they can be
+    edited like the columns of a parsed Xer. Every table keeps its index.
+
+    Args:
+        shm (SharedMemory): shared memory block opened with `open_shared`
+        handle (SharedXerHandle): layout returned by `share_tables`
+
+    Returns:
+        SharedTables: xer tables
+    """
+    return SharedTables(shm, handle)
@@ -1,15 +1,19 @@
+from __future__ import annotations
+
 from pathlib import Path
 from typing import BinaryIO
 from datetime import datetime, time, date
 import json
 
-import numpy as np
-import pandas as pd
-
-from local.libs.calendar_parser import CalendarParser
 from xerparser import CODEC, file_reader, parser
-from xerparser.schemas.task import calculate_completion, calculate_duration, calculate_remaining_days
-from xerparser.schemas.taskpred import calculate_lag_days
+from xerparser.src._lazy import lazy_import
+from xerparser.src.memory import memory_report
+from xerparser.src.network import LAG_CALENDAR_OPTIONS, RelationshipNetwork
+from xerparser.src.shared import SharedXerHandle, attach_tables, open_shared, share_tables
+
+# pandas, numpy and the calendar parser are loaded when the first Xer is created
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
 
 
 class Xer:
@@ -20,19 +24,38 @@ class Xer:
     # class variables
     CODEC = CODEC
 
+    # derived calendar frames that are not part of `tables`
+    _DERIVED_FRAMES = ('workday_df', 'exception_df', 'workdays_df', 'exceptions_df')
+
+    # defaults for copies made with `Xer.__new__`, which skip `__init__`
+    _shared_memory = None
+    _shared_owner = False
+    _network = None
+    _network_source = None
+
     def __init__(self, xer_file_contents: str) -> None:
         self.tables = self._parse_xer_data(xer_file_contents)
+        self._set_table_attributes()
+        self.workdays_df = pd.DataFrame(columns=['clndr_id', 'day', 'start_time', 'end_time'])
+        self.exceptions_df = pd.DataFrame(columns=['clndr_id', 'exception_date', 'start_time', 'end_time'])
+        self._shared_memory = None
+        self._shared_owner = False
+
+    def _set_table_attributes(self) -> None:
+        """Point the table shortcut attributes at the entries of `tables`."""
         self.project_df = self.tables.get('PROJECT', None)
         self.task_df = self.tables.get('TASK', None)
         self.taskpred_df = self.tables.get('TASKPRED', None)
         self.projwbs_df = self.tables.get('PROJWBS', None)
         self.calendar_df = self.tables.get('CALENDAR', None)
         self.account_df = self.tables.get('ACCOUNT', None)
-        self.workdays_df = pd.DataFrame(columns=['clndr_id', 'day', 'start_time', 'end_time'])
-        self.exceptions_df = pd.DataFrame(columns=['clndr_id', 'exception_date', 'start_time', 'end_time'])
 
     def _parse_xer_data(self, xer_file_contents: str) -> dict[str, pd.DataFrame]:
         """Parse the XER file contents and return the table data as DataFrames."""
+        from local.libs.calendar_parser import CalendarParser
+        from xerparser.schemas.task import calculate_completion, calculate_duration, calculate_remaining_days
+        from xerparser.schemas.taskpred import calculate_lag_days
+
         if xer_file_contents.startswith("ERMHDR"):
             xer_data = parser(xer_file_contents)
             tasks = xer_data.get('TASK', None)
@@ -94,6 +117,132 @@ class Xer:
         file_contents = file_reader(file)
         return cls(file_contents)
 
+    @property
+    def network(self) -> RelationshipNetwork:
+        """
+        Relationship network as CSR / CSC integer arrays, built from TASK and TASKPRED.
+
+        Nodes are numbered by row position in `task_df`. Lags are scheduled on the
+        calendar selected by the SCHEDOPTIONS `sched_calendar_on_relationship_lag`
+        option (predecessor calendar by default).
+
+        The network is built once and reused until `task_df` or `taskpred_df` is
+        replaced or changes length. Call `invalidate_network` after editing task
+        ids, calendars or relationships in place.
+        """
+        if self.task_df is None:
+            raise ValueError("ValueError: xer has no TASK table")
+        source = (self.task_df, self.taskpred_df, len(self.task_df),
+                  None if self.taskpred_df is None else len(self.taskpred_df))
+        cached = self._network_source
+        if self._network is None or cached is None or any(
+                old is not new if isinstance(new, pd.DataFrame) or new is None else old != new
+                for old, new in zip(cached, source)):
+            self._network = self._build_network()
+            self._network_source = source
+        return self._network
+
+    def invalidate_network(self) -> None:
+        """Drop the cached `network`; the next access rebuilds it from the current tables."""
+        self._network = None
+        self._network_source = None
+
+    def _build_network(self) -> RelationshipNetwork:
+        lag_calendar = "predecessor"
+        schedoptions = self.tables.get('SCHEDOPTIONS', None)
+        if schedoptions is not None and 'sched_calendar_on_relationship_lag' in schedoptions.columns \
+                and not schedoptions.empty:
+            option = str(schedoptions['sched_calendar_on_relationship_lag'].iloc[0])
+            lag_calendar = LAG_CALENDAR_OPTIONS.get(option, lag_calendar)
+        return RelationshipNetwork.from_frames(self.task_df, self.taskpred_df, lag_calendar)
+
+    def memory_report(self, suggest: bool = False, exact: bool = False) -> pd.DataFrame:
+        """
+        Deep memory usage per table and per column.
+
+        Derived calendar frames and caches (e.g. `network`) are listed as one row
+        each. With `suggest`, text columns that would shrink under categorical or
+        typed encoding get a `suggested_dtype` and the estimated `savings` in bytes.
+
+        The size of large text columns is extrapolated from a sample unless
+        `exact` is set, which keeps the report cheap enough to log after every load.
+        Use `report.groupby('table')['bytes'].sum()` for per table totals.
+
+        Args:
+            suggest (bool): estimate encoding savings from a sample of each text column
+            exact (bool): measure every value of large text columns
+
+        Returns:
+            pd.DataFrame: memory usage report, largest first
+        """
+        return memory_report(self, suggest, exact)
+
+    def share(self) -> SharedXerHandle:
+        """
+        Place the column arrays of every table into a shared memory block.
+
+        The returned handle is small and cheap to pickle. Pass it to worker
+        processes and rebuild the Xer there with `Xer.attach(handle)`, which maps
+        the block read-only instead of deserializing a copy of every table.
+        Numeric and datetime columns are shared as is; text columns are shared as
+        category codes, with their distinct strings stored in the block as UTF-8,
+        and are decoded when a table is first read in the worker.
+
+        The block stays alive until `release_shared` is called on this object.
+
+        Returns:
+            SharedXerHandle: picklable reference to the shared tables
+        """
+        self.release_shared()
+        frames = {name: getattr(self, name) for name in self._DERIVED_FRAMES
+                  if isinstance(getattr(self, name, None), pd.DataFrame)}
+        self._shared_memory, handle = share_tables(self.tables, frames)
+        self._shared_owner = True
+        return handle
+
+    @classmethod
+    def attach(cls, handle: SharedXerHandle) -> "Xer":
+        """
+        Create an Xer object backed by tables shared with `Xer.share`.
+
+        Tables are built when first read. Numeric and datetime columns map the
+        block read-only and must be copied before they are modified in place.
+        Text columns are decoded into writable columns of their original dtype.
+        Every table keeps its index and categorical columns their dtype.
+
+        Args:
+            handle (SharedXerHandle): handle returned by `Xer.share`
+
+        Returns:
+            Xer: Xer object mapping the shared memory block
+        """
+        shm = open_shared(handle.shm_name)
+        new_xer = cls.__new__(cls)
+        new_xer.tables = attach_tables(shm, handle)
+        new_xer._set_table_attributes()
+        new_xer.workdays_df = pd.DataFrame(columns=['clndr_id', 'day', 'start_time', 'end_time'])
+        new_xer.exceptions_df = pd.DataFrame(columns=['clndr_id', 'exception_date', 'start_time', 'end_time'])
+        for name, frame in handle.frames.items():
+            setattr(new_xer, name, frame)
+        new_xer._shared_memory = shm
+        new_xer._shared_owner = False
+        return new_xer
+
+    def release_shared(self) -> None:
+        """
+        Close and unlink the shared memory block created by `share`.
+
+        Must only be called once all workers are finished with the block.
+        Objects created with `attach` keep their mapping open for as long as
+        they are alive, so this is a no-op for them.
+        """
+        shm = self._shared_memory
+        if shm is None or not self._shared_owner:
+            return
+        shm.close()
+        shm.unlink()
+        self._shared_memory = None
+
     def update_last_recalc_date(self, split_date: datetime) -> None:
         """
         Update the project's last_recalc_date field to the split_date.